@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+########################################################################################
+#
+# Benchmarks loading the target set, matching guesses and writing the results for
+# checkpass.py and the older archive/checkpass2.py
+#
+# Generates synthetic target sets and guess streams, (cached in --data_dir so they only
+# need to be generated once), with:
+#   - Passwords that are reused across users, with popular ones reused the most
+#   - A configurable fraction of guesses that crack a target, and that repeat an
+#     earlier guess
+#   - A mix of ASCII and non-ASCII passwords, saved as UTF-8, Latin-1, or UTF-8 with
+#     some Latin-1 lines mixed in like many leaked password lists
+#
+# For each program, size and encoding it measures:
+#   load_time       Seconds to start up and load the target set, (run with no guesses)
+#   load_peak_rss   Peak memory in bytes while loading the target set
+#   match_time      Seconds to check the guesses, (not counting load_time)
+#   guesses_per_sec Number of guesses checked per second
+#   peak_rss        Peak memory in bytes for the whole run
+#   output_time     Extra seconds taken when saving the cracking curve, cracked and
+#                   uncracked passwords to files rather than throwing the output away
+#
+# checkpass_index and checkpass_index_memory run checkpass.py against a target index
+# built from the target set with build-index, (looking guesses up in the memory mapped
+# index, or with --index_in_memory). Building the index isn't counted in load_time
+#
+# Each measurement is the best of --repeat runs. The results are appended to the
+# --results file as one JSON object per line, tagged with the git commit and Python
+# version, so results from different versions can be compared
+#
+# Peak memory is only available on systems that support os.wait4
+#
+# Example:
+#   python3 benchmarks/checkpass_benchmark.py --sizes 1000000 10000000 --encodings utf-8 mixed
+#
+########################################################################################
+
+import sys
+import os
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import subprocess
+
+
+## The programs that can be benchmarked, relative to the top of the repo
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PROGRAMS = {
+    'checkpass': os.path.join(BASE_DIR, 'checkpass.py'),
+    'checkpass2': os.path.join(BASE_DIR, 'archive', 'checkpass2.py'),
+    'checkpass_index': os.path.join(BASE_DIR, 'checkpass.py'),
+    'checkpass_index_memory': os.path.join(BASE_DIR, 'checkpass.py'),
+}
+
+## The extra arguments for the programs that are run against a target index
+INDEX_PROGRAMS = {
+    'checkpass_index': [],
+    'checkpass_index_memory': ['--index_in_memory'],
+}
+
+## Characters used for the synthetic passwords. Repeated to fill all 256 byte values
+## so random bytes can be mapped onto them with translate()
+ALPHABET = b'abcdefghijklmnopqrstuvwxyz0123456789'
+TRANSLATE_TABLE = (ALPHABET * (256 // len(ALPHABET) + 1))[:256]
+
+## Non-ASCII characters that are mixed into some of the passwords
+NON_ASCII = 'äöüßéèñçøå'
+
+
+####################################################
+# Parses the command line
+####################################################
+def parse_command_line():
+    parser = argparse.ArgumentParser(description='Benchmarks target loading, guess matching and output writing for checkpass.py and archive/checkpass2.py')
+    parser.add_argument('--sizes', help='Number of passwords in each target set to test. Default is 1000000. 10000000 and 100000000 are also useful but take a while to generate', metavar='SIZE', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--programs', help='Programs to benchmark. checkpass_index and checkpass_index_memory are checkpass.py run against a target index. Default is checkpass and checkpass2', choices=sorted(PROGRAMS), nargs='+', default=['checkpass', 'checkpass2'])
+    parser.add_argument('--encodings', help='Encodings of the target sets and guesses to test. mixed is UTF-8 with some Latin-1 lines. Default is utf-8', choices=['utf-8', 'latin-1', 'mixed'], nargs='+', default=['utf-8'])
+    parser.add_argument('--guess_ratio', help='Number of guesses to make per target password. Default is 2', metavar='RATIO', type=float, default=2.0)
+    parser.add_argument('--reuse_rate', help='Fraction of target passwords that are reused from another user. Default is 0.3', metavar='RATE', type=float, default=0.3)
+    parser.add_argument('--hit_rate', help='Fraction of guesses that are in the target set. Default is 0.01', metavar='RATE', type=float, default=0.01)
+    parser.add_argument('--duplicate_rate', help='Fraction of guesses that repeat an earlier guess. Default is 0.05', metavar='RATE', type=float, default=0.05)
+    parser.add_argument('--non_ascii_rate', help='Fraction of passwords and guesses with a non-ASCII character in them. Default is 0.05', metavar='RATE', type=float, default=0.05)
+    parser.add_argument('--repeat', help='Number of times to run each measurement. The best time is kept. Default is 1', type=int, default=1)
+    parser.add_argument('--checkpass_args', help='Extra arguments to pass to checkpass.py, for example "--workers 4"', metavar='ARGS', default='')
+    parser.add_argument('--detect_encoding', help='Let checkpass.py detect the encoding of the target set rather than passing it in with -e', action='store_true')
+    parser.add_argument('--data_dir', help='Directory to save the generated target sets and guesses in so they can be reused. Default is a temporary directory', metavar='DIRECTORY', default=None)
+    parser.add_argument('--results', help='File to append the results to. Default is checkpass_benchmark_results.jsonl', metavar='RESULTS_FILE', default='checkpass_benchmark_results.jsonl')
+    parser.add_argument('--seed', help='Random seed so runs can be repeated. Default is 1', type=int, default=1)
+    return parser.parse_args()
+
+
+####################################################
+# Returns a random password
+####################################################
+def random_password(rng, non_ascii_rate):
+    password = rng.randbytes(rng.randint(6, 12)).translate(TRANSLATE_TABLE).decode('ascii')
+    if rng.random() < non_ascii_rate:
+        position = rng.randint(0, len(password))
+        password = password[:position] + rng.choice(NON_ASCII) + password[position:]
+    return password
+
+
+####################################################
+# Encodes a password the way it would be saved in a
+# file with the given encoding
+####################################################
+def encode_password(rng, password, encoding):
+    if encoding == 'mixed':
+        if not password.isascii() and rng.random() < 0.5:
+            return password.encode('latin-1')
+        return password.encode('utf-8')
+    return password.encode(encoding)
+
+
+####################################################
+# Writes out lines in batches
+####################################################
+def write_lines(filename, lines):
+    with open(filename, 'wb') as file:
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= 100000:
+                file.write(b'\n'.join(batch) + b'\n')
+                batch = []
+        if batch:
+            file.write(b'\n'.join(batch) + b'\n')
+
+
+####################################################
+# Creates the target set and guesses for one size and
+# encoding, if they haven't been created already
+#
+# Returns (target_file, guess_file, num_guesses)
+####################################################
+def generate_data(args, data_dir, size, encoding):
+    name = '_'.join(str(value) for value in [size, encoding, args.guess_ratio, args.reuse_rate, args.hit_rate,
+        args.duplicate_rate, args.non_ascii_rate, args.seed])
+    target_file = os.path.join(data_dir, 'targets_' + name + '.txt')
+    guess_file = os.path.join(data_dir, 'guesses_' + name + '.txt')
+    num_guesses = int(size * args.guess_ratio)
+    if os.path.exists(target_file) and os.path.exists(guess_file):
+        return target_file, guess_file, num_guesses
+
+    print("Generating " + str(size) + " " + encoding + " targets and " + str(num_guesses) + " guesses", file=sys.stderr)
+    rng = random.Random(args.seed)
+
+    ##--Reused passwords are picked with a bias towards the first ones created so a few
+    ##--passwords are very popular, the same as real password sets
+    unique = []
+    def targets():
+        for i in range(size):
+            if unique and rng.random() < args.reuse_rate:
+                password = unique[int(len(unique) * rng.random() ** 3)]
+            else:
+                password = random_password(rng, args.non_ascii_rate)
+                unique.append(password)
+            yield encode_password(rng, password, encoding)
+    write_lines(target_file + '.tmp', targets())
+
+    recent = []
+    def guesses():
+        for i in range(num_guesses):
+            choice = rng.random()
+            if choice < args.hit_rate:
+                password = rng.choice(unique)
+            elif recent and choice < args.hit_rate + args.duplicate_rate:
+                password = rng.choice(recent)
+            else:
+                password = random_password(rng, args.non_ascii_rate)
+                if len(recent) < 100000:
+                    recent.append(password)
+                else:
+                    recent[rng.randrange(len(recent))] = password
+            yield encode_password(rng, password, encoding)
+    write_lines(guess_file + '.tmp', guesses())
+
+    os.replace(target_file + '.tmp', target_file)
+    os.replace(guess_file + '.tmp', guess_file)
+    return target_file, guess_file, num_guesses
+
+
+####################################################
+# Runs a program and returns (seconds, peak_rss)
+#
+# peak_rss is None if it can't be measured
+####################################################
+def run_program(command, stdin_file, stdout_file, env = None):
+    with open(stdin_file, 'rb') as stdin:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=stdin, stdout=stdout_file, stderr=subprocess.DEVNULL, env=env)
+
+        if hasattr(os, 'wait4'):
+            pid, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            ##--Linux reports it in kilobytes, macOS in bytes
+            peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        else:
+            process.wait()
+            elapsed = time.perf_counter() - start
+            peak_rss = None
+
+    if process.returncode != 0:
+        raise RuntimeError("Command failed with exit code " + str(process.returncode) + ": " + ' '.join(command))
+    return elapsed, peak_rss
+
+
+####################################################
+# Runs a program --repeat times and returns the best
+# (seconds, peak_rss)
+####################################################
+def best_run(args, command, stdin_file, stdout_file = subprocess.DEVNULL, env = None):
+    runs = [run_program(command, stdin_file, stdout_file, env) for i in range(args.repeat)]
+    return min(runs, key=lambda run: run[0])
+
+
+####################################################
+# Returns the command line to run a program
+#
+# If output_dir is specified the results are saved
+# to files in it
+####################################################
+def build_command(args, program, target_file, encoding, output_dir = None):
+    command = [sys.executable, PROGRAMS[program], '-t', target_file]
+    if program in INDEX_PROGRAMS:
+        command = command + INDEX_PROGRAMS[program] + args.checkpass_args.split()
+    elif program == 'checkpass':
+        if not args.detect_encoding:
+            command = command + ['-e', 'latin-1' if encoding == 'latin-1' else 'utf-8']
+        command = command + args.checkpass_args.split()
+    if program != 'checkpass2' and output_dir is not None:
+        command = command + ['-o', os.path.join(output_dir, 'curve.txt'),
+            '--cracked_file', os.path.join(output_dir, 'cracked.txt'),
+            '-u', os.path.join(output_dir, 'uncracked.txt')]
+    return command
+
+
+####################################################
+# Builds a target index of a target set, if it hasn't
+# been built already
+#
+# Returns the filename of the index
+####################################################
+def build_index(target_file, encoding):
+    index_file = target_file + '.idx'
+    if not os.path.exists(index_file):
+        print("Building the target index of " + target_file, file=sys.stderr)
+        subprocess.run([sys.executable, PROGRAMS['checkpass'], 'build-index', '-t', target_file, '-o', index_file,
+            '-e', 'latin-1' if encoding == 'latin-1' else 'utf-8'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return index_file
+
+
+####################################################
+# Benchmarks one program against one data set
+####################################################
+def benchmark(args, program, target_file, guess_file, num_guesses, encoding, temp_dir):
+    empty_file = os.path.join(temp_dir, 'empty.txt')
+    open(empty_file, 'w').close()
+
+    ##--checkpass2.py reads the guesses as text from stdin, so tell it the encoding and
+    ##--keep it from crashing on the Latin-1 lines in the mixed data sets
+    env = None
+    if program == 'checkpass2':
+        env = dict(os.environ)
+        env['PYTHONIOENCODING'] = 'latin-1' if encoding == 'latin-1' else 'utf-8:surrogateescape'
+
+    if program in INDEX_PROGRAMS:
+        target_file = build_index(target_file, encoding)
+
+    command = build_command(args, program, target_file, encoding)
+    load_time, load_peak_rss = best_run(args, command, empty_file, env = env)
+    total_time, peak_rss = best_run(args, command, guess_file, env = env)
+
+    ##--checkpass2.py always writes the cracking curve to stdout and its uncracked file
+    ##--option doesn't work, so only the curve is saved for it
+    output_dir = os.path.join(temp_dir, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    if program != 'checkpass2':
+        output_time, _ = best_run(args, build_command(args, program, target_file, encoding, output_dir), guess_file)
+    else:
+        with open(os.path.join(output_dir, 'curve.txt'), 'w') as curve_file:
+            output_time, _ = best_run(args, command, guess_file, curve_file, env)
+
+    match_time = max(total_time - load_time, 1e-9)
+    return {
+        'load_time': round(load_time, 4),
+        'load_peak_rss': load_peak_rss,
+        'match_time': round(match_time, 4),
+        'guesses_per_sec': round(num_guesses / match_time, 1),
+        'peak_rss': peak_rss,
+        'output_time': round(output_time - total_time, 4),
+    }
+
+
+####################################################
+# Returns the current git commit, or None if it isn't
+# available
+####################################################
+def git_version():
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        return result.stdout.decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_command_line()
+
+    run_info = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_version': git_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'checkpass_args': args.checkpass_args,
+        'guess_ratio': args.guess_ratio,
+        'reuse_rate': args.reuse_rate,
+        'hit_rate': args.hit_rate,
+        'duplicate_rate': args.duplicate_rate,
+        'non_ascii_rate': args.non_ascii_rate,
+        'repeat': args.repeat,
+        'seed': args.seed,
+    }
+
+    print("program\tsize\tencoding\tload_time\tguesses_per_sec\tpeak_rss_mb\toutput_time")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        os.makedirs(data_dir, exist_ok=True)
+
+        for size in args.sizes:
+            for encoding in args.encodings:
+                target_file, guess_file, num_guesses = generate_data(args, data_dir, size, encoding)
+
+                for program in args.programs:
+                    result = benchmark(args, program, target_file, guess_file, num_guesses, encoding, temp_dir)
+                    result.update({'program': program, 'size': size, 'encoding': encoding, 'num_guesses': num_guesses})
+                    result.update(run_info)
+
+                    with open(args.results, 'a') as results_file:
+                        results_file.write(json.dumps(result) + '\n')
+
+                    peak_rss = 'n/a' if result['peak_rss'] is None else str(round(result['peak_rss'] / (1024 * 1024), 1))
+                    print(program + "\t" + str(size) + "\t" + encoding + "\t" + str(result['load_time']) + "\t" +
+                        str(int(result['guesses_per_sec'])) + "\t" + peak_rss + "\t" + str(result['output_time']))
+                    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+########################################################################################
+#
+# Measures how much the --prefilter option speeds up checkpass.py
+#
+# Generates random target sets of several sizes plus a stream of guesses where only a
+# small fraction are in the target set, then times checkpass.py on each with and
+# without the prefilter. The time to load the target set is measured separately, (by
+# running with no guesses), and subtracted so only the matching speed is reported
+#
+# Example:
+#   python3 benchmarks/prefilter_benchmark.py --sizes 10000 1000000 --guesses 5000000
+#
+########################################################################################
+
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+
+## checkpass.py is one directory up from this file
+CHECKPASS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'checkpass.py')
+
+
+####################################################
+# Parses the command line
+####################################################
+def parse_command_line():
+    parser = argparse.ArgumentParser(description='Benchmarks checkpass.py with and without the prefilter at different target set sizes')
+    parser.add_argument('--sizes', help='Number of unique passwords in each target set to test. Default is 10000 100000 1000000', metavar='SIZE', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--guesses', help='Number of guesses to make against each target set. Default is 5000000', metavar='NUM_GUESSES', type=int, default=5000000)
+    parser.add_argument('--hit_rate', help='Fraction of the guesses that are in the target set. Default is 0.001', metavar='RATE', type=float, default=0.001)
+    parser.add_argument('--seed', help='Random seed so runs can be repeated. Default is 1', type=int, default=1)
+    return parser.parse_args()
+
+
+####################################################
+# Returns a random password
+####################################################
+def random_password(rng):
+    length = rng.randint(6, 12)
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for i in range(length))
+
+
+####################################################
+# Runs checkpass.py and returns how long it took
+####################################################
+def time_checkpass(target_file, guess_file, extra_args):
+    args = [sys.executable, CHECKPASS, '-t', target_file, '-e', 'utf-8', '--byte_keys'] + extra_args
+    with open(guess_file, 'rb') as guesses:
+        start = time.perf_counter()
+        subprocess.run(args, stdin=guesses, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return time.perf_counter() - start
+
+
+def main():
+    args = parse_command_line()
+    rng = random.Random(args.seed)
+
+    print("target_size\tprefilter\tguesses_per_sec")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        empty_file = os.path.join(temp_dir, 'empty.txt')
+        open(empty_file, 'w').close()
+
+        for size in args.sizes:
+            targets = [random_password(rng) for i in range(size)]
+            target_file = os.path.join(temp_dir, 'targets.txt')
+            with open(target_file, 'w') as file:
+                file.write('\n'.join(targets) + '\n')
+
+            ##--Guesses that miss are longer than any target so they can't match by accident
+            guess_file = os.path.join(temp_dir, 'guesses.txt')
+            with open(guess_file, 'w') as file:
+                for i in range(args.guesses):
+                    if rng.random() < args.hit_rate:
+                        file.write(rng.choice(targets) + '\n')
+                    else:
+                        file.write('miss' + str(i) + 'x' * 10 + '\n')
+
+            for extra_args in ([], ['--prefilter']):
+                load_time = time_checkpass(target_file, empty_file, extra_args)
+                total_time = time_checkpass(target_file, guess_file, extra_args)
+                rate = args.guesses / max(total_time - load_time, 1e-9)
+                print(str(size) + "\t" + ('yes' if extra_args else 'no') + "\t" + str(int(rate)))
+                sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
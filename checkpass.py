@@ -15,12 +15,73 @@
 ##--Including this to print error message if python < 3.0 is used
 from __future__ import print_function
 import sys
+import os
 import argparse
+import cProfile
+import pstats
+from array import array
 
 ##--Custom imports
 from checkpass.file_io import detect_file_encoding
 from checkpass.file_io import read_input_passwords
 from checkpass.file_io import write_uncracked_to_disk
+from checkpass.file_io import target_set_names
+from checkpass.file_io import is_ascii_compatible
+from checkpass.file_io import target_set_filename
+from checkpass.guess_reader import read_guess_blocks
+from checkpass.guess_reader import decode_guess_block
+from checkpass.guess_reader import report_input_errors
+from checkpass.guess_reader import skip_guesses
+from checkpass.guess_reader import DEFAULT_BLOCK_SIZE
+from checkpass.session_output import SessionOutput
+from checkpass.session_output import MultiSetOutput
+from checkpass.session_output import CURVE_TYPES
+from checkpass.async_writer import AsyncWriter
+from checkpass.async_writer import DEFAULT_FLUSH_INTERVAL
+from checkpass.parallel import match_guesses_parallel
+from checkpass.cracking_session import CrackingSession
+from checkpass.compare import StreamSession
+from checkpass.compare import compare_streams
+from checkpass.target_index import build_target_index
+from checkpass.target_index import is_target_index
+from checkpass.target_index import load_target_index
+from checkpass.prefilter import build_prefilter
+from checkpass.prefilter import DEFAULT_BITS_PER_ITEM
+from checkpass.dedup import create_deduplicator
+from checkpass.dedup import DEFAULT_DEDUP_MEMORY
+from checkpass.dedup import DEFAULT_DEDUP_ITEMS
+from checkpass.dedup import DEFAULT_DEDUP_FP_RATE
+from checkpass.checkpoint import Checkpointer
+from checkpass.checkpoint import load_checkpoint
+from checkpass.checkpoint import check_checkpoint_targets
+from checkpass.checkpoint import restore_checkpoint
+from checkpass.checkpoint import DEFAULT_CHECKPOINT_INTERVAL
+from checkpass.checkpoint import RESUME_OPTIONS
+from checkpass.checkpoint import RESUME_OVERRIDE_OPTIONS
+from checkpass.stats import SessionStats
+from checkpass.stats import DEFAULT_STATS_INTERVAL
+from checkpass.hashed import GuessHasher
+from checkpass.hashed import read_hash_targets
+from checkpass.hashed import HASH_TYPES
+from checkpass.export import export_results
+from checkpass.hit_log import HitLogRecorder
+from checkpass.hit_log import write_hit_log
+from checkpass.hit_log import load_hit_log
+from checkpass.hit_log import check_hit_logs
+from checkpass.hit_log import merge_hit_logs
+from checkpass.guess_server import GuessServer
+from checkpass.guess_server import send_guesses
+from checkpass.guess_server import SERVER_ORDERS
+from checkpass.estimate import read_sample_probabilities
+from checkpass.estimate import read_target_probabilities
+from checkpass.estimate import GuessNumberEstimator
+from checkpass.estimate import estimate_session
+from checkpass.estimate import DEFAULT_CONFIDENCE
+from checkpass.near_miss import NearMissIndex
+from checkpass.near_miss import parse_near_miss_types
+from checkpass.near_miss import NEAR_MISS_TYPES
+from checkpass.out_of_core import run_out_of_core
+from checkpass.out_of_core import DEFAULT_OUT_OF_CORE_MEMORY
 from checkpass.ret_types import RetType
 
 ###--Check for python3 and error out if not--##
@@ -29,30 +90,10 @@ if sys.version_info[0] < 3:
     sys.exit(1)
 
 
-########################################################################################
-# Holds the cracking session values
-########################################################################################
-class CrackingSession:
-    def __init__(self):
-        
-        ##Holds the plaintext passwords
-        ## The values of dict are (Password_String: [Number_of_Passwords, isCracked, Number_Of_Guesses_To_Crack])
-        self.passwords = dict()
-
-        ##Total number of passwords, (includes duplicates
-        self.num_passwords = 0
-
-        ##Total number of passwords cracked
-        self.num_cracked = 0
-
-        ##Total number of guesses so far
-        self.num_guesses = 0
-
-
 ####################################################
 # Parses the command line
 ####################################################
-def parse_command_line(command_line_results = {}):
+def parse_command_line(command_line_results = {}, defaults = None):
  
     parser = argparse.ArgumentParser(description='Used to test the effectiveness of a password cracking session against a known set of plaintext passwords')
 
@@ -61,7 +102,7 @@ def parse_command_line(command_line_results = {}):
     #######################################################
 
     ##Name of the file containing all the target passwords
-    parser.add_argument('--target','-t', help='The set of passwords to use as a target',metavar='TARGET_SET',required=True)
+    parser.add_argument('--target','-t', help='The set of passwords to use as a target. Can also be an index file created with the build-index command, or a gzip, bz2, xz or zstd compressed file which is decompressed as it is read. If more than one is specified they are all checked in a single pass, and the results for each are saved to their own files named after the target set. Required unless --resume is used',metavar='TARGET_SET',nargs='+',required=False,default=None)
 
     ##Name of the output file to save the results
     parser.add_argument('--output','-o', help='Filename to save the results to. Default is to output to stdout',metavar='OUTPUTFILE_NAME',required=False,default=None)
@@ -75,12 +116,117 @@ def parse_command_line(command_line_results = {}):
     ##Used to "continue" a cracking session from a previous test. Aka it just increments the number of cracked passwords recorded
     parser.add_argument('--start_cracked','-c', help='Used to continue a previous cracking session. Aka just starts with *cracked* number of passwords already',metavar='NUM_CRACKED',type=int,required=False,default=0)
     
+    ##How the points on the cracking curve are chosen
+    parser.add_argument('--curve', help='How to choose the points written to the cracking curve. percent: every time --curve_step percent of the passwords are cracked, (default 0.1). log: at guess numbers spaced evenly on a log scale, --curve_step points per decade, (default 20). interval: every --curve_step guesses, (default 1000000). Default is percent',choices=CURVE_TYPES,required=False,default='percent')
+
+    ##Spacing of the points on the cracking curve
+    parser.add_argument('--curve_step', help='Spacing of the points on the cracking curve. What it means depends on --curve',metavar='STEP',type=float,required=False,default=None)
+
     ##At the end of a session, save all uncracked passwords to the following file. Used to model multiple cracking sessions
     parser.add_argument('--uncracked_file','-u', help='Save all uncracked passwords at the end of the session to file',metavar='SAVEFILE',required=False,default=None)
     
+    ##Save the per password results in a columnar format
+    parser.add_argument('--export', help='At the end of the session save the count, cracked flag and guess number that cracked each unique target password to this directory as NumPy .npy files',metavar='DIRECTORY',required=False,default=None)
+
     ##Save all cracked passwords to this file in the order they were cracked
     parser.add_argument('--cracked_file', help='Save all cracked passwords to this file in the order they were cracked',metavar='SAVEFILE',required=False,default=None)
 
+    ##Also count guesses that come close to a target
+    parser.add_argument('--near_miss', help='Also write a second curve of the target passwords that a guess matches after both are normalized, (eg. P@ssw0rd1 matches password). TYPES is a comma separated list of the normalizations to use out of ' + ', '.join(NEAR_MISS_TYPES) + '. Default is all of them',metavar='TYPES',nargs='?',const=','.join(NEAR_MISS_TYPES),required=False,default=None)
+
+    ##Where the near miss curve is saved
+    parser.add_argument('--near_miss_output', help='Filename to save the near miss curve to. Default is the --output filename with _near_miss added',metavar='OUTPUTFILE_NAME',required=False,default=None)
+
+    ##Save which passwords were cracked by this slice of the guesses
+    parser.add_argument('--hit_log', help='At the end of the session save the passwords cracked and the guess number each was cracked at to this file. Used to split a guess stream across several machines, (set --start_count and --max_guesses to the slice each one checks), and combine the results with the merge command',metavar='HIT_LOG',required=False,default=None)
+
+    ##How often the output files are written out
+    parser.add_argument('--flush_interval', help='The results and cracked files are written out by a background thread and flushed every this many seconds. Set to 0 to write and flush them after every crack. Default is ' + str(DEFAULT_FLUSH_INTERVAL),metavar='SECONDS',type=float,required=False,default=DEFAULT_FLUSH_INTERVAL)
+
+    ##Number of bytes to read from stdin at a time. Setting it to 0 reads one guess at a time
+    parser.add_argument('--block_size', help='Number of bytes of guesses to read from stdin at a time. Set to 0 to read one guess at a time. Default is ' + str(DEFAULT_BLOCK_SIZE),metavar='NUM_BYTES',type=int,required=False,default=DEFAULT_BLOCK_SIZE)
+
+    ##Accept guesses from several producers instead of stdin
+    parser.add_argument('--listen', help='Instead of reading guesses from stdin, accept them from --producers producers that connect to this Unix domain socket. Guesses are sent with the send command, (or see checkpass/guess_server.py for the format)',metavar='SOCKET_PATH',required=False,default=None)
+
+    ##Read guesses from several named pipes instead of stdin
+    parser.add_argument('--fifo', help='Instead of reading guesses from stdin, read framed guesses from each of these named pipes. Each pipe is a producer, numbered in the order they are listed',metavar='FIFO_PATH',nargs='+',required=False,default=None)
+
+    ##Number of producers in server mode
+    parser.add_argument('--producers', help='Total number of producers, (including any --fifo pipes), when using --listen',metavar='NUM_PRODUCERS',type=int,required=False,default=None)
+
+    ##How the guesses from each producer are combined
+    parser.add_argument('--server_order', help='How to interleave the guesses from several producers. round_robin takes one batch from each producer in turn so the guess numbers are the same every run. arrival takes the batches in the order they come in. Default is round_robin',choices=SERVER_ORDERS,required=False,default='round_robin')
+
+    ##Number of processes to use to check guesses
+    parser.add_argument('--workers','-w', help='Number of worker processes to use to check guesses. Default is 1',metavar='NUM_WORKERS',type=int,required=False,default=1)
+
+    ##Number of processes to use to read in the target set
+    parser.add_argument('--load_workers', help='Number of processes to use to read in the target set. Speeds up loading very large target sets. Default is 1',metavar='NUM_WORKERS',type=int,required=False,default=1)
+
+    ##Copy a target index into memory rather than looking guesses up in the mapped file
+    parser.add_argument('--index_in_memory', help='When --target is an index file, copy its passwords into memory when loading it. Loading takes longer, (about 1 second per million unique passwords), but guesses are checked about 1.6 times as fast, so it is quicker whenever there are more guesses than targets', required=False, action="store_true")
+
+    ##Use a Bloom filter to skip over guesses that can't be a target
+    parser.add_argument('--prefilter', help='Build a Bloom filter from the target set to quickly skip guesses that do not match. Requires numpy. Mostly helps with large target sets and low hit rates', required=False, action="store_true")
+
+    ##Size of the Bloom filter
+    parser.add_argument('--prefilter_bits', help='Number of bits per target password to use for the prefilter. Default is ' + str(DEFAULT_BITS_PER_ITEM),metavar='NUM_BITS',type=int,required=False,default=DEFAULT_BITS_PER_ITEM)
+
+    ##Only count the first time a guess is made
+    parser.add_argument('--dedup', help='Only count the first time each guess is made, like a password cracker with a potfile. exact uses a set that spills to disk when it gets too large, approximate uses a Bloom filter and may throw out a few new guesses',choices=['exact','approximate'],required=False,default=None)
+
+    ##Memory limit for exact deduplication
+    parser.add_argument('--dedup_memory', help='Memory in MB to use for exact deduplication before spilling to disk. Default is ' + str(DEFAULT_DEDUP_MEMORY),metavar='MB',type=int,required=False,default=DEFAULT_DEDUP_MEMORY)
+
+    ##Where exact deduplication spills to
+    parser.add_argument('--dedup_dir', help='Directory to spill to for exact deduplication. Default is the system temp directory',metavar='DIRECTORY',required=False,default=None)
+
+    ##Size of the Bloom filter for approximate deduplication
+    parser.add_argument('--dedup_items', help='Expected number of unique guesses for approximate deduplication. Default is ' + str(DEFAULT_DEDUP_ITEMS),metavar='NUM_GUESSES',type=int,required=False,default=DEFAULT_DEDUP_ITEMS)
+
+    ##False positive rate for approximate deduplication
+    parser.add_argument('--dedup_fp_rate', help='Fraction of new guesses that can be mistaken for duplicates with approximate deduplication. Default is ' + str(DEFAULT_DEDUP_FP_RATE),metavar='RATE',type=float,required=False,default=DEFAULT_DEDUP_FP_RATE)
+
+    ##Sort the target set and guesses on disk instead of loading the target set into memory
+    parser.add_argument('--out_of_core', help='For target sets too large to fit in memory. Sorts the target set and the guesses on disk and merges them rather than loading the target set into memory. Guesses are matched as raw bytes, (like --byte_keys), and the uncracked file is written in sorted order. All the guesses are read before any results are written', required=False, action="store_true")
+
+    ##Memory limit for out of core mode
+    parser.add_argument('--out_of_core_memory', help='Memory in MB to use for each sort in out of core mode before spilling to disk. Default is ' + str(DEFAULT_OUT_OF_CORE_MEMORY),metavar='MB',type=int,required=False,default=DEFAULT_OUT_OF_CORE_MEMORY)
+
+    ##Where out of core mode writes its sorted runs
+    parser.add_argument('--out_of_core_dir', help='Directory to write the sorted runs to in out of core mode. Needs room for about twice the size of the target set and the guesses. Default is the system temp directory',metavar='DIRECTORY',required=False,default=None)
+
+    ##Periodically save the state of the session
+    parser.add_argument('--checkpoint', help='Periodically save the state of the session to this file so it can be continued later with --resume',metavar='CHECKPOINT_FILE',required=False,default=None)
+
+    ##How often to save checkpoints
+    parser.add_argument('--checkpoint_interval', help='Number of seconds between checkpoints. Default is ' + str(DEFAULT_CHECKPOINT_INTERVAL),metavar='SECONDS',type=int,required=False,default=DEFAULT_CHECKPOINT_INTERVAL)
+
+    ##Continue a session from a checkpoint
+    parser.add_argument('--resume', help='Continue the session saved in the --checkpoint file. The other options are restored from the checkpoint. --max_guesses, --uncracked_file and --export can be given again to change them, and the options that only affect speed or progress output can always be changed. Giving any other option a different value is an error. Guesses on stdin that were already checked are skipped over', required=False, action="store_true")
+
+    ##The guess generator was restarted from where it left off
+    parser.add_argument('--input_resumed', help='Used with --resume when the guesses on stdin start where the checkpoint left off, so none of them should be skipped', required=False, action="store_true")
+
+    ##Print out throughput stats while the session is running
+    parser.add_argument('--stats', help='Periodically print the guesses per second, cracks per second, time spent waiting on stdin, decode error rate and memory use to stderr', required=False, action="store_true")
+
+    ##Save the throughput stats to a file
+    parser.add_argument('--stats_file', help='Write the stats to this file as one JSON object per line instead of printing them to stderr',metavar='STATS_FILE',required=False,default=None)
+
+    ##How often to print the stats
+    parser.add_argument('--stats_interval', help='Number of seconds between printing stats. Default is ' + str(DEFAULT_STATS_INTERVAL),metavar='SECONDS',type=float,required=False,default=DEFAULT_STATS_INTERVAL)
+
+    ##Run the session under cProfile
+    parser.add_argument('--profile', help='Run the session under cProfile and print the functions that took the most time to stderr. Only the main process is profiled when using multiple workers', required=False, action="store_true")
+
+    ##The target sets are lists of hashes rather than plaintext passwords
+    parser.add_argument('--hash_type', help='The target sets are lists of unsalted hex encoded hashes of this type rather than plaintext passwords. Guesses are hashed before being checked. For ntlm guesses are decoded with --encoding first, (default UTF-8)',choices=HASH_TYPES,required=False,default=None)
+
+    ##Match guesses against the target set without decoding them first
+    parser.add_argument('--byte_keys', help='Match guesses against the target passwords as raw bytes instead of decoding them first. Only ASCII whitespace is stripped from the end of passwords and guesses, and target lines are only split on \\n. Without it target lines are also split on \\r and the other Unicode line breaks', required=False, action="store_true")
+
     ##Allow the user to manually set the encoding type of the training file
     parser.add_argument('--encoding','-e', help='Encoding format of th training file', metavar='ENCODING', required=False, default=None)
     
@@ -90,115 +236,877 @@ def parse_command_line(command_line_results = {}):
     try:
         for key, value in vars(parser.parse_args()).items():
             command_line_results[key] = value
+            ##--Saved so --resume can tell which options were given on the command line
+            if defaults is not None:
+                defaults[key] = parser.get_default(key)
 
     except Exception as error:
         print("Error parsing command line: " + str(error), file=sys.stderr)
         return RetType.COMMAND_LINE_ERROR
 
+    if command_line_results['resume']:
+        if command_line_results['checkpoint'] == None:
+            print("Error: --resume requires the --checkpoint file to resume from", file=sys.stderr)
+            return RetType.COMMAND_LINE_ERROR
+    elif command_line_results['target'] == None:
+        print("Error: --target is required", file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    if command_line_results['curve_step'] != None and command_line_results['curve_step'] <= 0:
+        print("Error: --curve_step must be more than 0", file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    if command_line_results['near_miss'] != None:
+        normalizations = []
+        if parse_near_miss_types(command_line_results['near_miss'], normalizations) != RetType.STATUS_OK:
+            return RetType.COMMAND_LINE_ERROR
+        command_line_results['near_miss'] = normalizations
+        if command_line_results['near_miss_output'] == None:
+            if command_line_results['output'] == None:
+                print("Error: --near_miss_output must be specified when the results are written to stdout", file=sys.stderr)
+                return RetType.COMMAND_LINE_ERROR
+            command_line_results['near_miss_output'] = target_set_filename(command_line_results['output'], 'near_miss')
+
+    if command_line_results['listen'] != None:
+        num_fifos = len(command_line_results['fifo'] or [])
+        if command_line_results['producers'] == None or command_line_results['producers'] <= num_fifos:
+            print("Error: --listen requires --producers to be set to more than the number of --fifo pipes", file=sys.stderr)
+            return RetType.COMMAND_LINE_ERROR
+
     return RetType.STATUS_OK
 
 
+####################################################
+# Parses the command line for the build-index command
+####################################################
+def parse_build_index_command_line(args, command_line_results = {}):
+
+    parser = argparse.ArgumentParser(prog='checkpass.py build-index', description='Compiles a target set into an index file that can be passed to --target. Loading an index is much faster than parsing the target set')
+
+    ##Name of the file containing all the target passwords
+    parser.add_argument('--target','-t', help='The set of passwords to build the index from. Can be compressed with gzip, bz2, xz or zstd',metavar='TARGET_SET',required=True)
+
+    ##Name of the index file to create
+    parser.add_argument('--output','-o', help='Filename to save the index to',metavar='INDEX_FILE',required=True)
+
+    ##Allow the user to manually set the encoding type of the training file
+    parser.add_argument('--encoding','-e', help='Encoding format of the target file', metavar='ENCODING', required=False, default=None)
+
+    try:
+        for key, value in vars(parser.parse_args(args)).items():
+            command_line_results[key] = value
+
+    except Exception as error:
+        print("Error parsing command line: " + str(error), file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    return RetType.STATUS_OK
+
+
+##################################################################
+# Main function for the build-index command
+##################################################################
+def build_index_main(args):
+    command_line_results = {}
+
+    if parse_build_index_command_line(args, command_line_results) != RetType.STATUS_OK:
+        print("Exiting", file=sys.stderr)
+        return
+
+    ##--Detect the file encoding of the target set
+    if command_line_results['encoding'] == None:
+        possible_encodings = []
+        print('Identifying character encoding of target file', file=sys.stderr)
+        if detect_file_encoding(command_line_results['target'], possible_encodings) != RetType.STATUS_OK:
+            print("Error detecting file encoding, exiting", file=sys.stderr)
+            return
+    else:
+        possible_encodings = [command_line_results['encoding']]
+
+    print('Building the target index', file=sys.stderr)
+    if build_target_index(command_line_results['target'], command_line_results['output'], file_encoding = possible_encodings[0]) != RetType.STATUS_OK:
+        print('Error building the target index. Exiting', file=sys.stderr)
+        return
+
+
+####################################################
+# Parses the command line for the compare command
+####################################################
+def parse_compare_command_line(args, command_line_results = {}):
+
+    parser = argparse.ArgumentParser(prog='checkpass.py compare', description='Checks several guess streams against the same target set, which is only loaded once. Each stream gets its own results files')
+
+    ##Name of the file containing all the target passwords
+    parser.add_argument('--target','-t', help='The set of passwords to use as a target. Can also be an index file created with the build-index command',metavar='TARGET_SET',required=True)
+
+    ##The guess streams to compare
+    parser.add_argument('--guesses','-g', help='The guess streams to compare, as NAME=FILE or just FILE. Files can be named pipes, or - for stdin',metavar='NAME=FILE',nargs='+',required=True)
+
+    ##Name of the output file to save the results
+    parser.add_argument('--output','-o', help='Filename to base the results filenames on. The name of each stream is added before the file extension',metavar='OUTPUTFILE_NAME',required=True)
+
+    ##Maximum number of guesses to allow for each stream
+    parser.add_argument('--max_guesses','-m', help='If specified, limits the number of guesses from each stream',metavar='MAX_GUESSES',type=int,required=False,default=None)
+
+    ##At the end of a session, save all uncracked passwords
+    parser.add_argument('--uncracked_file','-u', help='Save the uncracked passwords for each stream at the end of the session',metavar='SAVEFILE',required=False,default=None)
+
+    ##Save all cracked passwords in the order they were cracked
+    parser.add_argument('--cracked_file', help='Save the cracked passwords for each stream in the order they were cracked',metavar='SAVEFILE',required=False,default=None)
+
+    ##Number of bytes to read from each stream at a time
+    parser.add_argument('--block_size', help='Number of bytes of guesses to read from each stream at a time. Default is ' + str(DEFAULT_BLOCK_SIZE),metavar='NUM_BYTES',type=int,required=False,default=DEFAULT_BLOCK_SIZE)
+
+    ##Number of processes to use to read in the target set
+    parser.add_argument('--load_workers', help='Number of processes to use to read in the target set. Default is 1',metavar='NUM_WORKERS',type=int,required=False,default=1)
+
+    ##How the points on the cracking curve are chosen
+    parser.add_argument('--curve', help='How to choose the points written to the cracking curve. See checkpass.py --help',choices=CURVE_TYPES,required=False,default='percent')
+    parser.add_argument('--curve_step', help='Spacing of the points on the cracking curve. What it means depends on --curve',metavar='STEP',type=float,required=False,default=None)
+
+    ##The target set is a list of hashes
+    parser.add_argument('--hash_type', help='The target set is a list of unsalted hex encoded hashes of this type',choices=HASH_TYPES,required=False,default=None)
+
+    ##Match guesses against the target set without decoding them first
+    parser.add_argument('--byte_keys', help='Match guesses against the target passwords as raw bytes instead of decoding them first. Target lines are only split on \\n, (see checkpass.py --help)', required=False, action="store_true")
+
+    ##Allow the user to manually set the encoding type of the training file
+    parser.add_argument('--encoding','-e', help='Encoding format of the target file', metavar='ENCODING', required=False, default=None)
+
+    ##Prints debugging info
+    parser.add_argument('--verbose','-v', help='Prints debugging messages', required=False, action="store_true")
+
+    try:
+        for key, value in vars(parser.parse_args(args)).items():
+            command_line_results[key] = value
+
+    except Exception as error:
+        print("Error parsing command line: " + str(error), file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    return RetType.STATUS_OK
+
+
+##################################################################
+# Main function for the compare command
+##################################################################
+def compare_main(args):
+    command_line_results = {}
+
+    if parse_compare_command_line(args, command_line_results) != RetType.STATUS_OK:
+        print("Exiting", file=sys.stderr)
+        return
+
+    ##--Work out the name of each stream
+    stream_names = []
+    stream_files = []
+    for spec in command_line_results['guesses']:
+        name, separator, filename = spec.partition('=')
+        if not separator:
+            filename = spec
+            name = 'stdin' if spec == '-' else target_set_names([spec])[0]
+        if name in stream_names:
+            name = name + "_" + str(len(stream_names) + 1)
+        stream_names.append(name)
+        stream_files.append(filename)
+
+    ##--Load the target set once for all the streams
+    cs = CrackingSession()
+    print('Loading the target set ' + command_line_results['target'], file=sys.stderr)
+    if cs.load_targets(command_line_results['target'], encoding = command_line_results['encoding'], byte_keys = command_line_results['byte_keys'],
+            hash_type = command_line_results['hash_type'], num_workers = command_line_results['load_workers']) != RetType.STATUS_OK:
+        print('Error reading in target file. Exiting', file=sys.stderr)
+        return
+    print('Done parsing target file. Passwords to crack =', cs.num_passwords, file=sys.stderr)
+
+    open_files = []
+    streams = []
+    try:
+        for name, filename in zip(stream_names, stream_files):
+            output_file = _open_output(target_set_filename(command_line_results['output'], name))
+            open_files.append(output_file)
+            cracked_file = None
+            if command_line_results['cracked_file'] != None:
+                cracked_file = _open_output(target_set_filename(command_line_results['cracked_file'], name))
+                open_files.append(cracked_file)
+
+            if filename == '-':
+                guess_file = sys.stdin.buffer
+            else:
+                guess_file = open(filename, 'rb')
+                open_files.append(guess_file)
+
+            report = SessionOutput(output_file, cracked_file, cs.num_passwords, encoding = cs.encoding, byte_keys = cs.byte_keys,
+                curve = command_line_results['curve'], curve_step = command_line_results['curve_step'])
+            report.start(0, 0)
+            streams.append((StreamSession(cs, name, report), guess_file))
+
+    except Exception as error:
+        print("Error opening file. Error message: " + str(error), file=sys.stderr)
+        for file in open_files:
+            file.close()
+        return
+
+    print('Processing input', file=sys.stderr)
+    compare_streams(streams, max_guesses = command_line_results['max_guesses'], verbose = command_line_results['verbose'],
+        block_size = command_line_results['block_size'])
+
+    for stream, guess_file in streams:
+        stream.report.finish(stream.num_guesses, stream.num_cracked)
+        print(stream.name + ': guesses ' + str(stream.num_guesses) + ' cracked ' + str(stream.num_cracked), file=sys.stderr)
+    for file in open_files:
+        file.close()
+
+    #Print to uncracked file if that was specified
+    if command_line_results['uncracked_file'] != None:
+        for stream, guess_file in streams:
+            write_uncracked_to_disk(cs, target_set_filename(command_line_results['uncracked_file'], stream.name), file_encoding = cs.encoding, uncracked = stream.uncracked())
+
+
+####################################################
+# Parses the command line for the send command
+####################################################
+def parse_send_command_line(args, command_line_results = {}):
+
+    parser = argparse.ArgumentParser(prog='checkpass.py send', description='Sends the guesses on stdin to a session started with --listen or --fifo')
+
+    ##Where to send the guesses
+    parser.add_argument('--to', help='The socket path passed to --listen, or one of the --fifo pipes',metavar='PATH',required=True)
+
+    ##Which producer this is
+    parser.add_argument('--id', help='Producer id, from 0 to one less than --producers. Ignored when sending to a named pipe. Default is 0',metavar='PRODUCER_ID',type=int,required=False,default=0)
+
+    ##Number of bytes to send at a time
+    parser.add_argument('--block_size', help='Number of bytes of guesses to send in each batch. Default is ' + str(DEFAULT_BLOCK_SIZE),metavar='NUM_BYTES',type=int,required=False,default=DEFAULT_BLOCK_SIZE)
+
+    try:
+        for key, value in vars(parser.parse_args(args)).items():
+            command_line_results[key] = value
+
+    except Exception as error:
+        print("Error parsing command line: " + str(error), file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    return RetType.STATUS_OK
+
+
+##################################################################
+# Main function for the send command
+##################################################################
+def send_main(args):
+    command_line_results = {}
+
+    if parse_send_command_line(args, command_line_results) != RetType.STATUS_OK:
+        print("Exiting", file=sys.stderr)
+        return
+
+    try:
+        send_guesses(sys.stdin.buffer, command_line_results['to'], producer_id = command_line_results['id'], block_size = command_line_results['block_size'])
+    except (IOError, BrokenPipeError) as error:
+        print("Error sending guesses to " + command_line_results['to'] + ". Error message: " + str(error), file=sys.stderr)
+
+
+####################################################
+# Parses the command line for the estimate command
+####################################################
+def parse_estimate_command_line(args, command_line_results = {}):
+
+    parser = argparse.ArgumentParser(prog='checkpass.py estimate', description='Estimates the cracking curve of a generator that gives each guess a probability, using the Monte Carlo method of Dell\'Amico and Filippone rather than making the guesses. See checkpass/estimate.py')
+
+    ##Name of the file containing all the target passwords
+    parser.add_argument('--target','-t', help='The set of passwords to use as a target',metavar='TARGET_SET',required=True)
+
+    ##Guesses sampled from the generator
+    parser.add_argument('--samples', help='Guesses sampled at random from the generator, one per line as GUESS<tab>PROBABILITY, (or just PROBABILITY)',metavar='SAMPLE_FILE',required=True)
+
+    ##The generator's probability for each target password
+    parser.add_argument('--probabilities','-p', help='The probability the generator gives each target password, one per line as PASSWORD<tab>PROBABILITY. Passwords that aren\'t listed are never cracked',metavar='PROBABILITY_FILE',required=True)
+
+    ##Name of the output file to save the results
+    parser.add_argument('--output','-o', help='Filename to save the estimated curve to. Default is to output to stdout',metavar='OUTPUTFILE_NAME',required=False,default=None)
+
+    ##Maximum number of guesses to estimate out to
+    parser.add_argument('--max_guesses','-m', help='If specified, only count passwords cracked within this many guesses',metavar='MAX_GUESSES',type=int,required=False,default=None)
+
+    ##Confidence level of the intervals
+    parser.add_argument('--confidence', help='Confidence level of the intervals added to each point of the curve. Default is ' + str(DEFAULT_CONFIDENCE),metavar='LEVEL',type=float,required=False,default=DEFAULT_CONFIDENCE)
+
+    ##How the points on the cracking curve are chosen
+    parser.add_argument('--curve', help='How to choose the points written to the cracking curve. See checkpass.py --help',choices=CURVE_TYPES,required=False,default='percent')
+    parser.add_argument('--curve_step', help='Spacing of the points on the cracking curve. What it means depends on --curve',metavar='STEP',type=float,required=False,default=None)
+
+    ##At the end of a session, save all uncracked passwords
+    parser.add_argument('--uncracked_file','-u', help='Save the passwords that wouldn\'t be cracked to file',metavar='SAVEFILE',required=False,default=None)
+
+    ##Save all cracked passwords with their estimated guess number
+    parser.add_argument('--cracked_file', help='Save the passwords that would be cracked to this file with their estimated guess numbers, in the order they would be cracked',metavar='SAVEFILE',required=False,default=None)
+
+    ##Save the per password results in a columnar format
+    parser.add_argument('--export', help='Save the count, cracked flag and estimated guess number of each unique target password to this directory as NumPy .npy files',metavar='DIRECTORY',required=False,default=None)
+
+    ##Match passwords without decoding them first
+    parser.add_argument('--byte_keys', help='Match the passwords in the probability file against the target passwords as raw bytes. Target lines are only split on \\n, (see checkpass.py --help)', required=False, action="store_true")
+
+    ##Allow the user to manually set the encoding type of the training file
+    parser.add_argument('--encoding','-e', help='Encoding format of the target file', metavar='ENCODING', required=False, default=None)
+
+    try:
+        for key, value in vars(parser.parse_args(args)).items():
+            command_line_results[key] = value
+
+    except Exception as error:
+        print("Error parsing command line: " + str(error), file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    if not 0 < command_line_results['confidence'] < 1:
+        print("Error: --confidence must be between 0 and 1", file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    if command_line_results['curve_step'] != None and command_line_results['curve_step'] <= 0:
+        print("Error: --curve_step must be more than 0", file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    return RetType.STATUS_OK
+
+
+##################################################################
+# Main function for the estimate command
+##################################################################
+def estimate_main(args):
+    command_line_results = {}
+
+    if parse_estimate_command_line(args, command_line_results) != RetType.STATUS_OK:
+        print("Exiting", file=sys.stderr)
+        return
+
+    cs = CrackingSession()
+    print('Loading the target set ' + command_line_results['target'], file=sys.stderr)
+    if cs.load_targets(command_line_results['target'], encoding = command_line_results['encoding'], byte_keys = command_line_results['byte_keys']) != RetType.STATUS_OK:
+        print('Error reading in target file. Exiting', file=sys.stderr)
+        return
+    print('Done parsing target file. Passwords to crack =', cs.num_passwords, file=sys.stderr)
+
+    print('Reading the samples', file=sys.stderr)
+    samples = array('d')
+    if read_sample_probabilities(command_line_results['samples'], samples) != RetType.STATUS_OK:
+        print('Error reading the samples. Exiting', file=sys.stderr)
+        return
+    print('Number of samples = ' + str(len(samples)), file=sys.stderr)
+    estimator = GuessNumberEstimator(samples, confidence = command_line_results['confidence'])
+
+    print('Reading the target probabilities', file=sys.stderr)
+    probabilities = array('d', bytes(8 * len(cs.passwords)))
+    if read_target_probabilities(command_line_results['probabilities'], cs, probabilities) != RetType.STATUS_OK:
+        print('Error reading the target probabilities. Exiting', file=sys.stderr)
+        return
+
+    open_files = []
+    try:
+        output_file = sys.stdout
+        if command_line_results['output'] != None:
+            output_file = _open_output(command_line_results['output'])
+            open_files.append(output_file)
+        cracked_file = None
+        if command_line_results['cracked_file'] != None:
+            cracked_file = _open_output(command_line_results['cracked_file'])
+            open_files.append(cracked_file)
+
+    except Exception as error:
+        print("Error opening file. Error message: " + str(error), file=sys.stderr)
+        for file in open_files:
+            file.close()
+        return
+
+    estimate_session(cs, estimator, probabilities, output_file, cracked_file, max_guesses = command_line_results['max_guesses'],
+        curve = command_line_results['curve'], curve_step = command_line_results['curve_step'])
+    print('Estimated guesses ' + str(cs.num_guesses) + ' cracked ' + str(cs.num_cracked), file=sys.stderr)
+    for file in open_files:
+        file.close()
+
+    #Print to uncracked file if that was specified
+    if command_line_results['uncracked_file'] != None:
+        write_uncracked_to_disk(cs, command_line_results['uncracked_file'], file_encoding = cs.encoding)
+
+    ##--Save the per password results for graphing
+    if command_line_results['export'] != None:
+        export_results(cs, command_line_results['export'])
+
+
+####################################################
+# Parses the command line for the merge command
+####################################################
+def parse_merge_command_line(args, command_line_results = {}):
+
+    parser = argparse.ArgumentParser(prog='checkpass.py merge', description='Combines the hit logs saved with --hit_log from sessions that each checked a slice of the same guess stream. The results are the same as checking all the guesses in one session')
+
+    ##The hit logs to merge
+    parser.add_argument('--hit_logs','-l', help='The hit logs from each slice',metavar='HIT_LOG',nargs='+',required=True)
+
+    ##Name of the file containing all the target passwords
+    parser.add_argument('--target','-t', help='The target sets the slices were checked against, in the same order. Default is the target sets saved in the hit logs',metavar='TARGET_SET',nargs='+',required=False,default=None)
+
+    ##Name of the output file to save the results
+    parser.add_argument('--output','-o', help='Filename to save the results to. Default is to output to stdout',metavar='OUTPUTFILE_NAME',required=False,default=None)
+
+    ##At the end of a session, save all uncracked passwords
+    parser.add_argument('--uncracked_file','-u', help='Save all the passwords that weren\'t cracked by any slice to file',metavar='SAVEFILE',required=False,default=None)
+
+    ##Save all cracked passwords in the order they were cracked
+    parser.add_argument('--cracked_file', help='Save all cracked passwords to this file in the order they were cracked',metavar='SAVEFILE',required=False,default=None)
+
+    ##Save the per password results in a columnar format
+    parser.add_argument('--export', help='Save the count, cracked flag and guess number that cracked each unique target password to this directory as NumPy .npy files',metavar='DIRECTORY',required=False,default=None)
+
+    ##Number of processes to use to read in the target set
+    parser.add_argument('--load_workers', help='Number of processes to use to read in the target set. Default is 1',metavar='NUM_WORKERS',type=int,required=False,default=1)
+
+    ##How the points on the cracking curve are chosen
+    parser.add_argument('--curve', help='How to choose the points written to the cracking curve. See checkpass.py --help',choices=CURVE_TYPES,required=False,default='percent')
+    parser.add_argument('--curve_step', help='Spacing of the points on the cracking curve. What it means depends on --curve',metavar='STEP',type=float,required=False,default=None)
+
+    try:
+        for key, value in vars(parser.parse_args(args)).items():
+            command_line_results[key] = value
+
+    except Exception as error:
+        print("Error parsing command line: " + str(error), file=sys.stderr)
+        return RetType.COMMAND_LINE_ERROR
+
+    return RetType.STATUS_OK
+
+
+##################################################################
+# Main function for the merge command
+##################################################################
+def merge_main(args):
+    command_line_results = {}
+
+    if parse_merge_command_line(args, command_line_results) != RetType.STATUS_OK:
+        print("Exiting", file=sys.stderr)
+        return
+
+    hit_logs = []
+    for filename in command_line_results['hit_logs']:
+        hit_log = {}
+        if load_hit_log(filename, hit_log) != RetType.STATUS_OK:
+            print('Error loading the hit logs. Exiting', file=sys.stderr)
+            return
+        hit_logs.append(hit_log)
+
+    ##--Load the target set the same way the slices did so the slots line up
+    header = hit_logs[0]['header']
+    targets = command_line_results['target'] or header['targets']
+    cs = CrackingSession()
+    print('Loading the target set', file=sys.stderr)
+    if cs.load_targets(targets, encoding = header['encoding'], byte_keys = header['byte_keys'], hash_type = header['hash_type'],
+            num_workers = command_line_results['load_workers']) != RetType.STATUS_OK:
+        print('Error reading in target file. Exiting', file=sys.stderr)
+        return
+    print('Done parsing target file. Passwords to crack =', cs.num_passwords, file=sys.stderr)
+
+    if check_hit_logs(cs, hit_logs) != RetType.STATUS_OK:
+        print('Error merging the hit logs. Exiting', file=sys.stderr)
+        return
+
+    ##--Each target set gets its own output files, the same as when checking the guesses
+    if cs.passwords.sets and command_line_results['output'] == None:
+        print("Error: --output must be specified when using more than one target set", file=sys.stderr)
+        return
+    set_names = [target_set.name for target_set in cs.passwords.sets] or [None]
+
+    open_files = []
+    outputs = []
+    try:
+        for name in set_names:
+            output_file = sys.stdout
+            if command_line_results['output'] != None:
+                output_file = _open_output(target_set_filename(command_line_results['output'], name) if name else command_line_results['output'])
+                open_files.append(output_file)
+            cracked_file = None
+            if command_line_results['cracked_file'] != None:
+                cracked_file = _open_output(target_set_filename(command_line_results['cracked_file'], name) if name else command_line_results['cracked_file'])
+                open_files.append(cracked_file)
+            num_passwords = cs.passwords.sets[len(outputs)].num_passwords if name else cs.num_passwords
+            outputs.append(SessionOutput(output_file, cracked_file, num_passwords, encoding = cs.encoding, byte_keys = cs.byte_keys,
+                curve = command_line_results['curve'], curve_step = command_line_results['curve_step']))
+
+    except Exception as error:
+        print("Error opening file. Error message: " + str(error), file=sys.stderr)
+        for file in open_files:
+            file.close()
+        return
+
+    if cs.passwords.sets:
+        report = MultiSetOutput(cs.passwords.sets, outputs)
+    else:
+        report = outputs[0]
+
+    print('Merging ' + str(len(hit_logs)) + ' hit logs', file=sys.stderr)
+    merge_hit_logs(cs, hit_logs, report)
+    print('Guesses ' + str(cs.num_guesses) + ' cracked ' + str(cs.num_cracked), file=sys.stderr)
+    for file in open_files:
+        file.close()
+
+    #Print to uncracked file if that was specified
+    if command_line_results['uncracked_file'] != None:
+        if cs.passwords.sets:
+            for target_set in cs.passwords.sets:
+                write_uncracked_to_disk(cs, target_set_filename(command_line_results['uncracked_file'], target_set.name), file_encoding = cs.encoding, target_set = target_set)
+        else:
+            write_uncracked_to_disk(cs, command_line_results['uncracked_file'], file_encoding = cs.encoding)
+
+    ##--Save the per password results for graphing
+    if command_line_results['export'] != None:
+        export_results(cs, command_line_results['export'])
+
+
+##################################################################
+# Main function for out of core mode
+#
+# The target set is never loaded into a CrackingSession, so the
+# options that work on one aren't supported
+##################################################################
+def out_of_core_main(command_line_results):
+    unsupported = ['prefilter', 'dedup', 'checkpoint', 'hash_type', 'export']
+    for option in unsupported:
+        if command_line_results[option]:
+            print("Error: --" + option + " can't be used with --out_of_core", file=sys.stderr)
+            return
+    if command_line_results['workers'] > 1:
+        print("Error: --workers can't be used with --out_of_core", file=sys.stderr)
+        return
+
+    targets = command_line_results['target']
+    if len(targets) > 1 or is_target_index(targets[0]):
+        print("Error: --out_of_core only supports a single plaintext target set", file=sys.stderr)
+        return
+    if command_line_results['out_of_core_memory'] <= 0:
+        print("Error: --out_of_core_memory must be more than 0", file=sys.stderr)
+        return
+
+    ##--Detect the file encoding of the target set
+    if command_line_results['encoding'] == None:
+        possible_encodings = []
+        print('Identifying character encoding of target file ' + targets[0], file=sys.stderr)
+        if detect_file_encoding(targets[0], possible_encodings) != RetType.STATUS_OK:
+            print("Error detecting file encoding, exiting", file=sys.stderr)
+            return
+    else:
+        possible_encodings = [command_line_results['encoding']]
+
+    flush_interval = command_line_results['flush_interval']
+    open_files = []
+    try:
+        if command_line_results['output'] != None:
+            output_file = _open_output(command_line_results['output'], flush_interval = flush_interval)
+            open_files.append(output_file)
+        else:
+            output_file = sys.stdout
+
+        cracked_file = None
+        if command_line_results['cracked_file'] != None:
+            cracked_file = _open_output(command_line_results['cracked_file'], flush_interval = flush_interval)
+            open_files.append(cracked_file)
+
+    except Exception as error:
+        print("Error opening file. Error message: " + str(error), file=sys.stderr)
+        for file in open_files:
+            file.close()
+        return
+
+    run_out_of_core(targets[0], output_file, cracked_file, uncracked_file = command_line_results['uncracked_file'],
+        file_encoding = possible_encodings[0], memory_limit = command_line_results['out_of_core_memory'],
+        temp_dir = command_line_results['out_of_core_dir'], start_count = command_line_results['start_count'],
+        start_cracked = command_line_results['start_cracked'], max_guesses = command_line_results['max_guesses'],
+        block_size = command_line_results['block_size'], curve = command_line_results['curve'],
+        curve_step = command_line_results['curve_step'])
+
+    for file in open_files:
+        file.close()
+
+
 ##################################################################
 # Checks the input and sees if it would crack passwords in the
 # target set
 ##################################################################
-def test_cracking_session(cs, encoding = "UTF-8", start_count = 0, start_cracked = 0, max_guesses = None, output = None, save_cracked = None, verbose = False):
+def test_cracking_session(cs, encoding = "UTF-8", start_count = 0, start_cracked = 0, max_guesses = None, output = None, save_cracked = None, verbose = False, block_size = DEFAULT_BLOCK_SIZE, num_workers = 1, resume = None, flush_interval = DEFAULT_FLUSH_INTERVAL, curve = 'percent', curve_step = None, hit_log = None, targets = None, guess_blocks = None, near_miss_output = None):
 
     ##--Initialize the session--##
-    cs.num_guesses = start_count
-    cs.num_cracked = start_cracked
-    cs.num_passwords = cs.num_passwords + start_cracked
-
-    if output:
-        try:
-            output_file = open(output, 'w')
-        except Exception as error:
-            print("Error opening file. Error message: " + str(error), file=sys.stderr)
-            return RetType.FILE_IO_ERROR
+    if resume is None:
+        cs.num_guesses = start_count
+        cs.num_cracked = start_cracked
+        cs.num_passwords = cs.num_passwords + start_cracked
+        for target_set in cs.passwords.sets:
+            target_set.num_cracked = start_cracked
+            target_set.num_passwords = target_set.num_passwords + start_cracked
+
+    ##--Or pick up where the checkpoint left off
     else:
-        output_file = sys.stdout
+        restore_checkpoint(cs, resume)
+
+    ##--Each target set gets its own output files when checking more than one at a time
+    ##--Each item is (output_filename, cracked_filename, num_passwords)
+    if cs.passwords.sets:
+        destinations = []
+        for target_set in cs.passwords.sets:
+            set_cracked = None
+            if save_cracked:
+                set_cracked = target_set_filename(save_cracked, target_set.name)
+            destinations.append((target_set_filename(output, target_set.name), set_cracked, target_set.num_passwords))
+    else:
+        destinations = [(output, save_cracked, cs.num_passwords)]
+
+    ##--When resuming, the output files are cut back to where they were at the checkpoint
+    ##--and added on to
+    if resume is None:
+        saved_outputs = [{'output_offset': None, 'cracked_offset': None, 'cur_step_limit': None}] * len(destinations)
+    else:
+        saved_outputs = resume['header']['outputs']
+
+    open_files = []
+    outputs = []
+    try:
+        for (output_name, cracked_name, num_passwords), saved in zip(destinations, saved_outputs):
+            if output_name:
+                output_file = _open_output(output_name, saved['output_offset'], flush_interval)
+                open_files.append(output_file)
+            else:
+                output_file = sys.stdout
+
+            cracked_file = None
+            if cracked_name:
+                cracked_file = _open_output(cracked_name, saved['cracked_offset'], flush_interval)
+                open_files.append(cracked_file)
 
-    if save_cracked:
-        try:
-            cracked_file = open(save_cracked, 'w')
-        except Exception as error:
-            print("Error opening file. Error message: " + str(error), file=sys.stderr)
-            return RetType.FILE_IO_ERROR
+            outputs.append(SessionOutput(output_file, cracked_file, num_passwords, encoding = encoding, byte_keys = cs.byte_keys,
+                curve = curve, curve_step = curve_step))
+            if saved['cur_step_limit'] is not None:
+                outputs[-1].cur_step_limit = saved['cur_step_limit']
 
-    ## I only want to print out 1000 items + the last count to make graphing easier
-    step_size = cs.num_passwords * 0.001
-    step_size = int(step_size)
-    if step_size == 0:
-        step_size = 1
-    cur_step_limit = step_size
+            ##--The points up to the checkpoint have already been written
+            if resume is not None:
+                outputs[-1].set_curve_index(0, cs.num_guesses)
+
+        ##--The near miss curve gets its own output
+        near_report = None
+        if cs.near_miss is not None:
+            near_file = _open_output(near_miss_output, flush_interval = flush_interval)
+            open_files.append(near_file)
+            near_report = SessionOutput(near_file, None, cs.num_passwords, encoding = encoding, byte_keys = cs.byte_keys,
+                curve = curve, curve_step = curve_step)
+
+    except Exception as error:
+        print("Error opening file. Error message: " + str(error), file=sys.stderr)
+        for file in open_files:
+            file.close()
+        return RetType.FILE_IO_ERROR
+
+    if cs.passwords.sets:
+        report = MultiSetOutput(cs.passwords.sets, outputs)
+    else:
+        report = outputs[0]
+
+    ##--Keep track of the debug strings, (and the guesses that cracked hashes), for the hit log
+    if hit_log is not None:
+        report = HitLogRecorder(report, encoding = encoding, save_guesses = cs.hasher is not None)
+
+    ##--Print out the inital stats of the crackign session
+    if resume is None:
+        report.start(cs.num_guesses, cs.num_cracked)
+        if near_report is not None:
+            near_report.start(cs.num_guesses, cs.near_miss.num_cracked)
+
+    if cs.checkpoint is not None:
+        cs.checkpoint.start(outputs)
+    if cs.stats is not None:
+        cs.stats.start(cs)
+
+    if num_workers > 1:
+        ret_value = match_guesses_parallel(cs, report, num_workers, encoding = encoding, max_guesses = max_guesses, verbose = verbose, block_size = block_size, guess_blocks = guess_blocks)
+    else:
+        ret_value = match_guesses(cs, report, encoding = encoding, max_guesses = max_guesses, verbose = verbose, block_size = block_size, guess_blocks = guess_blocks, near_report = near_report)
+
+    ##--Save where the session ended up so it can be continued with more guesses
+    if cs.checkpoint is not None:
+        cs.checkpoint.close(cs)
+
+    ##--Do final cleanup and printout for this cracking session
+    report.finish(cs.num_guesses, cs.num_cracked)
+    if near_report is not None:
+        near_report.finish(cs.num_guesses, cs.near_miss.num_cracked)
+        print("Near misses cracked: " + str(cs.near_miss.num_cracked), file=sys.stderr)
+    if hit_log is not None:
+        write_hit_log(hit_log, cs, start_count, report, targets = targets)
+    if cs.stats is not None:
+        cs.stats.report(cs, final = True)
+    if cs.dedup is not None:
+        print("Duplicate guesses removed: " + str(cs.dedup.num_duplicates), file=sys.stderr)
+        cs.dedup.close()
+    for file in open_files:
+        file.close()
+
+    return ret_value
+
+
+##################################################################
+# Opens an output file for writing
+#
+# If offset is specified the file is being resumed from a
+# checkpoint, so anything written after the checkpoint is
+# thrown away and the file is added on to
+#
+# If flush_interval is more than 0 the file is written by a
+# background thread, (see checkpass/async_writer.py)
+##################################################################
+def _open_output(filename, offset = None, flush_interval = 0):
+    if offset is None:
+        file = open(filename, 'w')
+    else:
+        os.truncate(filename, offset)
+        file = open(filename, 'a')
+
+    if flush_interval > 0:
+        return AsyncWriter(file, flush_interval = flush_interval)
+    return file
+
+
+##################################################################
+# Reads guesses from stdin and checks them against the target set
+#
+# This is the main matching loop for a single process
+#
+# guess_blocks is an iterable of blocks of guesses to check
+# instead of stdin, (see checkpass/guess_server.py)
+#
+# near_report is the SessionOutput for the near miss curve when
+# cs.near_miss is set, (see checkpass/near_miss.py)
+##################################################################
+def match_guesses(cs, report, encoding = "UTF-8", max_guesses = None, verbose = False, block_size = DEFAULT_BLOCK_SIZE, guess_blocks = None, near_report = None):
 
     ##--Number of errors occured while parsing input guesses
     num_input_errors = 0
 
-    ##--Print out the inital stats of the crackign session
-    print(cs.num_guesses,"\t",cs.num_cracked, file=output_file)
-
-    while True:
-        ##--Doing it this way so inputting weird encoding won't crash the program
-        try:
-            guess = sys.stdin.buffer.readline()
-        except Exception as error:
-            print ("halting due to :" + str(error), file=sys.stderr)
-
-        cs.num_guesses = cs.num_guesses + 1
-
-        ##--I'm assuming the  
-        try:
-            guess = guess.decode(encoding).rstrip()
-
-        ##--Handle errors parsing input guesses
-        except:
-            num_input_errors = num_input_errors + 1
-            if verbose:
-                print("error decoding input guess. Total number of errors = " + str(num_input_errors), file=sys.stderr)
+    ##--Local references to keep the inner loop tight
+    lookup = cs.passwords.index.get
+    hasher = cs.hasher
+    if hasher is not None:
+        lookup = hasher.lookup_function(lookup)
+    counts = cs.passwords.counts
+    cracked = cs.passwords.cracked
+    guess_cracked = cs.passwords.guess_cracked
+    prefilter = cs.prefilter
+    byte_keys = cs.byte_keys
+    if byte_keys:
+        debug_marker = b"CHECKPASSDEBUG"
+    else:
+        debug_marker = "CHECKPASSDEBUG"
+    done = False
+
+    near_miss = cs.near_miss
+    if near_miss is not None:
+        normalize = near_miss.normalize
+        near_lookup = near_miss.index.get
+        near_counts = near_miss.counts
+        near_cracked = near_miss.cracked
+
+    blocks = guess_blocks
+    if blocks is None:
+        blocks = read_guess_blocks(sys.stdin.buffer, block_size)
+    if cs.stats is not None:
+        blocks = cs.stats.timed_blocks(blocks)
+    if cs.dedup is not None:
+        blocks = cs.dedup.filter_blocks(blocks)
+
+    for block in blocks:
+
+        ##--Only check the guesses up to the maximum number allowed
+        num_guesses = block.count(b'\n') + 1
+        if max_guesses != None and cs.num_guesses + num_guesses >= max_guesses:
+            num_guesses = max(max_guesses - cs.num_guesses, 0)
+            block = b'\n'.join(block.split(b'\n', num_guesses)[:num_guesses])
+            done = True
+
+        ##--Checking for debug strings is only done if one is in the block
+        has_debug = b"CHECKPASSDEBUG" in block
+
+        base_count = cs.num_guesses
+
+        ##--Only look at the guesses that made it through the prefilter
+        to_check = None
+        if hasher is not None and not has_debug:
+            to_check = hasher.candidate_guesses(block, base_count, num_guesses)
+        elif prefilter is not None and not has_debug:
+            to_check = prefilter.candidate_guesses(block, base_count, num_guesses, None if byte_keys else encoding)
+
+        ##--Otherwise look at every guess in the block
+        if to_check is None:
+
+            ##--When matching on raw bytes there is nothing to decode
+            if byte_keys:
+                guesses = block.split(b'\n')
+
+            ##--Handle errors parsing input guesses
             else:
-                if num_input_errors == 10000:
-                    print("***Warning***", file=sys.stderr)
-                    print("10,000 errors have occured while processing the input", file=sys.stderr)
-                    print("Your results may be unreliable")
-            continue
-
-        ## If it is a match
-        if guess in cs.passwords and cs.passwords[guess][1] == False:
-            cs.passwords[guess][1] = True
-            cs.passwords[guess][2] = cs.num_guesses
-            cs.num_cracked = cs.num_cracked + cs.passwords[guess][0]
-            if cs.num_cracked >= cur_step_limit:
-                print(cs.num_guesses, "\t", cs.num_cracked, "\t", file=output_file)
-                cur_step_limit = step_size + cur_step_limit
-
-                # Because I'm impatient to see the results:
-                output_file.flush()
-            
-            if save_cracked:
-                for i in range(0,cs.passwords[guess][0]):
-                    print(f"{cs.num_guesses}\t{guess}", file=cracked_file)
-                cracked_file.flush()
-
-            #If all passwords have been cracked, exit
-            if cs.num_cracked >= cs.num_passwords:
-                break
-        
-        # If the password is a debug string to print out when rules change
-        if guess.startswith("CHECKPASSDEBUG"):
-            print(cs.num_guesses, "\t", cs.num_cracked, "\t", guess, file=output_file)
-
-        ##--If we have made all the maximum number of guesses
-        if (max_guesses != None) and (cs.num_guesses >= max_guesses):
-            break  
+                guesses, num_errors = decode_guess_block(block, encoding)
+                if num_errors:
+                    report_input_errors(num_input_errors, num_input_errors + num_errors, verbose)
+                    num_input_errors = num_input_errors + num_errors
 
-    ##--Do final cleanup and printout for this cracking session
-    print(cs.num_guesses, "\t", cs.num_cracked, file=output_file)
-    if output:
-        output_file.close()
+            if len(guesses) > num_guesses:
+                guesses = guesses[:num_guesses]
+            to_check = enumerate(guesses, base_count + 1)
+
+        for guess_num, guess in to_check:
+            if guess is None:
+                continue
+            guess = guess.rstrip()
+            slot = lookup(guess)
+
+            ## If it normalizes to the same form as a target
+            if near_miss is not None:
+                group = near_lookup(normalize(guess))
+                if group is not None and not near_cracked[group]:
+                    near_cracked[group] = 1
+                    near_miss.num_cracked = near_miss.num_cracked + near_counts[group]
+                    near_report.cracked(guess_num, near_miss.num_cracked, guess, near_counts[group])
+
+            ## If it is a match
+            if slot is not None and not cracked[slot]:
+                cs.num_guesses = guess_num
+                cracked[slot] = 1
+                guess_cracked[slot] = guess_num
+                cs.num_cracked = cs.num_cracked + counts[slot]
+                report.cracked(guess_num, cs.num_cracked, guess, counts[slot], slot)
+
+                #If all passwords have been cracked, exit
+                if cs.num_cracked >= cs.num_passwords:
+                    done = True
+                    break
 
-    if save_cracked:
-        cracked_file.close()
+            # If the password is a debug string to print out when rules change
+            if has_debug and guess.startswith(debug_marker):
+                report.debug(guess_num, cs.num_cracked, guess)
+                if near_miss is not None:
+                    near_report.debug(guess_num, near_miss.num_cracked, guess)
+
+        else:
+            cs.num_guesses = base_count + num_guesses
+        report.progress(cs.num_guesses, cs.num_cracked)
+        if near_miss is not None:
+            near_report.progress(cs.num_guesses, near_miss.num_cracked)
+
+        ##--Keep track of how far into the input we are for checkpoints
+        if num_guesses:
+            cs.input_guesses = cs.input_guesses + num_guesses
+            cs.input_offset = cs.input_offset + len(block) + 1
+        if cs.checkpoint is not None:
+            cs.checkpoint.block_done(cs)
+        if cs.stats is not None:
+            cs.stats.block_done(cs, num_input_errors)
+
+        ##--If we have made all the maximum number of guesses, or cracked everything
+        if done:
+            break
 
     return RetType.STATUS_OK
 
@@ -210,38 +1118,286 @@ def main():
     command_line_results = {}
     cs = CrackingSession()
 
-    if parse_command_line(command_line_results) != RetType.STATUS_OK:
+    ##--Compiling a target set into an index is handled separately
+    if len(sys.argv) > 1 and sys.argv[1] == 'build-index':
+        return build_index_main(sys.argv[2:])
+
+    ##--Checking several guess streams against one target set is also handled separately
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        return compare_main(sys.argv[2:])
+
+    ##--Sending guesses to a session in server mode is also handled separately
+    if len(sys.argv) > 1 and sys.argv[1] == 'send':
+        return send_main(sys.argv[2:])
+
+    ##--Estimating the curve from sampled guess probabilities is also handled separately
+    if len(sys.argv) > 1 and sys.argv[1] == 'estimate':
+        return estimate_main(sys.argv[2:])
+
+    ##--Combining the hit logs from several slices of a guess stream is also handled separately
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        return merge_main(sys.argv[2:])
+
+    defaults = {}
+    if parse_command_line(command_line_results, defaults) != RetType.STATUS_OK:
         print("Exiting", file=sys.stderr)
         return
 
-    ##--Detect the file encoding of th training set
-    if command_line_results['encoding'] == None:
+    ##--Restore the options the session was started with from the checkpoint
+    resume = None
+    if command_line_results['resume']:
+        resume = {}
+        print('Loading checkpoint ' + command_line_results['checkpoint'], file=sys.stderr)
+        if load_checkpoint(command_line_results['checkpoint'], resume) != RetType.STATUS_OK:
+            print('Error loading the checkpoint. Exiting', file=sys.stderr)
+            return
+        conflicts = []
+        for key, value in resume['header']['options'].items():
+            if key in RESUME_OPTIONS:
+                continue
+            given = key in defaults and command_line_results[key] != defaults[key]
+            ##--These can be changed, (eg. to continue a finished session with a higher
+            ##--guess limit), but default to what the session was started with
+            if key in RESUME_OVERRIDE_OPTIONS and given:
+                continue
+            if given and command_line_results[key] != value:
+                conflicts.append(key)
+            command_line_results[key] = value
+        if conflicts:
+            for key in conflicts:
+                print("Error: --" + key + " is different from the value saved in the checkpoint, (" + str(resume['header']['options'][key]) + "), and can't be changed when resuming", file=sys.stderr)
+            return
+
+    ##--The guesses that have already been seen aren't saved in the checkpoint
+    if command_line_results['checkpoint'] != None and command_line_results['dedup'] != None:
+        print("Error: --checkpoint can't be used with --dedup", file=sys.stderr)
+        return
+
+    ##--Each slice's hit log has to cover exactly the guesses in the slice
+    if command_line_results['hit_log'] != None:
+        for option in ['dedup', 'checkpoint', 'out_of_core', 'near_miss']:
+            if command_line_results[option]:
+                print("Error: --hit_log can't be used with --" + option, file=sys.stderr)
+                return
+        if command_line_results['start_cracked'] != 0:
+            print("Error: --hit_log can't be used with --start_cracked", file=sys.stderr)
+            return
+
+    ##--Checkpoints record how far into stdin the session got
+    server_mode = command_line_results['listen'] != None or command_line_results['fifo'] != None
+    if server_mode:
+        for option in ['checkpoint', 'out_of_core']:
+            if command_line_results[option]:
+                print("Error: --" + option + " can't be used with --listen or --fifo", file=sys.stderr)
+                return
+
+    ##--Near misses are checked in the single process matching loop against one target set
+    if command_line_results['near_miss'] != None:
+        for option in ['prefilter', 'hash_type', 'checkpoint', 'out_of_core']:
+            if command_line_results[option]:
+                print("Error: --" + option + " can't be used with --near_miss", file=sys.stderr)
+                return
+        if command_line_results['workers'] > 1:
+            print("Error: --workers can't be used with --near_miss", file=sys.stderr)
+            return
+        if len(command_line_results['target']) > 1:
+            print("Error: --near_miss only supports a single target set", file=sys.stderr)
+            return
+
+    targets = command_line_results['target']
+    hash_type = command_line_results['hash_type']
+
+    ##--Out of core mode doesn't load the target set so is handled separately
+    if command_line_results['out_of_core']:
+        return out_of_core_main(command_line_results)
+
+    ##--The prefilter and target indexes are built from plaintext passwords
+    if hash_type != None:
+        if command_line_results['prefilter']:
+            print("Error: --prefilter can't be used with --hash_type", file=sys.stderr)
+            return
+        for target in targets:
+            if is_target_index(target):
+                print("Error: Prebuilt target indexes can't be used with --hash_type", file=sys.stderr)
+                return
+
+    ##--Results for each target set are saved to their own files so need a filename to base them on
+    if len(targets) > 1:
+        if command_line_results['output'] == None:
+            print("Error: --output must be specified when using more than one target set", file=sys.stderr)
+            return
+        for target in targets:
+            if is_target_index(target):
+                print("Error: Prebuilt target indexes can't be combined with other target sets", file=sys.stderr)
+                return
+
+    ##--A prebuilt index already knows its encoding and doesn't need to be parsed
+    if is_target_index(targets[0]):
         possible_encodings = []
-        print('Identifying character encoding of target file', file=sys.stderr)
-        if detect_file_encoding(command_line_results['target'], possible_encodings) != RetType.STATUS_OK:
-            print("Error detecting file encoding, exiting", file=sys.stderr)
+        print('Loading the target index', file=sys.stderr)
+        if load_target_index(targets[0], cs, possible_encodings, in_memory = command_line_results['index_in_memory']) != RetType.STATUS_OK:
+            print('Error loading the target index. Exiting', file=sys.stderr)
             return
+        set_encodings = possible_encodings
 
-    ##--Use the user specified encoding
     else:
-        possible_encodings = [command_line_results['encoding']]
+        ##--The encoding of each target set. The first one is used for the guesses
+        set_encodings = []
+        set_names = target_set_names(targets)
+        for target_num, (target, set_name) in enumerate(zip(targets, set_names)):
 
-    ##--Now read in the training set
-    print('Parsing the target file', file=sys.stderr)
-    if read_input_passwords(command_line_results['target'], cs, file_encoding = possible_encodings[0]) != RetType.STATUS_OK:
-        print('Error reading in target file. Exiting', file=sys.stderr)
-        return
+            ##--Hash lists are plain hex. The encoding is only used for the guesses
+            if hash_type != None:
+                possible_encodings = [command_line_results['encoding'] or 'utf-8']
+
+            ##--Use the encoding that was detected when the session was started
+            elif resume is not None:
+                possible_encodings = [resume['header']['encodings'][target_num]]
+
+            ##--Detect the file encoding of th training set
+            elif command_line_results['encoding'] == None:
+                possible_encodings = []
+                print('Identifying character encoding of target file ' + target, file=sys.stderr)
+                if detect_file_encoding(target, possible_encodings) != RetType.STATUS_OK:
+                    print("Error detecting file encoding, exiting", file=sys.stderr)
+                    return
+
+            ##--Use the user specified encoding
+            else:
+                possible_encodings = [command_line_results['encoding']]
+
+            set_encodings.append(possible_encodings[0])
+            if possible_encodings[0] != set_encodings[0] and command_line_results['byte_keys']:
+                print("WARNING: " + target + " has a different encoding than " + targets[0], file=sys.stderr)
+                print("         Passwords will only match guesses that have the same encoded bytes", file=sys.stderr)
+
+            ##--Keep track of which passwords belong to which set
+            if len(targets) > 1:
+                cs.passwords.begin_set(set_name)
+
+            ##--Now read in the training set
+            print('Parsing the target file ' + target, file=sys.stderr)
+            if hash_type != None:
+                if read_hash_targets(target, cs, hash_type) != RetType.STATUS_OK:
+                    print('Error reading in target file. Exiting', file=sys.stderr)
+                    return
+            elif read_input_passwords(target, cs, file_encoding = possible_encodings[0], byte_keys = command_line_results['byte_keys'], num_workers = command_line_results['load_workers']) != RetType.STATUS_OK:
+                print('Error reading in target file. Exiting', file=sys.stderr)
+                return
 
     print('Done parsing target file. Passwords to crack =', cs.num_passwords, file=sys.stderr)
+    for target_set in cs.passwords.sets:
+        print('    ' + target_set.name + ' =', target_set.num_passwords, file=sys.stderr)
+
+    ##--Make sure the checkpoint is for these target passwords
+    if resume is not None:
+        if check_checkpoint_targets(cs, resume) != RetType.STATUS_OK:
+            print('Error resuming from the checkpoint. Exiting', file=sys.stderr)
+            return
+
+    ##--Set up hashing the guesses
+    if hash_type != None:
+        cs.hash_type = hash_type
+        cs.hasher = GuessHasher(hash_type, cs.passwords, encoding = set_encodings[0])
+
+    ##--Build the prefilter now that all the target passwords are loaded
+    if command_line_results['prefilter']:
+        if not is_ascii_compatible(set_encodings[0]):
+            print("Error: The prefilter is not supported for the file encoding " + str(set_encodings[0]), file=sys.stderr)
+            return
+        print('Building the prefilter', file=sys.stderr)
+        cs.prefilter = build_prefilter(cs, encoding = set_encodings[0], bits_per_item = command_line_results['prefilter_bits'])
+        if cs.prefilter == None:
+            return
+
+    ##--Group the target passwords by their normalized form
+    if command_line_results['near_miss'] != None:
+        print('Building the near miss index', file=sys.stderr)
+        cs.near_miss = NearMissIndex(cs.passwords, command_line_results['near_miss'], byte_keys = cs.byte_keys)
+        print('Unique normalized passwords = ' + str(len(cs.near_miss)), file=sys.stderr)
+
+    ##--Set up removing duplicate guesses
+    if command_line_results['dedup'] != None:
+        cs.dedup = create_deduplicator(command_line_results['dedup'], max_memory = command_line_results['dedup_memory'],
+            spill_dir = command_line_results['dedup_dir'], expected_items = command_line_results['dedup_items'],
+            fp_rate = command_line_results['dedup_fp_rate'])
+        if cs.dedup == None:
+            return
+
+    ##--Set up saving checkpoints. Everything needed to restart the session is saved
+    if command_line_results['checkpoint'] != None:
+        options = {key: value for key, value in command_line_results.items() if key not in RESUME_OPTIONS}
+        cs.checkpoint = Checkpointer(command_line_results['checkpoint'], interval = command_line_results['checkpoint_interval'],
+            options = options, encodings = set_encodings, targets = targets)
+
+    ##--Skip over the guesses that were checked before the checkpoint was taken
+    if resume is not None:
+        header = resume['header']
+        print('Resuming the session at guess ' + str(header['num_guesses']) + ' with ' + str(header['num_cracked']) + ' cracked', file=sys.stderr)
+        if not command_line_results['input_resumed']:
+            if sys.stdin.buffer.seekable():
+                sys.stdin.buffer.seek(header['input_offset'])
+            elif skip_guesses(sys.stdin.buffer, header['input_guesses']) < header['input_guesses']:
+                print("WARNING: The input ended before reaching where the checkpoint left off", file=sys.stderr)
+
+    ##--Set up printing out the throughput stats
+    stats_file = None
+    if command_line_results['stats'] or command_line_results['stats_file'] != None:
+        if command_line_results['stats_file'] != None:
+            try:
+                stats_file = open(command_line_results['stats_file'], 'w')
+            except IOError as error:
+                print("Error opening stats file. Error message: " + str(error), file=sys.stderr)
+                return
+        cs.stats = SessionStats(stats_file, interval = command_line_results['stats_interval'])
+
+    ##--Set up accepting guesses from several producers
+    server = None
+    guess_blocks = None
+    if server_mode:
+        server = GuessServer(socket_path = command_line_results['listen'], fifos = command_line_results['fifo'],
+            num_producers = command_line_results['producers'], order = command_line_results['server_order'])
+        guess_blocks = server.blocks()
+
     print('Processing input',file=sys.stderr)
 
-    test_cracking_session(cs, encoding = possible_encodings[0], start_count = command_line_results['start_count'], 
+    if command_line_results['profile']:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    test_cracking_session(cs, encoding = set_encodings[0], start_count = command_line_results['start_count'], 
         start_cracked = command_line_results['start_cracked'], max_guesses = command_line_results['max_guesses'], 
-        output = command_line_results['output'], save_cracked = command_line_results['cracked_file'], verbose = command_line_results['verbose'])
+        output = command_line_results['output'], save_cracked = command_line_results['cracked_file'], verbose = command_line_results['verbose'],
+        block_size = command_line_results['block_size'], num_workers = command_line_results['workers'], resume = resume,
+        flush_interval = command_line_results['flush_interval'], curve = command_line_results['curve'],
+        curve_step = command_line_results['curve_step'], hit_log = command_line_results['hit_log'], targets = targets,
+        guess_blocks = guess_blocks, near_miss_output = command_line_results['near_miss_output'])
+
+    if server is not None:
+        server.close()
+        if server.error is not None:
+            print("Error: Stopped receiving guesses early, so the results are incomplete", file=sys.stderr)
+            return
+
+    ##--Print out the functions that took the most time
+    if command_line_results['profile']:
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('tottime').print_stats(25)
+
+    if stats_file is not None:
+        stats_file.close()
 
     #Print to uncracked file if that was specified
     if (command_line_results['uncracked_file'] != None):
-        write_uncracked_to_disk(cs, command_line_results['uncracked_file'], file_encoding = possible_encodings[0])
+        if cs.passwords.sets:
+            for target_set, set_encoding in zip(cs.passwords.sets, set_encodings):
+                write_uncracked_to_disk(cs, target_set_filename(command_line_results['uncracked_file'], target_set.name), file_encoding = set_encoding, target_set = target_set)
+        else:
+            write_uncracked_to_disk(cs, command_line_results['uncracked_file'], file_encoding = set_encodings[0])
+
+    ##--Save the per password results for graphing
+    if command_line_results['export'] != None:
+        export_results(cs, command_line_results['export'])
 
 
 if __name__ == "__main__":
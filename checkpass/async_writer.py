@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Writes output files from a background thread
+#
+# Early in a session thousands of passwords can be cracked a second. Writing each one to
+# the cracked file and flushing it straight away means a system call per crack, which
+# ends up taking more time than checking the guesses.
+#
+# Instead the text is collected in memory and handed to a background thread in large
+# chunks, which writes them out. The thread also flushes the file every flush_interval
+# seconds, so the files still show the progress of the session while it runs.
+#
+# The queue of chunks waiting to be written is bounded. If the disk can't keep up the
+# session waits for it rather than using more and more memory.
+#
+# If writing to the file fails, (eg. the disk is full), the thread saves the error and
+# keeps taking chunks off the queue without writing them, so the session never waits on
+# it forever. The error is raised from the next write(), sync() or close() instead.
+#########################################################################################
+
+import queue
+import threading
+import time
+import atexit
+
+
+## Default number of seconds between flushing the output files
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+## Number of characters to collect before handing them to the writer thread
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+## Number of chunks that can be waiting to be written at a time
+DEFAULT_MAX_QUEUED = 16
+
+
+#########################################################################################
+# Wraps a text file so writes to it are done by a background thread
+#
+# Only supports the file methods the session outputs use. flush() doesn't wait for the
+# data to be written, (the thread flushes the file on its own). Use sync() or tell() to
+# make sure everything has been written out
+#########################################################################################
+class AsyncWriter:
+    def __init__(self, file, flush_interval = DEFAULT_FLUSH_INTERVAL, buffer_size = DEFAULT_BUFFER_SIZE, max_queued = DEFAULT_MAX_QUEUED):
+
+        ##The file being written to
+        self.file = file
+
+        ##Number of seconds between flushes
+        self.flush_interval = flush_interval
+
+        ##Text that hasn't been handed to the writer thread yet, and its total length
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.pending_size = 0
+
+        ##Protects self.pending, which the writer thread takes when it is time to flush
+        self.lock = threading.Lock()
+
+        ##Held by the writer thread while writing so sync() can wait for it to finish
+        self.file_lock = threading.Lock()
+
+        ##Chunks of text waiting to be written. None tells the thread to stop
+        self.queue = queue.Queue(max_queued)
+
+        ##The exception raised writing to the file, if it failed
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.closed = False
+
+        ##--Don't lose the last of the output if the session exits without closing the file
+        atexit.register(self.close)
+
+    ##############################################################
+    # Adds text to the file
+    ##############################################################
+    def write(self, text):
+        self._check_error()
+        with self.lock:
+            self.pending.append(text)
+            self.pending_size = self.pending_size + len(text)
+            if self.pending_size < self.buffer_size:
+                return len(text)
+            chunk = self._take_pending()
+
+        ##--Done outside the lock so the writer thread can't get stuck waiting for it
+        self.queue.put(chunk)
+        return len(text)
+
+    ##############################################################
+    # The writer thread flushes the file itself, so there is
+    # nothing to do here
+    ##############################################################
+    def flush(self):
+        pass
+
+    ##############################################################
+    # Waits until everything written so far is in the file and the
+    # file has been flushed
+    ##############################################################
+    def sync(self):
+        self._check_error()
+        with self.lock:
+            chunk = self._take_pending()
+        if chunk:
+            self.queue.put(chunk)
+        self.queue.join()
+        self._check_error()
+        with self.file_lock:
+            self.file.flush()
+
+    ##############################################################
+    # Returns the position in the file after everything written
+    # so far
+    ##############################################################
+    def tell(self):
+        self.sync()
+        return self.file.tell()
+
+    ##############################################################
+    # Writes out everything, stops the writer thread and closes
+    # the file. The thread is stopped even if writing failed
+    ##############################################################
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+
+        try:
+            self.sync()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+            self.file.close()
+
+    ##############################################################
+    # Raises the error from the writer thread, if writing failed
+    ##############################################################
+    def _check_error(self):
+        if self.error is not None:
+            raise self.error
+
+    ##############################################################
+    # Returns all the pending text as one string. Must be called
+    # with self.lock held
+    ##############################################################
+    def _take_pending(self):
+        chunk = ''.join(self.pending)
+        self.pending = []
+        self.pending_size = 0
+        return chunk
+
+    ##############################################################
+    # Writes out chunks as they come in. Runs in the writer thread
+    ##############################################################
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                chunk = self.queue.get(timeout=self.flush_interval)
+
+            ##--Nothing has filled up a chunk for a while, so write out what there is
+            except queue.Empty:
+                with self.file_lock:
+                    with self.lock:
+                        chunk = self._take_pending()
+                    self._write(chunk, True)
+                next_flush = time.monotonic() + self.flush_interval
+                continue
+
+            if chunk is None:
+                self.queue.task_done()
+                return
+
+            with self.file_lock:
+                if time.monotonic() >= next_flush:
+                    self._write(chunk, True)
+                    next_flush = time.monotonic() + self.flush_interval
+                else:
+                    self._write(chunk, False)
+            self.queue.task_done()
+
+    ##############################################################
+    # Writes a chunk to the file, and flushes it if flush is True.
+    # Saves the error if that fails, after which nothing more is
+    # written. Must be called with self.file_lock held
+    ##############################################################
+    def _write(self, chunk, flush):
+        if self.error is not None:
+            return
+        try:
+            if chunk:
+                self.file.write(chunk)
+            if flush:
+                self.file.flush()
+        except Exception as error:
+            self.error = error
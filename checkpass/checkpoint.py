@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Saves and restores the state of a cracking session
+#
+# Long running sessions can take days. Rather than restarting from scratch, (or by hand
+# with --start_count and --start_cracked which loses when each password was cracked),
+# the whole session is periodically saved to a checkpoint file and can be picked back up
+# with --resume.
+#
+# File layout, (all integers are little endian):
+#   8 bytes     Magic value, CHECKPOINT_MAGIC
+#   4 bytes     Length of the JSON header
+#   N bytes     JSON header. Contains the command line options, the counters, how far
+#               into the guess stream the session got and how much of each output file
+#               had been written
+#   cracked         uint8[num_unique]   Non-zero if the password in that slot was cracked
+#   guess_cracked   int64[num_unique]   Guess number that cracked the password in that slot
+#
+# Checkpoints are only taken between blocks of guesses so the counters always match the
+# cracked status. Copying the arrays is quick, so the matching loop only pauses for that.
+# Writing the file happens in a background thread, and a checkpoint is skipped if the
+# previous one is still being written. The file is written to a temporary file first and
+# then renamed so there is always a complete checkpoint on disk.
+#########################################################################################
+
+import sys
+import os
+import json
+import struct
+import time
+import threading
+from array import array
+
+##--Custom imports
+from checkpass.ret_types import RetType
+
+
+## Identifies a checkpoint file
+CHECKPOINT_MAGIC = b'CPCHKPT1'
+
+## Version of the checkpoint file layout
+CHECKPOINT_VERSION = 1
+
+## Default number of seconds between checkpoints
+DEFAULT_CHECKPOINT_INTERVAL = 300
+
+## Command line options that can be changed when resuming a session. All the others are
+## restored from the checkpoint
+RESUME_OPTIONS = ['checkpoint', 'checkpoint_interval', 'resume', 'input_resumed', 'workers', 'block_size', 'verbose',
+    'stats', 'stats_file', 'stats_interval', 'profile', 'load_workers', 'flush_interval', 'index_in_memory']
+
+## Command line options that are restored from the checkpoint unless they are given again
+## when resuming. They only change what is written at the end of the session. Any other
+## option that is given and doesn't match the checkpoint is an error
+RESUME_OVERRIDE_OPTIONS = ['max_guesses', 'uncracked_file', 'export']
+
+
+#########################################################################################
+# Periodically saves checkpoints of a cracking session
+#########################################################################################
+class Checkpointer:
+    def __init__(self, filename, interval = DEFAULT_CHECKPOINT_INTERVAL, options = None, encodings = None, targets = None):
+
+        ##Where to save the checkpoints
+        self.filename = filename
+
+        ##Number of seconds between checkpoints
+        self.interval = interval
+        self.next_time = time.monotonic() + interval
+
+        ##Saved so the session can be restarted with just --resume
+        self.options = options or {}
+        self.encodings = encodings or []
+
+        ##Size and modification time of each target file, to catch them changing
+        self.targets = []
+        for target in targets or []:
+            try:
+                info = os.stat(target)
+                self.targets.append([target, info.st_size, info.st_mtime])
+            except OSError:
+                self.targets.append([target, None, None])
+
+        ##The SessionOutputs to save the state of. Set by start()
+        self.outputs = []
+
+        ##Thread writing out the last checkpoint
+        self.thread = None
+
+    ##############################################################
+    # Sets the outputs whose state is saved with the checkpoint
+    ##############################################################
+    def start(self, outputs):
+        self.outputs = outputs
+
+    ##############################################################
+    # Called after every block of guesses. Saves a checkpoint if
+    # enough time has passed since the last one
+    ##############################################################
+    def block_done(self, cs):
+        if time.monotonic() < self.next_time:
+            return
+
+        ##--Don't hold up the session waiting on the last one to finish
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        self.save(cs)
+
+    ##############################################################
+    # Takes a snapshot of the session and writes it out in the
+    # background
+    ##############################################################
+    def save(self, cs, wait = False):
+        header, cracked, guess_cracked = self._snapshot(cs)
+
+        if self.thread is not None:
+            self.thread.join()
+        self.thread = threading.Thread(target=self._write, args=(header, cracked, guess_cracked))
+        self.thread.start()
+        if wait:
+            self.thread.join()
+
+        self.next_time = time.monotonic() + self.interval
+
+    ##############################################################
+    # Saves a final checkpoint and waits for it to be written
+    ##############################################################
+    def close(self, cs):
+        self.save(cs, wait = True)
+
+    ##############################################################
+    # Copies everything needed to restore the session
+    ##############################################################
+    def _snapshot(self, cs):
+        outputs = []
+        for output in self.outputs:
+            outputs.append({
+                'output_offset': _file_offset(output.output_file),
+                'cracked_offset': _file_offset(output.cracked_file),
+                'cur_step_limit': output.cur_step_limit,
+            })
+
+        header = {
+            'version': CHECKPOINT_VERSION,
+            'time': time.time(),
+            'options': self.options,
+            'encodings': self.encodings,
+            'targets': self.targets,
+            'byte_keys': cs.byte_keys,
+            'num_unique': len(cs.passwords),
+            'num_passwords': cs.num_passwords,
+            'num_cracked': cs.num_cracked,
+            'num_guesses': cs.num_guesses,
+            'input_guesses': cs.input_guesses,
+            'input_offset': cs.input_offset,
+            'sets': [{'name': target_set.name, 'num_passwords': target_set.num_passwords, 'num_cracked': target_set.num_cracked} for target_set in cs.passwords.sets],
+            'outputs': outputs,
+        }
+
+        guess_cracked = array('q', cs.passwords.guess_cracked)
+        if sys.byteorder != 'little':
+            guess_cracked.byteswap()
+
+        return header, bytes(cs.passwords.cracked), guess_cracked.tobytes()
+
+    ##############################################################
+    # Writes a checkpoint file. Runs in the background thread
+    ##############################################################
+    def _write(self, header, cracked, guess_cracked):
+        encoded_header = json.dumps(header).encode('utf-8')
+        temp_filename = self.filename + '.tmp'
+        try:
+            with open(temp_filename, 'wb') as file:
+                file.write(CHECKPOINT_MAGIC)
+                file.write(struct.pack('<I', len(encoded_header)))
+                file.write(encoded_header)
+                file.write(cracked)
+                file.write(guess_cracked)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_filename, self.filename)
+
+        except IOError as error:
+            print (error, file=sys.stderr)
+            print ("Error writing checkpoint file " + self.filename, file=sys.stderr)
+
+
+#########################################################################################
+# Returns how much has been written to an output file, or None if it can't be resumed
+#########################################################################################
+def _file_offset(file):
+    if file is None or file is sys.stdout:
+        return None
+    file.flush()
+    return file.tell()
+
+
+#########################################################################################
+# Reads in a checkpoint file
+#
+# The header, cracked status and crack guess numbers are saved in checkpoint as 'header',
+# 'cracked' and 'guess_cracked'
+#########################################################################################
+def load_checkpoint(filename, checkpoint):
+    try:
+        with open(filename, 'rb') as file:
+            if file.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+                print("Error: " + filename + " is not a checkpoint file", file=sys.stderr)
+                return RetType.BAD_INPUT
+            header_len = struct.unpack('<I', file.read(4))[0]
+            header = json.loads(file.read(header_len).decode('utf-8'))
+            cracked = file.read(header['num_unique'])
+            guess_cracked = array('q')
+            guess_cracked.frombytes(file.read(8 * header['num_unique']))
+
+    except (IOError, ValueError, struct.error) as error:
+        print (error, file=sys.stderr)
+        print ("Error reading checkpoint file " + filename, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if header['version'] != CHECKPOINT_VERSION:
+        print("Error: Unsupported checkpoint version " + str(header['version']), file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    if len(cracked) != header['num_unique'] or len(guess_cracked) != header['num_unique']:
+        print("Error: Checkpoint file " + filename + " is truncated", file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    if sys.byteorder != 'little':
+        guess_cracked.byteswap()
+
+    checkpoint['header'] = header
+    checkpoint['cracked'] = cracked
+    checkpoint['guess_cracked'] = guess_cracked
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Checks the target sets that were loaded are the same ones the checkpoint was taken with
+#########################################################################################
+def check_checkpoint_targets(cs, checkpoint):
+    header = checkpoint['header']
+
+    for target, size, mtime in header['targets']:
+        try:
+            info = os.stat(target)
+        except OSError as error:
+            print("Error: Can't find the target set " + target + " from the checkpoint. " + str(error), file=sys.stderr)
+            return RetType.FILE_IO_ERROR
+        if info.st_size != size or info.st_mtime != mtime:
+            print("WARNING: The target set " + target + " has been modified since the checkpoint was taken", file=sys.stderr)
+
+    if len(cs.passwords) != header['num_unique'] or cs.byte_keys != header['byte_keys']:
+        print("Error: The target passwords don't match the ones the checkpoint was taken with", file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Restores the state of a cracking session from a checkpoint
+#
+# The target passwords must already be loaded
+#########################################################################################
+def restore_checkpoint(cs, checkpoint):
+    header = checkpoint['header']
+
+    cs.passwords.cracked[:] = checkpoint['cracked']
+    cs.passwords.guess_cracked = checkpoint['guess_cracked']
+    cs.num_passwords = header['num_passwords']
+    cs.num_cracked = header['num_cracked']
+    cs.num_guesses = header['num_guesses']
+    cs.input_guesses = header['input_guesses']
+    cs.input_offset = header['input_offset']
+
+    for target_set, saved_set in zip(cs.passwords.sets, header['sets']):
+        target_set.num_passwords = saved_set['num_passwords']
+        target_set.num_cracked = saved_set['num_cracked']
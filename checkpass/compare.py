@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Compares several guess streams against the same target set
+#
+# Comparing a lot of guess generators normally means a separate checkpass run for each
+# one, and each run loads the whole target set again. In this mode the target set is
+# loaded once, (into a CrackingSession as usual), and each guess stream only gets its
+# own cracked status and curve output on top of it.
+#
+# The cracked status of each stream is a bitmap with one bit per unique target
+# password, so a stream only costs num_unique / 8 bytes. The target set itself is only
+# ever read, (a prebuilt target index works well here since it is memory mapped).
+#
+# The streams are read one block at a time in turn, (round robin, with blocking reads),
+# so generators writing to named pipes can all run at once. A stream that is slow to
+# produce a block holds up the others until it does, so the comparison runs at the speed
+# of the slowest generator. The streams can also be checked from Python with
+# StreamSession.check_batch()
+#########################################################################################
+
+import sys
+
+##--Custom imports
+from checkpass.guess_reader import read_guess_blocks
+from checkpass.guess_reader import decode_guess_block
+from checkpass.guess_reader import report_input_errors
+from checkpass.guess_reader import DEFAULT_BLOCK_SIZE
+from checkpass.ret_types import RetType
+
+
+#########################################################################################
+# The state of one guess stream checked against a shared CrackingSession
+#########################################################################################
+class StreamSession:
+    def __init__(self, cs, name, report = None):
+
+        ##The CrackingSession holding the target passwords. Never modified
+        self.cs = cs
+
+        ##Name used to label the results for this stream
+        self.name = name
+
+        ##Optional SessionOutput to write the results of this stream to
+        self.report = report
+
+        ##One bit per unique target password, set once it has been cracked
+        self.cracked = bytearray((len(cs.passwords) + 7) // 8)
+
+        ##Totals for this stream
+        self.num_guesses = 0
+        self.num_cracked = 0
+        self.num_input_errors = 0
+
+        ##Set once every password has been cracked, or max_guesses has been reached
+        self.done = False
+
+    ##############################################################
+    # Returns True if the password in slot was cracked by this
+    # stream
+    ##############################################################
+    def is_cracked(self, slot):
+        return self.cracked[slot >> 3] & (1 << (slot & 7)) != 0
+
+    ##############################################################
+    # Iterates over (password, count) for all the passwords this
+    # stream didn't crack
+    ##############################################################
+    def uncracked(self):
+        counts = self.cs.passwords.counts
+        for slot, password in enumerate(self.cs.passwords):
+            if not self.is_cracked(slot):
+                yield password, counts[slot]
+
+    ##############################################################
+    # Checks a block of raw guesses, as returned by
+    # read_guess_blocks()
+    #
+    # Stops once max_guesses guesses have been checked in total
+    ##############################################################
+    def check_block(self, block, max_guesses = None, verbose = False):
+        cs = self.cs
+        num_guesses = block.count(b'\n') + 1
+        if max_guesses != None and self.num_guesses + num_guesses >= max_guesses:
+            num_guesses = max(max_guesses - self.num_guesses, 0)
+            block = b'\n'.join(block.split(b'\n', num_guesses)[:num_guesses])
+            self.done = True
+        if num_guesses == 0:
+            return
+
+        has_debug = b"CHECKPASSDEBUG" in block
+        if cs.hasher is not None and not has_debug:
+            to_check = cs.hasher.candidate_guesses(block, self.num_guesses)
+        else:
+            if cs.byte_keys:
+                guesses = block.split(b'\n')
+            else:
+                guesses, num_errors = decode_guess_block(block, cs.encoding)
+                if num_errors:
+                    report_input_errors(self.num_input_errors, self.num_input_errors + num_errors, verbose)
+                    self.num_input_errors = self.num_input_errors + num_errors
+            to_check = enumerate(guesses, self.num_guesses + 1)
+
+        self._check(to_check, self.num_guesses + num_guesses, has_debug)
+
+    ##############################################################
+    # Checks a list of guesses, (str or bytes)
+    #
+    # Returns the totals for this stream the same way as
+    # CrackingSession.check_batch()
+    ##############################################################
+    def check_batch(self, guesses):
+        guesses = self.cs._convert_guesses(guesses)
+        base_count = self.num_guesses
+        cracks = []
+        if self.cs.hasher is not None:
+            to_check = self.cs.hasher.candidate_hits(guesses, base_count)
+        else:
+            to_check = enumerate(guesses, base_count + 1)
+
+        self._check(to_check, base_count + len(guesses), True, cracks)
+
+        return {
+            'num_guesses': self.num_guesses,
+            'num_cracked': self.num_cracked,
+            'num_passwords': self.cs.num_passwords,
+            'cracks': cracks,
+        }
+
+    ##############################################################
+    # Looks up each (guess_num, guess) in to_check and records the
+    # cracks. end_count is the guess count after the last guess
+    ##############################################################
+    def _check(self, to_check, end_count, has_debug, cracks = None):
+        cs = self.cs
+        report = self.report
+        cracked = self.cracked
+        counts = cs.passwords.counts
+        num_passwords = cs.num_passwords
+
+        lookup = cs.passwords.index.get
+        if cs.hasher is not None:
+            lookup = cs.hasher.lookup_function(lookup)
+        if cs.byte_keys:
+            debug_marker = b"CHECKPASSDEBUG"
+        else:
+            debug_marker = "CHECKPASSDEBUG"
+
+        for guess_num, guess in to_check:
+            if guess is None:
+                continue
+            guess = guess.rstrip()
+            slot = lookup(guess)
+
+            if slot is not None and not cracked[slot >> 3] & (1 << (slot & 7)):
+                self.num_guesses = guess_num
+                cracked[slot >> 3] = cracked[slot >> 3] | (1 << (slot & 7))
+                self.num_cracked = self.num_cracked + counts[slot]
+                if cracks is not None:
+                    cracks.append((guess_num, guess, counts[slot]))
+                if report is not None:
+                    report.cracked(guess_num, self.num_cracked, guess, counts[slot], slot)
+
+                #If all passwords have been cracked this stream is done
+                if self.num_cracked >= num_passwords:
+                    self.done = True
+                    break
+
+            if has_debug and report is not None and guess.startswith(debug_marker):
+                report.debug(guess_num, self.num_cracked, guess)
+
+        else:
+            self.num_guesses = end_count
+
+        if report is not None:
+            report.progress(self.num_guesses, self.num_cracked)
+
+
+#########################################################################################
+# Reads guesses from each of the streams in turn and checks them
+#
+# streams is a list of (StreamSession, binary file object). Each stream is read until it
+# ends or is done. Each read blocks until the stream has a full block or ends
+#########################################################################################
+def compare_streams(streams, max_guesses = None, verbose = False, block_size = DEFAULT_BLOCK_SIZE):
+    active = [(stream, iter(read_guess_blocks(file, block_size))) for stream, file in streams]
+
+    while active:
+        still_active = []
+        for stream, blocks in active:
+            block = next(blocks, None)
+            if block is None:
+                continue
+            stream.check_block(block, max_guesses = max_guesses, verbose = verbose)
+            if not stream.done:
+                still_active.append((stream, blocks))
+        active = still_active
+
+    return RetType.STATUS_OK
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Reads compressed target sets directly, without decompressing them to disk first
+#
+# The compression format is detected from the magic bytes at the start of the file, so
+# the file extension doesn't matter. gzip, bz2 and xz are supported with the standard
+# library. zstd needs either Python 3.14+ or the zstandard package
+# pip install zstandard
+#
+# A compressed file can't be sampled at random offsets, so the encoding is detected from
+# the start of it instead. The stream used for that is kept open, along with the data
+# that was read from it, and is handed over to the target loader when it opens the file.
+# That way the file is only decompressed once
+#########################################################################################
+
+import io
+import gzip
+import bz2
+import lzma
+
+
+## Magic bytes at the start of each compression format
+COMPRESSION_MAGIC = [
+    ('gzip', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zstd', b'\x28\xb5\x2f\xfd'),
+]
+
+## File extensions used for compressed files. Removed when naming target sets
+COMPRESSION_EXTENSIONS = ['.gz', '.gzip', '.bz2', '.xz', '.lzma', '.zst', '.zstd']
+
+## Errors raised when a compressed file is corrupt or truncated
+COMPRESSION_ERRORS = (IOError, EOFError, lzma.LZMAError)
+
+## Number of bytes from the start of a compressed file to use to detect its encoding
+HEAD_SIZE = 1024 * 1024
+
+##--Compressed files that have had their start read in but haven't been opened by the
+##--loader yet, indexed by filename
+_open_targets = {}
+
+
+#########################################################################################
+# Returns the compression format of a file, or None if it isn't compressed
+#########################################################################################
+def detect_compression(filename):
+    try:
+        with open(filename, 'rb') as file:
+            start = file.read(8)
+    except IOError:
+        return None
+
+    for compression, magic in COMPRESSION_MAGIC:
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+#########################################################################################
+# Opens a compressed file and returns a binary file object of the decompressed data
+#########################################################################################
+def _open_decompressed(filename, compression):
+    if compression == 'gzip':
+        return gzip.open(filename, 'rb')
+    if compression == 'bz2':
+        return bz2.open(filename, 'rb')
+    if compression == 'xz':
+        return lzma.open(filename, 'rb')
+
+    ##--zstd is only in the standard library from Python 3.14
+    try:
+        from compression import zstd
+        return zstd.open(filename, 'rb')
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise IOError("Reading zstd compressed files requires Python 3.14+ or the zstandard package. pip install zstandard")
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True))
+
+
+#########################################################################################
+# Raw stream that returns some data that was already read, followed by the rest of
+# the stream it was read from
+#########################################################################################
+class _ReplayStream(io.RawIOBase):
+    def __init__(self, head, stream):
+        ##A memoryview so reading from the head doesn't copy the rest of it each time
+        self.head = memoryview(head)
+        self.offset = 0
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.offset < len(self.head):
+            size = min(len(buffer), len(self.head) - self.offset)
+            buffer[:size] = self.head[self.offset:self.offset + size]
+            self.offset = self.offset + size
+            return size
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+#########################################################################################
+# Returns the start of the decompressed data from a compressed file, for detecting its
+# encoding
+#
+# The stream is kept open so the loader can carry on reading from where this left off
+#########################################################################################
+def read_compressed_head(filename, compression, size = HEAD_SIZE):
+    if filename in _open_targets:
+        return _open_targets[filename][0]
+
+    stream = _open_decompressed(filename, compression)
+    head = stream.read(size)
+    _open_targets[filename] = (head, stream)
+    return head
+
+
+#########################################################################################
+# Opens a target file for reading as binary, decompressing it if needed
+#
+# If the start of a compressed file was already read by read_compressed_head, the same
+# stream is used rather than decompressing the file again
+#########################################################################################
+def open_target_file(filename):
+    compression = detect_compression(filename)
+    if compression is None:
+        return open(filename, 'rb')
+
+    if filename in _open_targets:
+        head, stream = _open_targets.pop(filename)
+        return io.BufferedReader(_ReplayStream(head, stream))
+    return _open_decompressed(filename, compression)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Holds the state of a cracking session
+#
+# Besides being used by checkpass.py, this can be used directly from Python to check the
+# guesses from a generator without piping them through stdin. For example:
+#
+#   from checkpass.cracking_session import CrackingSession
+#
+#   cs = CrackingSession()
+#   cs.load_targets(['rockyou.txt'])
+#   for batch in generator:
+#       stats = cs.check_batch(batch)
+#       print(stats['num_guesses'], stats['num_cracked'])
+#
+# Guesses are matched the same way as when they are read from stdin, (trailing whitespace
+# is stripped), so the results are the same as running checkpass.py on the same guesses.
+# Guesses can be str or bytes, and are converted to match the target set if needed.
+#
+# The prefilter, deduplication and near miss matching only work on the guess blocks read
+# by checkpass.py, so check_batch() raises a ValueError if any of them are set.
+#
+# To also write out the cracking curve and cracked file, call start_output() before
+# checking any guesses and finish_output() at the end
+#########################################################################################
+
+import sys
+from itertools import islice
+
+##--Custom imports
+from checkpass.file_io import detect_file_encoding
+from checkpass.file_io import read_input_passwords
+from checkpass.file_io import target_set_names
+from checkpass.target_store import TargetStore
+from checkpass.target_index import is_target_index
+from checkpass.target_index import load_target_index
+from checkpass.hashed import GuessHasher
+from checkpass.hashed import read_hash_targets
+from checkpass.session_output import SessionOutput
+from checkpass.session_output import MultiSetOutput
+from checkpass.ret_types import RetType
+
+
+## Number of guesses consume() checks at a time
+DEFAULT_BATCH_SIZE = 100000
+
+
+########################################################################################
+# Holds the cracking session values
+########################################################################################
+class CrackingSession:
+    def __init__(self):
+
+        ##Holds the plaintext passwords
+        ## See checkpass/target_store.py for the layout. For each password it records
+        ## Number_of_Passwords, isCracked, and Number_Of_Guesses_To_Crack
+        self.passwords = TargetStore()
+
+        ##Total number of passwords, (includes duplicates
+        self.num_passwords = 0
+
+        ##Total number of passwords cracked
+        self.num_cracked = 0
+
+        ##Total number of guesses so far
+        self.num_guesses = 0
+
+        ##If True, the keys of self.passwords are the raw encoded bytes rather than strings
+        self.byte_keys = False
+
+        ##Optional Bloom filter used to skip guesses that can't be in self.passwords
+        self.prefilter = None
+
+        ##Optional deduplicator used to only count the first time a guess is seen
+        self.dedup = None
+
+        ##How far into the guess stream the session is, as the number of guesses and
+        ##bytes read from stdin
+        self.input_guesses = 0
+        self.input_offset = 0
+
+        ##Optional Checkpointer used to periodically save the session
+        self.checkpoint = None
+
+        ##Optional SessionStats used to periodically print out how fast the session is running
+        self.stats = None
+
+        ##The type of hash the target passwords are, (see checkpass/hashed.py). None if they are plaintext
+        self.hash_type = None
+
+        ##GuessHasher used to hash the guesses when the targets are hashes
+        self.hasher = None
+
+        ##Encoding of the target set. Used to convert guesses passed to check_batch()
+        self.encoding = 'utf-8'
+
+        ##SessionOutput or MultiSetOutput to write the results to. Set by start_output()
+        self.report = None
+
+        ##Optional NearMissIndex used to also count guesses that normalize to a target
+        self.near_miss = None
+
+    ##############################################################
+    # Loads one or more target sets
+    #
+    # Takes the same options as the command line. If encoding is
+    # None it is detected from the first target set
+    # Returns a RetType
+    ##############################################################
+    def load_targets(self, targets, encoding = None, byte_keys = False, hash_type = None, num_workers = 1):
+        if isinstance(targets, str):
+            targets = [targets]
+
+        ##--A prebuilt index already knows its encoding
+        if len(targets) == 1 and hash_type is None and is_target_index(targets[0]):
+            possible_encodings = []
+            ret_value = load_target_index(targets[0], self, possible_encodings)
+            if ret_value == RetType.STATUS_OK:
+                self.encoding = possible_encodings[0]
+            return ret_value
+
+        if hash_type is not None:
+            encoding = encoding or 'utf-8'
+        elif encoding is None:
+            possible_encodings = []
+            if detect_file_encoding(targets[0], possible_encodings) != RetType.STATUS_OK:
+                return RetType.ENCODING_ERROR
+            encoding = possible_encodings[0]
+        self.encoding = encoding
+
+        for target, set_name in zip(targets, target_set_names(targets)):
+            if len(targets) > 1:
+                self.passwords.begin_set(set_name)
+
+            if hash_type is not None:
+                ret_value = read_hash_targets(target, self, hash_type)
+            else:
+                ret_value = read_input_passwords(target, self, file_encoding = encoding, byte_keys = byte_keys, num_workers = num_workers)
+            if ret_value != RetType.STATUS_OK:
+                return ret_value
+
+        if hash_type is not None:
+            self.hash_type = hash_type
+            self.hasher = GuessHasher(hash_type, self.passwords, encoding = encoding)
+
+        return RetType.STATUS_OK
+
+    ##############################################################
+    # Starts writing the cracking curve to output_file, (a file
+    # object), and the cracked passwords to cracked_file
+    #
+    # With more than one target set, output_file and cracked_file
+    # are lists with one file for each set
+    ##############################################################
+    def start_output(self, output_file = sys.stdout, cracked_file = None, curve = 'percent', curve_step = None):
+        if self.passwords.sets:
+            if cracked_file is None:
+                cracked_file = [None] * len(self.passwords.sets)
+            outputs = []
+            for target_set, set_output, set_cracked in zip(self.passwords.sets, output_file, cracked_file):
+                outputs.append(SessionOutput(set_output, set_cracked, target_set.num_passwords, encoding = self.encoding,
+                    byte_keys = self.byte_keys, curve = curve, curve_step = curve_step))
+            self.report = MultiSetOutput(self.passwords.sets, outputs)
+        else:
+            self.report = SessionOutput(output_file, cracked_file, self.num_passwords, encoding = self.encoding,
+                byte_keys = self.byte_keys, curve = curve, curve_step = curve_step)
+
+        self.report.start(self.num_guesses, self.num_cracked)
+
+    ##############################################################
+    # Writes the final line of the cracking curve
+    ##############################################################
+    def finish_output(self):
+        if self.report is not None:
+            self.report.finish(self.num_guesses, self.num_cracked)
+            self.report = None
+
+    ##############################################################
+    # Checks a list of guesses against the target set
+    #
+    # Returns a dict with the totals for the session so far,
+    # ('num_guesses', 'num_cracked', 'num_passwords'), and the
+    # passwords cracked by this batch as 'cracks', a list of
+    # (guess_num, guess, count)
+    ##############################################################
+    def check_batch(self, guesses):
+        for option in ['prefilter', 'dedup', 'near_miss']:
+            if getattr(self, option) is not None:
+                raise ValueError("check_batch() does not support " + option + ". Set it to None before checking guesses")
+
+        guesses = self._convert_guesses(guesses)
+        report = self.report
+        base_count = self.num_guesses
+        cracks = []
+
+        ##--Local references to keep the inner loop tight
+        lookup = self.passwords.index.get
+        if self.hasher is not None:
+            lookup = self.hasher.lookup_function(lookup)
+        counts = self.passwords.counts
+        cracked = self.passwords.cracked
+        guess_cracked = self.passwords.guess_cracked
+        if self.byte_keys:
+            debug_marker = b"CHECKPASSDEBUG"
+        else:
+            debug_marker = "CHECKPASSDEBUG"
+
+        ##--With hashed targets only the guesses whose hash is a target are looked at
+        if self.hasher is not None:
+            to_check = self.hasher.candidate_hits(guesses, base_count)
+        else:
+            to_check = enumerate(guesses, base_count + 1)
+
+        for guess_num, guess in to_check:
+            guess = guess.rstrip()
+            slot = lookup(guess)
+
+            if slot is not None and not cracked[slot]:
+                self.num_guesses = guess_num
+                cracked[slot] = 1
+                guess_cracked[slot] = guess_num
+                self.num_cracked = self.num_cracked + counts[slot]
+                cracks.append((guess_num, guess, counts[slot]))
+                if report is not None:
+                    report.cracked(guess_num, self.num_cracked, guess, counts[slot], slot)
+
+                #If all passwords have been cracked, the rest of the guesses don't count
+                if self.num_cracked >= self.num_passwords:
+                    break
+
+            if report is not None and guess.startswith(debug_marker):
+                report.debug(guess_num, self.num_cracked, guess)
+
+        else:
+            self.num_guesses = base_count + len(guesses)
+
+        if report is not None:
+            report.progress(self.num_guesses, self.num_cracked)
+
+        return {
+            'num_guesses': self.num_guesses,
+            'num_cracked': self.num_cracked,
+            'num_passwords': self.num_passwords,
+            'cracks': cracks,
+        }
+
+    ##############################################################
+    # Checks every guess from an iterable, batch_size at a time
+    #
+    # Stops after max_guesses guesses in total, or once every
+    # password has been cracked
+    # Returns the totals the same as check_batch(), with 'cracks'
+    # covering all the guesses checked
+    ##############################################################
+    def consume(self, guesses, batch_size = DEFAULT_BATCH_SIZE, max_guesses = None):
+        guesses = iter(guesses)
+        cracks = []
+        stats = {'num_guesses': self.num_guesses, 'num_cracked': self.num_cracked, 'num_passwords': self.num_passwords}
+
+        while self.num_cracked < self.num_passwords:
+            size = batch_size
+            if max_guesses is not None:
+                size = min(size, max_guesses - self.num_guesses)
+                if size <= 0:
+                    break
+            batch = list(islice(guesses, size))
+            if not batch:
+                break
+            stats = self.check_batch(batch)
+            cracks.extend(stats['cracks'])
+
+        stats['cracks'] = cracks
+        return stats
+
+    ##############################################################
+    # Converts guesses to the same type as the target passwords
+    #
+    # Each guess is converted on its own, so a batch can mix str
+    # and bytes
+    ##############################################################
+    def _convert_guesses(self, guesses):
+        if self.byte_keys:
+            keep_type, other_type = bytes, str
+        else:
+            keep_type, other_type = str, bytes
+
+        converted = []
+        for guess in guesses:
+            if isinstance(guess, keep_type):
+                converted.append(guess)
+            elif isinstance(guess, other_type):
+                if self.byte_keys:
+                    converted.append(guess.encode(self.encoding, errors='surrogateescape'))
+                else:
+                    converted.append(guess.decode(self.encoding, errors='surrogateescape'))
+            else:
+                raise TypeError("Guesses must be str or bytes, not " + type(guess).__name__)
+        return converted
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Removes duplicate guesses from the guess stream
+#
+# Rule based and Markov generators make a lot of duplicate guesses. A real password
+# cracker with a potfile would not count those, so when deduplication is turned on only
+# the first time a guess is seen counts towards the number of guesses.
+#
+# Guesses are compared on their raw bytes after trailing ASCII whitespace is removed.
+# CHECKPASSDEBUG strings are never removed.
+#
+# There are two modes:
+#   exact       - Keeps every guess seen in a set. Once the set uses more than the memory
+#                 limit it is written to disk as a sorted run file and a Bloom filter
+#                 over the spilled guesses is kept in memory so the run files only need
+#                 to be checked for guesses that might have been seen before.
+#   approximate - Keeps a Bloom filter of every guess seen. Uses a fixed amount of memory
+#                 but a small fraction of new guesses, (the false positive rate), will be
+#                 treated as duplicates
+#
+# Both modes need numpy for the Bloom filter. The exact mode will still work without it
+# but is much slower once it has spilled to disk
+#########################################################################################
+
+import sys
+import os
+import mmap
+import tempfile
+from array import array
+from math import log
+from itertools import accumulate
+from itertools import islice
+from bisect import bisect_left
+
+##--Custom imports
+from checkpass.prefilter import BloomFilter
+from checkpass.prefilter import HAS_NUMPY
+
+if HAS_NUMPY:
+    import numpy
+
+
+## Rough number of bytes used by each guess stored in a Python set, not including
+## the length of the guess itself
+SET_ENTRY_OVERHEAD = 90
+
+## Default memory limit for the exact mode in megabytes
+DEFAULT_DEDUP_MEMORY = 1024
+
+## Defaults for the approximate mode
+DEFAULT_DEDUP_ITEMS = 100000000
+DEFAULT_DEDUP_FP_RATE = 0.001
+
+
+#########################################################################################
+# Guesses that were spilled to disk, sorted by hash()
+#
+# The file is the hash of each guess as an int64 array, followed by a uint64 array of
+# where each guess starts, (plus one final entry for the end of the last guess), and then
+# the guesses one after another. Sorting by hash rather than by the guess itself means
+# the search can be done with bisect on the hashes, and only the guesses with a matching
+# hash need to be read back in
+#########################################################################################
+class SortedRun:
+    def __init__(self, filename, guesses):
+        self.filename = filename
+        self.num_guesses = len(guesses)
+
+        guesses = sorted(guesses, key=hash)
+        hashes = array('q', map(hash, guesses))
+        offsets = array('Q', [0])
+        offsets.extend(accumulate(map(len, guesses)))
+        with open(filename, 'wb') as file:
+            hashes.tofile(file)
+            offsets.tofile(file)
+            file.write(b''.join(guesses))
+
+        with open(filename, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mapped)
+        self.hashes = view[:8 * len(hashes)].cast('q')
+        self.offsets = view[8 * len(hashes):8 * (len(hashes) + len(offsets))].cast('Q')
+        self.keys_start = 8 * (len(hashes) + len(offsets))
+
+    def key(self, index):
+        start = self.keys_start
+        return self.mapped[start + self.offsets[index]:start + self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(self.num_guesses):
+            yield self.key(index)
+
+    def __contains__(self, guess):
+        hash_value = hash(guess)
+        hashes = self.hashes
+        index = bisect_left(hashes, hash_value)
+        while index < self.num_guesses and hashes[index] == hash_value:
+            if self.key(index) == guess:
+                return True
+            index = index + 1
+        return False
+
+    ##############################################################
+    # Returns the guesses in a list that are in the run
+    #
+    # Does the same thing as calling __contains__ for each one,
+    # but searches all of the hashes at once if numpy is installed
+    # and there are enough of them to be worth it
+    ##############################################################
+    def find(self, guesses):
+        if not HAS_NUMPY or len(guesses) < 64:
+            return [guess for guess in guesses if guess in self]
+
+        hashes = numpy.fromiter(map(hash, guesses), dtype=numpy.int64, count=len(guesses))
+        run_hashes = numpy.frombuffer(self.mapped, dtype=numpy.int64, count=self.num_guesses)
+
+        ##--Searching for the hashes in sorted order is much kinder to the cache
+        order = numpy.argsort(hashes)
+        indexes = numpy.empty(len(hashes), dtype=numpy.int64)
+        indexes[order] = numpy.searchsorted(run_hashes, hashes[order])
+        matches = numpy.flatnonzero(run_hashes[numpy.minimum(indexes, self.num_guesses - 1)] == hashes)
+
+        ##--Make sure the guess with the same hash really is the same guess
+        found = []
+        key = self.key
+        for match, index in zip(matches.tolist(), indexes[matches].tolist()):
+            guess = guesses[match]
+            if key(index) == guess or guess in self:
+                found.append(guess)
+        return found
+
+    def close(self):
+        self.hashes.release()
+        self.offsets.release()
+        self.mapped.close()
+        os.remove(self.filename)
+
+
+#########################################################################################
+# Exact deduplication with a memory limit
+#########################################################################################
+class ExactDeduplicator:
+    def __init__(self, max_memory = DEFAULT_DEDUP_MEMORY, spill_dir = None):
+
+        ##Memory limit in bytes for the guesses kept in memory
+        self.max_memory = max_memory * 1024 * 1024
+
+        ##Guesses seen that haven't been spilled to disk yet
+        self.seen = set()
+        self.memory_used = 0
+
+        ##Where to save the run files
+        self.spill_dir = tempfile.mkdtemp(prefix='checkpass_dedup_', dir=spill_dir)
+
+        ##Guesses that have been spilled to disk
+        self.runs = []
+        self.spill_filter = None
+        self.spill_capacity = 0
+
+        ##Number of duplicate guesses that were removed
+        self.num_duplicates = 0
+
+    ##############################################################
+    # Writes all the guesses in memory out to a new run file
+    ##############################################################
+    def _spill(self):
+        guesses = list(self.seen)
+        filename = os.path.join(self.spill_dir, 'run_' + str(len(self.runs)) + '.bin')
+        self.runs.append(SortedRun(filename, guesses))
+
+        ##--Add the new run to the filter. The filter is sized for a few more spills
+        ##--and is rebuilt from all of the runs when it fills up
+        if HAS_NUMPY:
+            total = sum(run.num_guesses for run in self.runs)
+            if self.spill_filter is None or total > self.spill_capacity:
+                self.spill_capacity = total * 4
+                self.spill_filter = BloomFilter(self.spill_capacity)
+                for run in self.runs[:-1]:
+                    keys = iter(run)
+                    batch = list(islice(keys, 1000000))
+                    while batch:
+                        self.spill_filter.add_passwords(batch)
+                        batch = list(islice(keys, 1000000))
+            self.spill_filter.add_passwords(guesses)
+
+        self.seen = set()
+        self.memory_used = 0
+
+    ##############################################################
+    # Returns True if a guess was spilled to disk
+    ##############################################################
+    def _in_runs(self, guess):
+        for run in self.runs:
+            if guess in run:
+                return True
+        return False
+
+    ##############################################################
+    # Returns the block with all the duplicate guesses removed
+    # Returns None if every guess in it was a duplicate
+    #
+    # Trailing whitespace is removed from the guesses that are
+    # kept. That doesn't change the results since it would be
+    # removed before matching anyways
+    ##############################################################
+    def filter_block(self, block):
+        guesses = [line.rstrip() for line in block.split(b'\n')]
+        seen = self.seen
+
+        ##--Debug strings need to be kept in order, even if they repeat, so the
+        ##--guesses in the block have to be checked one at a time
+        if b"CHECKPASSDEBUG" in block:
+            keep = []
+            for guess in guesses:
+                if guess.startswith(b"CHECKPASSDEBUG"):
+                    keep.append(guess)
+                elif guess not in seen and not (self.runs and self._in_runs(guess)):
+                    seen.add(guess)
+                    keep.append(guess)
+            new_guesses = [guess for guess in keep if not guess.startswith(b"CHECKPASSDEBUG")]
+
+        ##--Otherwise remove the duplicates in the block first, (keeping the first copy),
+        ##--then throw out the ones that have been seen before
+        else:
+            keep = [guess for guess in dict.fromkeys(guesses) if guess not in seen]
+
+            ##--Only the guesses that made it through the filter need to be looked up
+            ##--in the run files
+            if self.runs and keep:
+                if self.spill_filter is not None:
+                    maybe_spilled = set([guesses[index] for index in self.spill_filter.candidates(block)[0]])
+                    to_check = [guess for guess in keep if guess in maybe_spilled]
+                else:
+                    to_check = keep
+                spilled = set()
+                for run in self.runs:
+                    if to_check:
+                        spilled.update(run.find(to_check))
+                if spilled:
+                    keep = [guess for guess in keep if guess not in spilled]
+
+            seen.update(keep)
+            new_guesses = keep
+
+        self.num_duplicates = self.num_duplicates + len(guesses) - len(keep)
+        self.memory_used = self.memory_used + sum(map(len, new_guesses)) + SET_ENTRY_OVERHEAD * len(new_guesses)
+
+        if self.memory_used > self.max_memory:
+            self._spill()
+
+        if not keep:
+            return None
+        return b'\n'.join(keep)
+
+    def filter_blocks(self, blocks):
+        for block in blocks:
+            block = self.filter_block(block)
+            if block is not None:
+                yield block
+
+    ##############################################################
+    # Removes the run files
+    ##############################################################
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        os.rmdir(self.spill_dir)
+
+
+#########################################################################################
+# Approximate deduplication using a Bloom filter
+#########################################################################################
+class ApproximateDeduplicator:
+    def __init__(self, expected_items = DEFAULT_DEDUP_ITEMS, fp_rate = DEFAULT_DEDUP_FP_RATE):
+
+        ##--Bits per item for the requested false positive rate, plus a little extra
+        ##--since all the bits for an item are in the same word of the filter
+        bits_per_item = int(-log(fp_rate) / (log(2) ** 2)) + 2
+        self.filter = BloomFilter(expected_items, bits_per_item)
+
+        ##Number of duplicate guesses that were removed
+        self.num_duplicates = 0
+
+    ##############################################################
+    # Returns the block with all the duplicate guesses removed
+    # Returns None if every guess in it was a duplicate
+    #
+    # The same as ExactDeduplicator, trailing whitespace is
+    # removed from the guesses that are kept
+    ##############################################################
+    def filter_block(self, block):
+        guesses = [line.rstrip() for line in block.split(b'\n')]
+
+        ##--Debug strings need to be kept even if they repeat
+        if b"CHECKPASSDEBUG" in block:
+            keep = []
+            for guess in guesses:
+                if guess.startswith(b"CHECKPASSDEBUG"):
+                    keep.append(guess)
+                    continue
+                hashes = numpy.array([hash(guess)], dtype=numpy.int64).view(numpy.uint64)
+                if not self.filter.contains_hashes(hashes)[0]:
+                    self.filter.add_hashes(hashes)
+                    keep.append(guess)
+
+        ##--Otherwise remove the duplicates in the block first, (keeping the first copy),
+        ##--then throw out the ones that are in the filter
+        else:
+            unique = list(dict.fromkeys(guesses))
+
+            ##--hash() looks at every byte of the guess, and is the same for the whole run
+            hashes = numpy.fromiter(map(hash, unique), dtype=numpy.int64, count=len(unique)).view(numpy.uint64)
+            new = ~self.filter.contains_hashes(hashes)
+            self.filter.add_hashes(hashes[new])
+            keep = [unique[index] for index in numpy.flatnonzero(new).tolist()]
+
+        self.num_duplicates = self.num_duplicates + len(guesses) - len(keep)
+
+        if not keep:
+            return None
+        return b'\n'.join(keep)
+
+    def filter_blocks(self, blocks):
+        for block in blocks:
+            block = self.filter_block(block)
+            if block is not None:
+                yield block
+
+    def close(self):
+        pass
+
+
+#########################################################################################
+# Creates the deduplicator for the mode selected on the command line
+# Returns None if it could not be created
+#########################################################################################
+def create_deduplicator(mode, max_memory = DEFAULT_DEDUP_MEMORY, spill_dir = None, expected_items = DEFAULT_DEDUP_ITEMS, fp_rate = DEFAULT_DEDUP_FP_RATE):
+    if mode == 'exact':
+        if not HAS_NUMPY:
+            print("WARNING: numpy is not installed. Deduplication will be slow once it spills to disk", file=sys.stderr)
+        try:
+            return ExactDeduplicator(max_memory, spill_dir)
+        except OSError as error:
+            print("Error creating the directory to spill duplicate guesses to: " + str(error), file=sys.stderr)
+            return None
+
+    if mode == 'approximate':
+        if not HAS_NUMPY:
+            print("Error: Approximate deduplication requires numpy to be installed. pip install numpy", file=sys.stderr)
+            return None
+        return ApproximateDeduplicator(expected_items, fp_rate)
+
+    print("Error: Unknown deduplication mode " + str(mode), file=sys.stderr)
+    return None
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Estimates how many guesses a generator would take to crack each target password,
+# without making the guesses
+#
+# Generators that assign a probability to every guess, (PCFG, Markov, etc), make their
+# guesses in order of decreasing probability. So the guess number of a password is the
+# number of guesses the generator would make with a higher probability than it. Getting
+# that by checking the guesses takes as long as making them, which isn't practical
+# past 10^12 guesses or so.
+#
+# Instead this uses the Monte Carlo method from Dell'Amico and Filippone, "Monte Carlo
+# Strength Evaluation: Fast and Reliable Password Checking", CCS 2015:
+#   1. Draw n sample guesses from the generator, (randomly, following its probabilities)
+#      and record the probability p(b) of each one
+#   2. Have the generator score every target password to get its probability p(a)
+#   3. The estimated number of guesses with a higher probability than a is
+#         C(a) = sum over samples b with p(b) > p(a) of 1 / (n * p(b))
+#      which is an unbiased estimate. Its standard error is sqrt(Var(X) / n), where X is
+#      1 / p(b) for samples above p(a) and 0 otherwise
+#
+# Sorting the samples once and keeping running sums of 1 / p and 1 / p^2 makes each
+# estimate a binary search, so a curve out to 10^14 guesses takes as long as reading in
+# the samples and the target set.
+#
+# Both the samples and the target probabilities are text files with one item per line,
+# the guess and its probability separated by a tab. Only the probability is used from
+# the samples, so they can also be just the probability. Target passwords that aren't
+# in the probability file, or have a probability of 0, can't be cracked by the generator
+#########################################################################################
+
+import sys
+import math
+import bisect
+from array import array
+from itertools import accumulate
+from statistics import NormalDist
+
+##--Custom imports
+from checkpass.session_output import DEFAULT_CURVE_STEPS
+from checkpass.ret_types import RetType
+
+
+## Default confidence level for the confidence intervals
+DEFAULT_CONFIDENCE = 0.95
+
+
+#########################################################################################
+# Reads the probability of each sample guess into samples, (an array('d'))
+#########################################################################################
+def read_sample_probabilities(filename, samples):
+    num_invalid = 0
+    try:
+        with open(filename, 'rb') as file:
+            for line in file:
+                try:
+                    probability = float(line.rpartition(b'\t')[2])
+                except ValueError:
+                    num_invalid = num_invalid + 1
+                    continue
+                if not 0 < probability <= 1:
+                    num_invalid = num_invalid + 1
+                    continue
+                samples.append(probability)
+
+    except IOError as error:
+        print (error, file=sys.stderr)
+        print ("Error opening file " + filename, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if num_invalid != 0:
+        print("WARNING: Number of samples skipped because they didn't have a valid probability: " + str(num_invalid), file=sys.stderr)
+
+    if not samples:
+        print("Error: No valid samples in " + filename, file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Reads the probability the generator gives each target password
+#
+# Passwords are matched against the target set the same way guesses are, (trailing
+# whitespace is stripped). probabilities is an array('d') with one entry per slot in
+# cs.passwords, which starts out as 0 for every password
+#########################################################################################
+def read_target_probabilities(filename, cs, probabilities):
+    lookup = cs.passwords.index.get
+    num_invalid = 0
+    num_found = 0
+
+    try:
+        with open(filename, 'rb') as file:
+            for line in file:
+                password, tab, probability = line.rpartition(b'\t')
+                try:
+                    probability = float(probability)
+                except ValueError:
+                    num_invalid = num_invalid + 1
+                    continue
+                if not tab or not 0 <= probability <= 1:
+                    num_invalid = num_invalid + 1
+                    continue
+
+                password = password.rstrip()
+                if not cs.byte_keys:
+                    password = password.decode(cs.encoding, errors='surrogateescape')
+                slot = lookup(password)
+                if slot is not None:
+                    probabilities[slot] = probability
+                    num_found = num_found + 1
+
+    except IOError as error:
+        print (error, file=sys.stderr)
+        print ("Error opening file " + filename, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if num_invalid != 0:
+        print("WARNING: Number of lines skipped because they didn't have a valid probability: " + str(num_invalid), file=sys.stderr)
+    print("Probabilities found for " + str(num_found) + " of " + str(len(cs.passwords)) + " unique target passwords", file=sys.stderr)
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Estimates guess numbers from a set of sample probabilities
+#########################################################################################
+class GuessNumberEstimator:
+    def __init__(self, samples, confidence = DEFAULT_CONFIDENCE):
+
+        ##Number of samples
+        self.num_samples = len(samples)
+
+        ##The sample probabilities, negated and sorted so the highest probability is first
+        ##and bisect can find how many samples are above a probability
+        self.neg_probabilities = array('d', sorted(-probability for probability in samples))
+
+        ##Running sums of 1 / p and 1 / p^2 over the sorted samples, starting with 0
+        self.sum_inverse = array('d', accumulate((-1 / p for p in self.neg_probabilities), initial = 0))
+        self.sum_inverse_squared = array('d', accumulate((1 / (p * p) for p in self.neg_probabilities), initial = 0))
+
+        ##Number of standard errors on each side of the estimate
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    ##############################################################
+    # Returns the estimated guess number of a password with the
+    # given probability, and the low and high ends of the
+    # confidence interval for it
+    #
+    # Returns None if the generator would never make the guess
+    ##############################################################
+    def estimate(self, probability):
+        if probability <= 0:
+            return None
+
+        num_samples = self.num_samples
+        above = bisect.bisect_left(self.neg_probabilities, -probability)
+        mean = self.sum_inverse[above] / num_samples
+        variance = max(self.sum_inverse_squared[above] / num_samples - mean * mean, 0)
+        error = self.z * math.sqrt(variance / num_samples)
+
+        ##--The guess itself comes after all the ones with a higher probability
+        return mean + 1, max(mean - error, 0) + 1, mean + error + 1
+
+
+#########################################################################################
+# Estimates the guess number of every target password and writes out the cracking curve
+#
+# The estimated guess numbers are saved to cs.passwords.guess_cracked, (rounded to the
+# nearest guess), and every password the generator would crack within max_guesses is
+# marked as cracked, so the uncracked file and export work the same as after a normal
+# session.
+#
+# The curve has the same format as checkpass, with two more columns for the confidence
+# interval. For the percent curve they are the range of guess numbers it would take to
+# crack that many passwords, (the earliest if every password was cracked at the low end
+# of its interval, and the latest if at the high end). For the log and interval curves the guess numbers are fixed
+# and they are the range of the number of passwords cracked by then
+#########################################################################################
+def estimate_session(cs, estimator, probabilities, output_file, cracked_file = None, max_guesses = None,
+        curve = 'percent', curve_step = None):
+    passwords = cs.passwords
+    counts = passwords.counts
+    cracked = passwords.cracked
+    guess_cracked = passwords.guess_cracked
+    if curve_step is None:
+        curve_step = DEFAULT_CURVE_STEPS[curve]
+
+    ##--Each estimate is (guess_num, low, high, slot)
+    estimates = []
+    for slot in range(len(passwords)):
+        estimate = estimator.estimate(probabilities[slot])
+        if estimate is None:
+            continue
+        guess_num, low, high = estimate
+        if max_guesses != None and guess_num > max_guesses:
+            continue
+        estimates.append((guess_num, low, high, slot))
+    estimates.sort()
+
+    print(0, "\t", 0, file=output_file)
+    if curve == 'percent':
+        _write_percent_curve(estimates, counts, cs.num_passwords, curve_step, output_file)
+    else:
+        _write_guess_curve(estimates, counts, curve, curve_step, output_file)
+
+    ##--Record the results the same way a session does
+    slot_passwords = list(passwords)
+    cs.num_cracked = 0
+    for guess_num, low, high, slot in estimates:
+        cracked[slot] = 1
+        guess_cracked[slot] = round(guess_num)
+        cs.num_cracked = cs.num_cracked + counts[slot]
+        if cracked_file is not None:
+            password = slot_passwords[slot]
+            if cs.byte_keys:
+                password = password.decode(cs.encoding, errors='replace')
+            cracked_file.write(f"{round(guess_num)}\t{password}\n" * counts[slot])
+
+    if max_guesses != None:
+        cs.num_guesses = max_guesses
+    elif estimates:
+        cs.num_guesses = round(estimates[-1][0])
+    print(cs.num_guesses, "\t", cs.num_cracked, file=output_file)
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Returns the low and high ends of the estimates' confidence intervals, each sorted,
+# along with the running totals of the counts in that order, (starting from 0)
+#########################################################################################
+def _interval_totals(estimates, counts):
+    by_low = sorted(range(len(estimates)), key = lambda num: estimates[num][1])
+    by_high = sorted(range(len(estimates)), key = lambda num: estimates[num][2])
+    low_guesses = [estimates[num][1] for num in by_low]
+    high_guesses = [estimates[num][2] for num in by_high]
+    total_low = list(accumulate((counts[estimates[num][3]] for num in by_low), initial = 0))
+    total_high = list(accumulate((counts[estimates[num][3]] for num in by_high), initial = 0))
+    return low_guesses, total_low, high_guesses, total_high
+
+
+#########################################################################################
+# Writes a point every time curve_step percent of the passwords are cracked, with the
+# confidence interval of the guess number it happens at
+#########################################################################################
+def _write_percent_curve(estimates, counts, num_passwords, curve_step, output_file):
+    step_size = int(num_passwords * (curve_step / 100))
+    if step_size == 0:
+        step_size = 1
+    cur_step_limit = step_size
+
+    low_guesses, total_low, high_guesses, total_high = _interval_totals(estimates, counts)
+
+    num_cracked = 0
+    for guess_num, low, high, slot in estimates:
+        num_cracked = num_cracked + counts[slot]
+        if num_cracked >= cur_step_limit:
+            ##--The earliest that many could be cracked is if the passwords are all cracked
+            ##--at the low end of their intervals, and the latest is at the high end
+            earliest = low_guesses[bisect.bisect_left(total_low, num_cracked) - 1]
+            latest = high_guesses[bisect.bisect_left(total_high, num_cracked) - 1]
+            print(round(guess_num), "\t", num_cracked, "\t", round(earliest), "\t", round(latest), file=output_file)
+            cur_step_limit = cur_step_limit + step_size
+
+
+#########################################################################################
+# Writes a point at each guess number on a log or interval curve up to the last
+# estimated guess, with the confidence interval of the number cracked by then
+#########################################################################################
+def _write_guess_curve(estimates, counts, curve, curve_step, output_file):
+    if not estimates:
+        return
+
+    ##--Running totals of the counts, ordered by each end of the interval
+    by_guess = [guess_num for guess_num, low, high, slot in estimates]
+    total_cracked = list(accumulate((counts[estimate[3]] for estimate in estimates), initial = 0))
+    low_guesses, total_low, high_guesses, total_high = _interval_totals(estimates, counts)
+
+    last_guess = by_guess[-1]
+    curve_index = 1 if curve == 'interval' else 0
+    prev_point = 0
+    while True:
+        if curve == 'log':
+            point = math.ceil(10 ** (curve_index / curve_step))
+        else:
+            point = int(curve_index * curve_step)
+        curve_index = curve_index + 1
+        if point > last_guess:
+            break
+        ##--Small log steps can land on the same guess number more than once
+        if point <= prev_point:
+            continue
+        prev_point = point
+
+        ##--The most passwords cracked by then is all the ones that could be cracked
+        ##--earliest, and the least is the ones that would be cracked at the latest
+        num_cracked = total_cracked[bisect.bisect_right(by_guess, point)]
+        most_cracked = total_low[bisect.bisect_right(low_guesses, point)]
+        least_cracked = total_high[bisect.bisect_right(high_guesses, point)]
+        print(point, "\t", num_cracked, "\t", least_cracked, "\t", most_cracked, file=output_file)
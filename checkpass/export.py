@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Exports the per password results of a cracking session as NumPy .npy files
+#
+# The cracked file lists every cracked password, duplicates included, which is slow to
+# parse back in for graphing. Instead this writes one array per column, with one entry
+# for each unique target password, (in the order of the slots in the TargetStore):
+#
+#   counts.npy          uint32  Number of times the password occurs in the target set
+#   cracked.npy         uint8   1 if the password was cracked
+#   guess_cracked.npy   int64   Guess number that cracked the password, -1 if it wasn't
+#   set_counts_<name>.npy  uint32  Count in each target set, when more than one is loaded
+#   summary.json        The totals for the session and the names of the target sets
+#
+# The files are written directly rather than with numpy, so numpy isn't needed to run
+# checkpass. They can be loaded with numpy.load(filename, mmap_mode='r') without copying
+# them into memory. For example, the number cracked at any guess number is
+#   order = numpy.argsort(guess_cracked[cracked == 1])
+#   curve = numpy.cumsum(counts[cracked == 1][order])
+#########################################################################################
+
+import sys
+import os
+import json
+from array import array
+
+##--Custom imports
+from checkpass.ret_types import RetType
+
+
+## NumPy type of each array typecode. All the data is written out little endian
+NPY_TYPES = {'B': '|u1', 'I': '<u4', 'q': '<i8'}
+
+
+#########################################################################################
+# Writes values to a .npy file as a one dimensional array
+#
+# values can be an array, bytearray or memoryview with the matching typecode
+#########################################################################################
+def write_npy(filename, values, typecode):
+    ##--Only big endian systems need a copy to swap the byte order
+    if sys.byteorder != 'little' and typecode != 'B':
+        swapped = array(typecode)
+        swapped.frombytes(memoryview(values).cast('B'))
+        swapped.byteswap()
+        values = swapped
+
+    data = memoryview(values).cast('B')
+    length = len(data) // array(typecode).itemsize
+
+    ##--Format version 1.0. The header is padded with spaces so the data starts on a
+    ##--64 byte boundary
+    header = "{'descr': '" + NPY_TYPES[typecode] + "', 'fortran_order': False, 'shape': (" + str(length) + ",), }"
+    header_len = 10 + len(header) + 1
+    header = header + ' ' * (-header_len % 64) + '\n'
+
+    with open(filename, 'wb') as file:
+        file.write(b'\x93NUMPY\x01\x00')
+        file.write(len(header).to_bytes(2, 'little'))
+        file.write(header.encode('latin-1'))
+        file.write(data)
+
+
+#########################################################################################
+# Exports the results of a cracking session to a directory
+#########################################################################################
+def export_results(cs, directory):
+    passwords = cs.passwords
+    num_unique = len(passwords)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        write_npy(os.path.join(directory, 'counts.npy'), passwords.counts, 'I')
+        write_npy(os.path.join(directory, 'cracked.npy'), passwords.cracked, 'B')
+        write_npy(os.path.join(directory, 'guess_cracked.npy'), passwords.guess_cracked, 'q')
+
+        ##--Slots past the end of a set's counts don't occur in that set
+        for target_set in passwords.sets:
+            set_counts = array('I', target_set.counts)
+            set_counts.extend(bytes(num_unique - len(set_counts)))
+            write_npy(os.path.join(directory, 'set_counts_' + target_set.name + '.npy'), set_counts, 'I')
+
+        summary = {
+            'num_unique': num_unique,
+            'num_passwords': cs.num_passwords,
+            'num_cracked': cs.num_cracked,
+            'num_guesses': cs.num_guesses,
+            'hash_type': cs.hash_type,
+            'sets': [{'name': target_set.name, 'num_passwords': target_set.num_passwords, 'num_cracked': target_set.num_cracked} for target_set in passwords.sets],
+        }
+        with open(os.path.join(directory, 'summary.json'), 'w') as file:
+            json.dump(summary, file, indent=4)
+
+    except IOError as error:
+        print (error, file=sys.stderr)
+        print ("Error exporting the results to " + directory, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    return RetType.STATUS_OK
@@ -1,49 +1,158 @@
 #!/usr/bin/env python3
 
-# Used for autodetecting file encoding of the training password set
-# Requires the python package chardet to be installed
-# pip install chardet
-# You can also get it from https://github.com/chardet/chardet
-from chardet.universaldetector import UniversalDetector
+#########################################################################################
+# Reads in the target set and writes out the uncracked passwords
+#
+# The target file is read as decoded strings by default, or as raw encoded bytes with
+# byte_keys. The two don't split lines the same way. Strings are split by the codecs
+# reader, which also splits on '\r', '\x0b', '\x0c', '\x1c'-'\x1e', '\x85', U+2028 and
+# U+2029 as well as '\n'. Bytes are only split on b'\n', so a target like b'x\ry' is one
+# password with byte_keys and two, ('x' and 'y'), without it. Guesses are always split
+# on b'\n', so only the byte_keys target can be cracked by the guess b'x\ry'
+#########################################################################################
 
 import sys
 import os
 import errno
 import codecs
+import multiprocessing
+from collections import Counter, deque
 
 ##--Custom imports
 from checkpass.ret_types import RetType
+from checkpass.compressed import detect_compression, read_compressed_head, open_target_file
+from checkpass.compressed import HEAD_SIZE, COMPRESSION_ERRORS, COMPRESSION_EXTENSIONS
+
+
+## Largest chunk of the target file that each worker reads at a time when loading it
+## with more than one process
+MAX_LOAD_CHUNK_SIZE = 64 * 1024 * 1024
+
+## Size of the chunks of a compressed target file that are handed to each worker. These
+## are read into memory by the main process, so are kept smaller
+COMPRESSED_LOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+## Number of byte ranges to sample from the file when detecting its encoding, and the
+## size of each one. Small files are read in full
+ENCODING_SAMPLE_COUNT = 16
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+
+#################################################################################################
+# Reads evenly spaced samples from a file for detecting its encoding
+#
+# Each sample is trimmed to whole lines so multi-byte characters are never cut in half
+# Returns a list of the samples
+#################################################################################################
+def _read_encoding_samples(file, file_size, num_samples = ENCODING_SAMPLE_COUNT, sample_size = ENCODING_SAMPLE_SIZE):
+    if file_size <= num_samples * sample_size:
+        return [file.read()]
+
+    samples = []
+    for sample_num in range(num_samples):
+        ##--The last sample ends at the end of the file
+        offset = (file_size - sample_size) * sample_num // (num_samples - 1)
+        file.seek(offset)
+        sample = file.read(sample_size)
+
+        ##--Drop the partial lines at each end
+        if offset != 0:
+            sample = sample[sample.find(b'\n') + 1:]
+        if offset + sample_size < file_size:
+            sample = sample[:sample.rfind(b'\n') + 1]
+        samples.append(sample)
+
+    return samples
+
 
 #################################################################################################
 # Used for autodetecting file encoding of the training password set
-# Requires the python package chardet to be installed
+#
+# Rather than reading the whole file, a number of samples spread across the file are
+# checked. Most password lists are UTF-8, (or plain ASCII which is a subset of it), so if
+# every sample is valid UTF-8 that is what is used. Otherwise the lines in the samples
+# with non-ASCII bytes are passed to chardet to figure out what the encoding is
+#
+# Compressed files can only be read from the start, so for them just the start of the file
+# is checked. The decompressor is kept open so the file isn't decompressed a second time
+# when the passwords are read in, (see compressed.py)
+#
+# Requires the python package chardet to be installed for files that aren't UTF-8
 # pip install chardet
 # You can also get it from https://github.com/chardet/chardet
-# I'm keeping the declarations for the chardet package local to this file so people can run this
+# I'm keeping the declarations for the chardet package local to this function so people can run this
 # tool without installing it if they don't want to use this feature
 ##################################################################################################
 def detect_file_encoding(training_file, file_encoding, max_passwords = 10000):
     print()
     print("Attempting to autodetect file encoding of the training passwords", file=sys.stderr)
     print("-----------------------------------------------------------------", file=sys.stderr)
-    detector = UniversalDetector()
     try:
-        cur_count = 0
-        with open(training_file, 'rb') as file:
-            for line in file.readlines():
-                detector.feed(line)
-                if detector.done: 
-                    break
-                cur_count = cur_count + 1
-                if cur_count >= max_passwords:
-                    break
-            detector.close()
-    except IOError as error:
+        compression = detect_compression(training_file)
+        if compression is not None:
+            head = read_compressed_head(training_file, compression)
+            ##--Drop the partial line at the end if there is more to the file
+            if len(head) == HEAD_SIZE and b'\n' in head:
+                head = head[:head.rfind(b'\n') + 1]
+            samples = [head]
+        else:
+            with open(training_file, 'rb') as file:
+                file_size = os.fstat(file.fileno()).st_size
+                samples = _read_encoding_samples(file, file_size)
+    except COMPRESSION_ERRORS as error:
         print ("Error opening file " + training_file, file=sys.stderr)
         print ("Error is " + str(error), file=sys.stderr)
         return RetType.FILE_IO_ERROR
-        
+
+    ##--Quick check for UTF-8. A byte order mark means it is a UTF-16 or UTF-32 file, and
+    ##--null bytes are a good sign of one without a byte order mark
+    start = samples[0][:4]
+    has_utf8_bom = start.startswith(codecs.BOM_UTF8)
+    if not start.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) and not any(b'\x00' in sample for sample in samples):
+        try:
+            for sample in samples:
+                sample.decode('utf-8')
+
+            encoding = 'utf-8-sig' if has_utf8_bom else 'utf-8'
+            file_encoding.append(encoding)
+            print("File Encoding Detected: " + encoding, file=sys.stderr)
+            print("Every sample of the file was valid UTF-8", file=sys.stderr)
+            print()
+            return RetType.STATUS_OK
+
+        except UnicodeDecodeError:
+            pass
+
+    ##--Otherwise let chardet figure it out
     try:
+        from chardet import UniversalDetector
+    except ImportError:
+        print("Error: The target file is not UTF-8 and the python package chardet is not installed to detect its encoding", file=sys.stderr)
+        print("Either install it with 'pip install chardet' or specify the file encoding with --encoding", file=sys.stderr)
+        return RetType.ENCODING_ERROR
+
+    ##--Only the lines with non-ASCII bytes tell the encodings apart, and they may only be
+    ##--in the last sample, so chardet is given those first
+    lines = [line for sample in samples for line in sample.splitlines(keepends=True)]
+    non_ascii = [line for line in lines if not line.isascii()]
+    if non_ascii:
+        lines = non_ascii
+
+    detector = UniversalDetector()
+    for line in lines[:max_passwords]:
+        detector.feed(line)
+        if detector.done:
+            break
+    detector.close()
+
+    try:
+        if detector.result['encoding'] is None:
+            print("Error: Could not detect the file encoding. Please specify it with --encoding", file=sys.stderr)
+            return RetType.ENCODING_ERROR
+        ##--ASCII would throw away every target with a non-ASCII character as an encoding error
+        if non_ascii and detector.result['encoding'].lower() == 'ascii':
+            print("Error: The target file has non-ASCII characters but chardet detected it as ASCII. Please specify the encoding with --encoding", file=sys.stderr)
+            return RetType.ENCODING_ERROR
         file_encoding.append(detector.result['encoding'])
         print("File Encoding Detected: " + str(detector.result['encoding']), file=sys.stderr)
         print("Confidence for file encoding: " + str(detector.result['confidence']), file=sys.stderr)
@@ -57,29 +166,295 @@ def detect_file_encoding(training_file, file_encoding, max_passwords = 10000):
     return RetType.STATUS_OK
 
 
+#########################################################################################
+# Checks if an encoding stores newlines and other ASCII characters as single bytes
+#
+# Needed when working with raw bytes, since guesses and targets are split on b'\n'
+# and the CHECKPASSDEBUG marker is searched for directly in the raw input.
+# Encodings like UTF-16 will fail this check
+#########################################################################################
+def is_ascii_compatible(file_encoding):
+    test_string = "\n \tCHECKPASSDEBUG"
+    try:
+        return test_string.encode(file_encoding) == test_string.encode('ascii')
+    except (LookupError, UnicodeError):
+        return False
+
+
+#########################################################################################
+# Checks if a target file in an encoding can be split into chunks on b'\n'
+#
+# utf-8-sig isn't ASCII compatible since it adds a byte order mark when encoding, but
+# past the mark it is the same as UTF-8, so the first chunk is decoded as utf-8-sig and
+# the rest as UTF-8
+#########################################################################################
+def _can_split_lines(file_encoding):
+    if is_ascii_compatible(file_encoding):
+        return True
+    try:
+        return codecs.lookup(file_encoding).name == 'utf-8-sig'
+    except LookupError:
+        return False
+
+
 #########################################################################################
 # Reads in all of the passwords and returns the raw passwords, (minus any POT formatting
 # to master_password_list
 # Format of the raw passwords is (password,"DATA" or "COMMENT")
 # I wanted to pass my comments through to the main program to make displaying results of
 # unit tests easier
+#
+# If byte_keys is True, the passwords are stored as the raw encoded bytes from the file
+# rather than as decoded strings. This lets guesses be matched without decoding them first.
+# The passwords are still decoded once when read in so that lines with encoding errors
+# are skipped the same way as before. Note: In this mode only ASCII whitespace is
+# stripped from the end of a password, and lines are only split on b'\n', (see the top
+# of this file)
+#
+# If num_workers is more than 1 the file is split into chunks that are read in by that
+# many processes, (see _read_passwords_parallel)
+#
+# Compressed target files, (gzip, bz2, xz or zstd), are decompressed as they are read
 #########################################################################################
-def read_input_passwords(training_file, cs, file_encoding = 'utf-8'):
+def read_input_passwords(training_file, cs, file_encoding = 'utf-8', byte_keys = False, num_workers = 1):
     ##--keep track of the return value. If there are any Commnents return RetType.DEBUG vs RetType.STATUS_OK
     ret_value = RetType.STATUS_OK
+
+    if byte_keys and not is_ascii_compatible(file_encoding):
+        print("Error: Matching on raw bytes is not supported for the file encoding " + str(file_encoding), file=sys.stderr)
+        return RetType.ENCODING_ERROR
+
+    cs.byte_keys = byte_keys
+
     ##-- First try to open the file--##
     try:
-        with codecs.open(training_file, 'r', encoding=file_encoding, errors= 'surrogateescape') as file:
-            
-            num_encoding_errors = 0  ##The number of encoding errors encountered when parsing the input file
-            
-            # Read though all the passwords
-            for password in file:
-                ##--Note, there is a large potential for encoding errors to slip in
-                ##--   I don't want to silently ignore these errors, but instead warn the user they are
-                ##--   occuring so they can look at what file encoding they are using again
+        if num_workers > 1 and _can_split_lines(file_encoding) and detect_compression(training_file) is not None:
+            num_encoding_errors = _read_compressed_parallel(training_file, cs, file_encoding, byte_keys, num_workers)
+        elif num_workers > 1 and _can_split_lines(file_encoding):
+            num_encoding_errors = _read_passwords_parallel(training_file, cs, file_encoding, byte_keys, num_workers)
+        elif byte_keys:
+            num_encoding_errors = _read_byte_passwords(training_file, cs, file_encoding)
+        else:
+            num_encoding_errors = _read_string_passwords(training_file, cs, file_encoding)
+
+        if num_encoding_errors != 0:
+            print()
+            print("WARNING: One or more passwords in the training set did not decode properly", file=sys.stderr)
+            print("         Number of encoding errors encountered: " + str(num_encoding_errors), file=sys.stderr)
+            print("         Ignoring passwords that contained encoding errors so it does not skew the results", file=sys.stderr)
+            print("         If you see a lot of these errors then you may want to re-run the training", file=sys.stderr)
+            print("         with a different file encoding")
+
+    except COMPRESSION_ERRORS as error:
+        print (error, file=sys.stderr)
+        print ("Error opening file " + training_file, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    return ret_value
+
+
+#########################################################################################
+# Reads the passwords in as decoded strings
+# Returns the number of encoding errors encountered
+#########################################################################################
+def _read_string_passwords(training_file, cs, file_encoding):
+    with open_target_file(training_file) as raw_file:
+        ##--Same reader codecs.open() uses, so lines are split the same way
+        file = codecs.getreader(file_encoding)(raw_file, errors= 'surrogateescape')
+
+        num_encoding_errors = 0  ##The number of encoding errors encountered when parsing the input file
+
+        # Read though all the passwords
+        for password in file:
+            ##--Note, there is a large potential for encoding errors to slip in
+            ##--   I don't want to silently ignore these errors, but instead warn the user they are
+            ##--   occuring so they can look at what file encoding they are using again
+            try:
+                password.encode(file_encoding)
+            except UnicodeEncodeError as e:
+                if e.reason == 'surrogates not allowed':
+                    num_encoding_errors = num_encoding_errors + 1
+                else:
+                    print("Hmm, there was a weird problem reading in a line from the training file", file=sys.stderr)
+                    print()
+                continue
+
+            ##--Now save the password
+            ##--If the password has already been read in, (aka multiple people used the same password), this increments the count
+            cs.num_passwords = cs.num_passwords + 1
+            cs.passwords.add(password.rstrip())
+
+    return num_encoding_errors
+
+
+#########################################################################################
+# Reads the passwords in as raw encoded bytes. Lines are only split on b'\n'
+# Returns the number of encoding errors encountered
+#########################################################################################
+def _read_byte_passwords(training_file, cs, file_encoding):
+    with open_target_file(training_file) as file:
+
+        num_encoding_errors = 0  ##The number of encoding errors encountered when parsing the input file
+
+        for password in file:
+            ##--Decode the password to make sure it is valid, but don't keep the result
+            try:
+                password.decode(file_encoding)
+            except UnicodeDecodeError:
+                num_encoding_errors = num_encoding_errors + 1
+                continue
+
+            ##--Now save the password
+            cs.num_passwords = cs.num_passwords + 1
+            cs.passwords.add(password.rstrip())
+
+    return num_encoding_errors
+
+
+#########################################################################################
+# Reads the passwords in using several processes
+#
+# The file is split into chunks on newline boundaries. Each worker reads in a chunk,
+# checks for encoding errors and counts how many times each password occurs in it. The
+# counts are then added to the target set in the order of the chunks, so the passwords
+# end up in the same slots, with the same counts and number of encoding errors, as when
+# reading the file one line at a time
+#
+# Only works for ASCII compatible encodings and utf-8-sig since the file is split on
+# b'\n', (see _can_split_lines). Returns the number of encoding errors encountered
+#########################################################################################
+def _read_passwords_parallel(training_file, cs, file_encoding, byte_keys, num_workers):
+    file_size = os.path.getsize(training_file)
+    num_chunks = max(num_workers * 4, file_size // MAX_LOAD_CHUNK_SIZE + 1)
+
+    ##--Move each split point forward to the start of the next line
+    boundaries = [0]
+    with open(training_file, 'rb') as file:
+        for chunk_num in range(1, num_chunks):
+            file.seek(max(file_size * chunk_num // num_chunks, boundaries[-1]))
+            file.readline()
+            position = file.tell()
+            if position >= file_size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(file_size)
+
+    ##--A byte order mark is only removed from the start of the file
+    chunk_encoding = file_encoding
+    if codecs.lookup(file_encoding).name == 'utf-8-sig':
+        chunk_encoding = 'utf-8'
+
+    chunks = []
+    for chunk_num in range(len(boundaries) - 1):
+        encoding = file_encoding if chunk_num == 0 else chunk_encoding
+        chunks.append((training_file, boundaries[chunk_num], boundaries[chunk_num + 1], encoding, byte_keys))
+
+    num_encoding_errors = 0
+    with multiprocessing.Pool(num_workers) as pool:
+        for counts, num_passwords, num_errors in pool.imap(_count_chunk, chunks):
+            cs.passwords.add_counts(counts)
+            cs.num_passwords = cs.num_passwords + num_passwords
+            num_encoding_errors = num_encoding_errors + num_errors
+
+    return num_encoding_errors
+
+
+#########################################################################################
+# Reads the passwords in from a compressed file using several processes
+#
+# A compressed file can't be split up by byte offsets, so the main process decompresses
+# it and hands each chunk of whole lines to the workers. Only a few chunks are in flight
+# at a time to limit the memory used. The counts are added in order, the same as
+# _read_passwords_parallel
+#
+# Returns the number of encoding errors encountered
+#########################################################################################
+def _read_compressed_parallel(training_file, cs, file_encoding, byte_keys, num_workers):
+    ##--A byte order mark is only removed from the start of the file
+    chunk_encoding = file_encoding
+    if codecs.lookup(file_encoding).name == 'utf-8-sig':
+        chunk_encoding = 'utf-8'
+
+    num_encoding_errors = 0
+    pending = deque()
+    encoding = file_encoding
+    with open_target_file(training_file) as file, multiprocessing.Pool(num_workers) as pool:
+        while True:
+            data = file.read(COMPRESSED_LOAD_CHUNK_SIZE)
+            if data:
+                data = data + file.readline()
+                pending.append(pool.apply_async(_count_data, ((data, encoding, byte_keys),)))
+                encoding = chunk_encoding
+
+            ##--Wait on the oldest chunk once enough are queued up, or at the end of the file
+            if pending and (not data or len(pending) > num_workers * 2):
+                counts, num_passwords, num_errors = pending.popleft().get()
+                cs.passwords.add_counts(counts)
+                cs.num_passwords = cs.num_passwords + num_passwords
+                num_encoding_errors = num_encoding_errors + num_errors
+
+            if not data and not pending:
+                break
+
+    return num_encoding_errors
+
+
+#########################################################################################
+# Counts the passwords in one chunk of the target file. Runs in a worker process
+#
+# Returns the same as _count_data
+#########################################################################################
+def _count_chunk(chunk):
+    training_file, start, end, file_encoding, byte_keys = chunk
+    with open(training_file, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    return _count_data((data, file_encoding, byte_keys))
+
+
+#########################################################################################
+# Counts the passwords in a chunk of data from the target file. Runs in a worker process
+#
+# Lines are split and checked the same way as _read_string_passwords and
+# _read_byte_passwords do. Returns a dict of password: count in the order each password
+# is first seen, the number of passwords and the number of encoding errors
+#########################################################################################
+def _count_data(chunk):
+    data, file_encoding, byte_keys = chunk
+
+    ##--If the whole chunk decodes then every line in it does
+    try:
+        data.decode(file_encoding)
+        has_errors = False
+    except UnicodeDecodeError:
+        has_errors = True
+
+    num_encoding_errors = 0
+    if byte_keys:
+        lines = data.split(b'\n')
+        if lines[-1] == b'':
+            lines.pop()
+        if has_errors:
+            valid_lines = []
+            for line in lines:
                 try:
-                    password.encode(file_encoding)
+                    line.decode(file_encoding)
+                except UnicodeDecodeError:
+                    num_encoding_errors = num_encoding_errors + 1
+                    continue
+                valid_lines.append(line)
+            lines = valid_lines
+
+    else:
+        ##--codecs splits lines the same way as splitlines(), (on '\r' and others as well as '\n')
+        lines = data.decode(file_encoding, errors='surrogateescape').splitlines(keepends=True)
+        if has_errors:
+            valid_lines = []
+            for line in lines:
+                try:
+                    line.encode(file_encoding)
                 except UnicodeEncodeError as e:
                     if e.reason == 'surrogates not allowed':
                         num_encoding_errors = num_encoding_errors + 1
@@ -87,45 +462,85 @@ def read_input_passwords(training_file, cs, file_encoding = 'utf-8'):
                         print("Hmm, there was a weird problem reading in a line from the training file", file=sys.stderr)
                         print()
                     continue
-      
-                ##--Now save the password
-                cs.num_passwords = cs.num_passwords + 1
-                clean_password = password.rstrip()
-                ## If the password has already been read in, (aka multiple people used the same password), increment the count
-                if clean_password  in cs.passwords:
-                    cs.passwords[clean_password][0] = cs.passwords[clean_password][0] + 1
-                ## Otherwise insert the password into the list if it is the first time it has been seen
-                else:
-                    ## The values of cs.passwords are (Password_String: [Number_of_Passwords, isCracked, Number_Of_Guesses_To_Crack])   
-                    cs.passwords[clean_password] = [1,False,-1]
-
-            if num_encoding_errors != 0:
-                print()
-                print("WARNING: One or more passwords in the training set did not decode properly", file=sys.stderr)
-                print("         Number of encoding errors encountered: " + str(num_encoding_errors), file=sys.stderr)
-                print("         Ignoring passwords that contained encoding errors so it does not skew the results", file=sys.stderr)
-                print("         If you see a lot of these errors then you may want to re-run the training", file=sys.stderr)
-                print("         with a different file encoding")
-                    
-    except IOError as error:
-        print (error, file=sys.stderr)
-        print ("Error opening file " + training_file, file=sys.stderr)
-        return RetType.FILE_IO_ERROR
-    
-    return ret_value
+                valid_lines.append(line)
+            lines = valid_lines
+
+    counts = Counter(map(bytes.rstrip if byte_keys else str.rstrip, lines))
+    return dict(counts), len(lines), num_encoding_errors
+
+
+#######################################################################################
+# Returns a short name for each target set based on its filename
+#
+# Used to label the results when more than one target set is checked at a time
+#######################################################################################
+def target_set_names(training_files):
+    names = []
+    for training_file in training_files:
+        name = os.path.basename(training_file)
+        ##--rockyou.txt.gz is named rockyou rather than rockyou.txt
+        root, extension = os.path.splitext(name)
+        if extension.lower() in COMPRESSION_EXTENSIONS:
+            name = root
+        name = os.path.splitext(name)[0]
+        ##--Make sure every name is unique
+        if name in names:
+            name = name + "_" + str(len(names) + 1)
+        names.append(name)
+    return names
+
+
+#######################################################################################
+# Returns the filename to save the results for one target set to
+#
+# The name of the target set is added before the file extension.
+# For example results.txt becomes results_rockyou.txt
+#######################################################################################
+def target_set_filename(filename, set_name):
+    root, extension = os.path.splitext(filename)
+    return root + "_" + set_name + extension
 
 
 #######################################################################################
 # Writes uncracked passwords from the target set to disk
+#
+# If target_set is specified, only the passwords in that set are written
+# If uncracked is specified, it is used instead of the passwords that are marked as
+# uncracked in cs. It is an iterable of (password, count)
 #######################################################################################
-def write_uncracked_to_disk(cs, uncracked_file, file_encoding = "UTF-8"):
+def write_uncracked_to_disk(cs, uncracked_file, file_encoding = "UTF-8", target_set = None, uncracked = None):
+    if uncracked is None:
+        uncracked = cs.passwords.uncracked(target_set)
+
+    ##--Hashes are written out in hex
+    if cs.hash_type is not None:
+        try:
+            with open(uncracked_file, 'w') as file:
+                for password, count in uncracked:
+                    for i in range(0,count):
+                        file.write(password.hex() + "\n")
+
+        except Exception as error:
+            print('Error opening the uncracked file. Error: ', str(error), file=sys.stderr)
+        return
+
+    ##--The passwords are already encoded so just write them out as is
+    if cs.byte_keys:
+        try:
+            with open(uncracked_file, 'wb') as file:
+                for password, count in uncracked:
+                    for i in range(0,count):
+                        file.write(password + b"\n")
+
+        except Exception as error:
+            print('Error opening the uncracked file. Error: ', str(error), file=sys.stderr)
+        return
+
     try:
         with codecs.open(uncracked_file, 'w', encoding=file_encoding) as file:
-            for password in cs.passwords:
-                result = cs.passwords.get(password)
-                if result[1] == False:
-                    for i in range(0,result[0]):
-                        file.write(password + "\n")
+            for password, count in uncracked:
+                for i in range(0,count):
+                    file.write(password + "\n")
 
     except Exception as error:
         print('Error opening the uncracked file. Error: ', str(error), file=sys.stderr)
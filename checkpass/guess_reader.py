@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Reads password guesses from a binary stream, (normally sys.stdin.buffer)
+#
+# Rather than calling readline() once per guess, the input is read in large
+# blocks and handed back to the caller split on a newline boundary. That way the
+# caller can decode and split a whole block of guesses at once and run the
+# dictionary lookups in a tight loop
+#########################################################################################
+
+import sys
+
+
+## Default number of bytes to request from the input stream per read
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+#########################################################################################
+# Generator that yields blocks of raw guesses from the input stream
+#
+# Every block that is yielded contains one or more complete guesses separated by b'\n'
+# The trailing newline of the last guess in the block is removed, so
+#   block.split(b'\n') returns exactly one item per guess
+#
+# If block_size is 0, the stream is read one line at a time, (the legacy behavior), and
+# each block is a single guess
+#
+# Stops cleanly when the end of the input stream is reached. If the final guess is not
+# terminated by a newline it is still returned
+#########################################################################################
+def read_guess_blocks(stream, block_size = DEFAULT_BLOCK_SIZE):
+
+    ##--Legacy mode, one guess per read
+    if block_size == 0:
+        while True:
+            try:
+                line = stream.readline()
+            except Exception as error:
+                print ("halting due to :" + str(error), file=sys.stderr)
+                return
+
+            if not line:
+                return
+
+            if line.endswith(b'\n'):
+                line = line[:-1]
+            yield line
+
+    ##--Use read1 if it is available so we don't wait for a full block to arrive
+    ##--before processing guesses. Otherwise progress would stall on slow generators
+    read = getattr(stream, 'read1', stream.read)
+
+    ##--Partial guess left over at the end of the previous block
+    remainder = b''
+
+    while True:
+        try:
+            data = read(block_size)
+        except Exception as error:
+            print ("halting due to :" + str(error), file=sys.stderr)
+            return
+
+        ##--End of the input
+        if not data:
+            if remainder:
+                yield remainder
+            return
+
+        if remainder:
+            data = remainder + data
+
+        ##--Only hand back complete guesses, save the rest for the next read
+        last_newline = data.rfind(b'\n')
+        if last_newline == -1:
+            remainder = data
+            continue
+
+        remainder = data[last_newline + 1:]
+        yield data[:last_newline]
+
+
+#########################################################################################
+# Reads and throws away the first num_guesses guesses from the input stream
+#
+# Used when resuming a session where the guess generator was started over from the
+# beginning. Nothing past the last skipped guess is read, so the stream can then be
+# passed to read_guess_blocks as normal
+#
+# Returns the number of guesses that were skipped, which is less than num_guesses if the
+# end of the input was reached first
+#########################################################################################
+def skip_guesses(stream, num_guesses):
+    skipped = 0
+
+    ##--If possible look at what is already buffered so a whole buffer of guesses can
+    ##--be skipped at once without reading past the last one
+    if not hasattr(stream, 'peek'):
+        while skipped < num_guesses and stream.readline():
+            skipped = skipped + 1
+        return skipped
+
+    while skipped < num_guesses:
+        data = stream.peek()
+        if not data:
+            break
+
+        num_lines = data.count(b'\n')
+        if skipped + num_lines < num_guesses:
+            stream.read(len(data))
+            skipped = skipped + num_lines
+            continue
+
+        ##--The last guess to skip is in this buffer
+        position = -1
+        for _ in range(num_guesses - skipped):
+            position = data.index(b'\n', position + 1)
+        stream.read(position + 1)
+        skipped = num_guesses
+
+    return skipped
+
+
+#########################################################################################
+# Splits a block of guesses and decodes them
+#
+# The whole block is decoded at once. Only if there is a problem somewhere in the block
+# is each guess decoded individually. Guesses that can't be decoded are replaced with
+# None so they still count as a guess but can never match a target password
+#
+# Returns the list of guesses and the number of decoding errors
+#########################################################################################
+def decode_guess_block(block, encoding):
+    try:
+        return block.decode(encoding).split('\n'), 0
+
+    except UnicodeDecodeError:
+        guesses = []
+        num_errors = 0
+        for raw_guess in block.split(b'\n'):
+            try:
+                guesses.append(raw_guess.decode(encoding))
+            except UnicodeDecodeError:
+                guesses.append(None)
+                num_errors = num_errors + 1
+
+        return guesses, num_errors
+
+
+#########################################################################################
+# Lets the user know about errors decoding the input guesses
+#
+# prev_errors is the total number of errors before the latest block, and num_input_errors
+# is the total including it
+#########################################################################################
+def report_input_errors(prev_errors, num_input_errors, verbose = False):
+    if verbose:
+        for num_errors in range(prev_errors + 1, num_input_errors + 1):
+            print("error decoding input guess. Total number of errors = " + str(num_errors), file=sys.stderr)
+    else:
+        if prev_errors < 10000 <= num_input_errors:
+            print("***Warning***", file=sys.stderr)
+            print("10,000 errors have occured while processing the input", file=sys.stderr)
+            print("Your results may be unreliable")
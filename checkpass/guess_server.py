@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Accepts guesses from several producers at once over Unix domain sockets or named pipes
+#
+# Normally guesses are read from stdin, so generators running as several processes have
+# to be funneled through a single pipe. In server mode each producer connects on its own
+# and the server interleaves their guesses into the one stream the session checks.
+#
+# Each producer sends its guesses as frames:
+#   4 bytes     Length of the payload, (uint32 little endian)
+#   4 bytes     Producer id, 0 to num_producers - 1, (uint32 little endian)
+#   8 bytes     Sequence number of the frame for this producer, starting at 0,
+#               (uint64 little endian)
+#   N bytes     Payload. One or more guesses separated by b'\n'. A trailing newline is
+#               optional. Empty payloads are ignored
+# The producer closes the connection once it is finished. A producer with no guesses
+# still sends one empty frame so the server knows which producer it was. For named pipes
+# the producer id in the frame is ignored and the position of the pipe on the command
+# line is used.
+#
+# The payload of a frame is handed to the matching loop as one block, the same as a block
+# from read_guess_blocks(), so guesses are never read one line at a time.
+#
+# Interleave orders:
+#   round_robin - One frame from each producer in turn, by producer id. A producer that
+#                 has finished is skipped. The guess numbers are the same every run no
+#                 matter how fast each producer is, but the session runs at the speed of
+#                 the slowest producer
+#   arrival     - Frames are checked in the order they arrive. Fastest, but the guess
+#                 numbers can change from run to run
+#
+# In both orders the sequence numbers are checked so a lost or repeated frame is caught
+# rather than silently changing the guess numbers. A bad frame, or a connection that is
+# rejected or closes before saying which producer it is, stops the server with an error
+# since the session could otherwise wait forever for a producer that will never finish.
+#
+# The server runs an asyncio event loop in a background thread. Only a few frames are
+# buffered for each producer, so a producer that gets ahead is slowed down by its socket
+# filling up rather than using more and more memory.
+#########################################################################################
+
+import sys
+import os
+import stat
+import struct
+import asyncio
+import queue
+import socket
+import threading
+
+##--Custom imports
+from checkpass.guess_reader import read_guess_blocks
+from checkpass.guess_reader import DEFAULT_BLOCK_SIZE
+
+
+## The header at the start of every frame
+FRAME_HEADER = struct.Struct('<IIQ')
+
+## Largest payload a frame can have
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+## How the frames from each producer are interleaved
+SERVER_ORDERS = ['round_robin', 'arrival']
+
+## Number of frames that can be buffered for each producer
+DEFAULT_FRAMES_PER_PRODUCER = 4
+
+## Number of frames that can be waiting for the matching loop
+DEFAULT_MAX_QUEUED = 16
+
+
+#########################################################################################
+# Receives guesses from several producers and hands them on as blocks of guesses
+#########################################################################################
+class GuessServer:
+    def __init__(self, socket_path = None, fifos = None, num_producers = None, order = 'round_robin',
+            frames_per_producer = DEFAULT_FRAMES_PER_PRODUCER, max_queued = DEFAULT_MAX_QUEUED):
+
+        ##Unix domain socket to listen on. None if only named pipes are used
+        self.socket_path = socket_path
+
+        ##Named pipes to read from. Each one is its own producer
+        self.fifos = fifos or []
+
+        ##Producers are numbered 0 to num_producers - 1. The named pipes come first
+        if num_producers is None:
+            num_producers = len(self.fifos)
+        self.num_producers = num_producers
+
+        ##How the frames are interleaved
+        self.order = order
+        self.frames_per_producer = frames_per_producer
+
+        ##Blocks ready for the matching loop. None marks the end of the guesses
+        self.blocks_queue = queue.Queue(max_queued)
+
+        ##Set when the matching loop has stopped reading, (eg. max_guesses was reached)
+        self.stopping = threading.Event()
+
+        ##Producer ids that have connected so far
+        self.connected = set()
+
+        ##Number of frames received from each producer
+        self.frames_received = [0] * num_producers
+
+        ##Why the server stopped early. None unless a producer sent something invalid
+        self.error = None
+
+        self.thread = None
+        self.loop = None
+        self.stop_event = None
+
+    ##############################################################
+    # Generator that starts the server and yields blocks of
+    # guesses in the interleave order until every producer has
+    # finished
+    ##############################################################
+    def blocks(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        try:
+            while True:
+                block = self.blocks_queue.get()
+                if block is None:
+                    return
+                yield block
+        finally:
+            self.close()
+
+    ##############################################################
+    # Stops the server
+    ##############################################################
+    def close(self):
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        if self.loop is not None and self.stop_event is not None:
+            ##--The loop is already closed if every producer finished
+            try:
+                self.loop.call_soon_threadsafe(self.stop_event.set)
+            except RuntimeError:
+                pass
+        if self.thread is not None:
+            self.thread.join()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    ##############################################################
+    # Runs the event loop. Runs in the server thread
+    ##############################################################
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as error:
+            print("Error in the guess server: " + str(error), file=sys.stderr)
+            if self.error is None:
+                self.error = str(error)
+        self._put(None)
+
+    ##############################################################
+    # Stops the server because a producer did something that
+    # means the guesses can't all be received. Runs in the
+    # server thread
+    ##############################################################
+    def _fail(self, message):
+        print("Error: " + message, file=sys.stderr)
+        if self.error is None:
+            self.error = message
+        self.stop_event.set()
+
+    ##############################################################
+    # Hands a block to the matching loop, waiting while its queue
+    # is full. Gives up if the matching loop has stopped
+    ##############################################################
+    def _put(self, block):
+        while not self.stopping.is_set():
+            try:
+                self.blocks_queue.put(block, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    ##############################################################
+    # Accepts the producers and interleaves their frames
+    ##############################################################
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        if self.stopping.is_set():
+            return
+
+        ##--Frames waiting for the interleaver, one queue per producer for round robin
+        ##--or one shared queue in arrival order. None marks a finished producer
+        if self.order == 'round_robin':
+            self.frames = [asyncio.Queue(self.frames_per_producer) for producer_id in range(self.num_producers)]
+        else:
+            self.frames = asyncio.Queue(self.frames_per_producer * max(self.num_producers, 1))
+
+        server = None
+        if self.socket_path is not None:
+            ##--Clean up a socket left behind by an earlier session
+            if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                os.unlink(self.socket_path)
+            server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+            print('Listening for guesses on ' + self.socket_path, file=sys.stderr)
+
+        tasks = [asyncio.create_task(self._read_fifo(producer_id, fifo)) for producer_id, fifo in enumerate(self.fifos)]
+        interleave = asyncio.create_task(self._interleave())
+        stop = asyncio.create_task(self.stop_event.wait())
+
+        try:
+            await asyncio.wait([interleave, stop], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks + [interleave, stop]:
+                task.cancel()
+            if server is not None:
+                server.close()
+
+    ##############################################################
+    # Hands the frames on to the matching loop in the interleave
+    # order until every producer has finished
+    ##############################################################
+    async def _interleave(self):
+        if self.order == 'round_robin':
+            active = list(range(self.num_producers))
+            while active:
+                still_active = []
+                for producer_id in active:
+                    payload = await self.frames[producer_id].get()
+                    if payload is None:
+                        continue
+                    still_active.append(producer_id)
+                    if not await asyncio.to_thread(self._put, payload):
+                        return
+                active = still_active
+
+        else:
+            num_finished = 0
+            while num_finished < self.num_producers:
+                payload = await self.frames.get()
+                if payload is None:
+                    num_finished = num_finished + 1
+                    continue
+                if not await asyncio.to_thread(self._put, payload):
+                    return
+
+    ##############################################################
+    # Reads the frames from a producer that connected to the
+    # socket
+    ##############################################################
+    async def _handle_connection(self, reader, writer):
+        producer_id = None
+        try:
+            header = await reader.readexactly(FRAME_HEADER.size)
+            length, producer_id, sequence = FRAME_HEADER.unpack(header)
+            if producer_id < len(self.fifos) or producer_id >= self.num_producers:
+                self._fail("A producer connected with id " + str(producer_id) + ". Socket producer ids are " + str(len(self.fifos)) + " to " + str(self.num_producers - 1))
+                producer_id = None
+                return
+            if producer_id in self.connected:
+                self._fail("Producer " + str(producer_id) + " connected more than once")
+                producer_id = None
+                return
+            self.connected.add(producer_id)
+            await self._read_frames(producer_id, reader, (length, producer_id, sequence))
+
+        ##--Without an id there is no way to tell which producer won't be sending anything
+        except asyncio.IncompleteReadError:
+            self._fail("A producer closed its connection before sending a frame")
+
+        finally:
+            writer.close()
+            if producer_id is not None:
+                await self._finished(producer_id)
+
+    ##############################################################
+    # Reads the frames from a named pipe
+    ##############################################################
+    async def _read_fifo(self, producer_id, fifo):
+        self.connected.add(producer_id)
+        try:
+            file = await self._open_fifo(fifo)
+            reader = asyncio.StreamReader(limit=MAX_FRAME_SIZE)
+            transport, protocol = await self.loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), file)
+            try:
+                await self._read_frames(producer_id, reader)
+            finally:
+                transport.close()
+
+        except IOError as error:
+            print("Error reading from " + fifo + ". Error message: " + str(error), file=sys.stderr)
+
+        finally:
+            await self._finished(producer_id)
+
+    ##############################################################
+    # Opens a named pipe for reading
+    #
+    # Opening a named pipe waits for the producer to open the
+    # other end, so it is done in its own thread. That thread is
+    # left behind if the session stops before the producer shows up
+    ##############################################################
+    def _open_fifo(self, fifo):
+        future = self.loop.create_future()
+
+        def open_fifo():
+            try:
+                result = open(fifo, 'rb', 0)
+            except IOError as error:
+                self.loop.call_soon_threadsafe(_set_future, future, None, error)
+                return
+            self.loop.call_soon_threadsafe(_set_future, future, result, None)
+
+        threading.Thread(target=open_fifo, daemon=True).start()
+        return future
+
+    ##############################################################
+    # Reads frames until the producer closes its end, passing
+    # the payloads on to the interleaver
+    #
+    # first_header is the header of the first frame if it has
+    # already been read
+    ##############################################################
+    async def _read_frames(self, producer_id, reader, first_header = None):
+        header = first_header
+        while True:
+            try:
+                if header is None:
+                    length, frame_id, sequence = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                else:
+                    length, frame_id, sequence = header
+                    header = None
+            except asyncio.IncompleteReadError as error:
+                if error.partial:
+                    self._fail("Producer " + str(producer_id) + " closed in the middle of a frame")
+                return
+
+            if length > MAX_FRAME_SIZE:
+                self._fail("Producer " + str(producer_id) + " sent a frame of " + str(length) + " bytes. The most allowed is " + str(MAX_FRAME_SIZE))
+                return
+            if sequence != self.frames_received[producer_id]:
+                self._fail("Producer " + str(producer_id) + " sent frame " + str(sequence) + " when frame " + str(self.frames_received[producer_id]) + " was expected")
+                return
+
+            try:
+                payload = await reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                self._fail("Producer " + str(producer_id) + " closed in the middle of a frame")
+                return
+            self.frames_received[producer_id] = self.frames_received[producer_id] + 1
+
+            ##--Trim the payload so split(b'\n') returns one item per guess
+            if payload.endswith(b'\n'):
+                payload = payload[:-1]
+            elif not payload:
+                continue
+
+            if self.order == 'round_robin':
+                await self.frames[producer_id].put(payload)
+            else:
+                await self.frames.put(payload)
+
+    ##############################################################
+    # Marks a producer as finished
+    #
+    # Once the server is stopping nothing reads the frames any
+    # more, so waiting for room in a full queue would never end
+    ##############################################################
+    async def _finished(self, producer_id):
+        if self.stop_event.is_set():
+            return
+        print("Producer " + str(producer_id) + " finished after " + str(self.frames_received[producer_id]) + " frames", file=sys.stderr)
+        if self.order == 'round_robin':
+            await self.frames[producer_id].put(None)
+        else:
+            await self.frames.put(None)
+
+
+#########################################################################################
+# Sets the result of a future from another thread, unless it was cancelled
+#########################################################################################
+def _set_future(future, result, error):
+    if future.cancelled():
+        if result is not None:
+            result.close()
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+#########################################################################################
+# Sends guesses to a GuessServer as a producer
+#
+# stream is a binary file of newline separated guesses, (eg. sys.stdin.buffer), and
+# destination is the path of the server's socket or a named pipe. Guesses are sent in
+# frames of about block_size bytes. If there are no guesses a single empty frame is sent
+# so the server still learns the producer id
+# Returns the number of frames sent
+#########################################################################################
+def send_guesses(stream, destination, producer_id = 0, block_size = DEFAULT_BLOCK_SIZE):
+    if stat.S_ISFIFO(os.stat(destination).st_mode):
+        connection = None
+        output = open(destination, 'wb')
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(destination)
+        output = connection.makefile('wb')
+
+    sequence = 0
+    try:
+        for block in read_guess_blocks(stream, block_size or DEFAULT_BLOCK_SIZE):
+            output.write(FRAME_HEADER.pack(len(block) + 1, producer_id, sequence))
+            output.write(block)
+            output.write(b'\n')
+            sequence = sequence + 1
+        if sequence == 0:
+            output.write(FRAME_HEADER.pack(0, producer_id, sequence))
+            sequence = sequence + 1
+    finally:
+        output.close()
+        if connection is not None:
+            connection.close()
+
+    return sequence
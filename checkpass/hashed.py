@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Matches guesses against a list of unsalted password hashes instead of plaintexts
+#
+# The target file has one hex encoded hash per line. Each hash is stored in the
+# TargetStore as its raw digest bytes, so the store works the same as it does with
+# --byte_keys, just with digests as the keys.
+#
+# Guesses are hashed a whole block at a time. For MD5 and SHA1 this is done with map()
+# over the hashlib constructors so the per guess work stays in C. Only guesses whose
+# digest is in the target set are returned to the matching loop, the same way the
+# prefilter works, so the loop itself only sees the hits.
+#
+# hashlib only releases the GIL for inputs of 2KB or more, so hashing passwords across a
+# thread pool doesn't run any faster. Use --workers to spread the hashing across cores.
+#
+# Supported hash types:
+#   md5     MD5 of the guess
+#   sha1    SHA1 of the guess
+#   ntlm    MD4 of the guess encoded as UTF-16LE
+#
+# Guesses are hashed as the raw bytes read from stdin, (minus trailing whitespace). For
+# NTLM they are decoded with the --encoding first.
+#
+# NTLM uses MD4 from hashlib if OpenSSL still provides it. Otherwise it falls back to a
+# pure Python version which is a lot slower
+#########################################################################################
+
+import sys
+import struct
+import hashlib
+from itertools import compress
+from operator import methodcaller
+
+##--Custom imports
+from checkpass.compressed import open_target_file, COMPRESSION_ERRORS
+from checkpass.ret_types import RetType
+
+
+## Hash types that can be used with --hash_type
+HASH_TYPES = ['md5', 'sha1', 'ntlm']
+
+## Size of the digest for each hash type in bytes
+DIGEST_SIZES = {'md5': 16, 'sha1': 20, 'ntlm': 16}
+
+
+#########################################################################################
+# Pure Python MD4 for when OpenSSL doesn't provide it, (RFC 1320)
+#########################################################################################
+def _rotate_left(value, shift):
+    value = value & 0xffffffff
+    return ((value << shift) | (value >> (32 - shift))) & 0xffffffff
+
+
+def _md4(data):
+    length = len(data)
+    data = data + b'\x80' + bytes((55 - length) % 64) + struct.pack('<Q', length * 8)
+
+    a, b, c, d = 0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476
+    for offset in range(0, len(data), 64):
+        x = struct.unpack('<16I', data[offset:offset + 64])
+        saved = (a, b, c, d)
+
+        for i in range(0, 16, 4):
+            a = _rotate_left(a + ((b & c) | (~b & d)) + x[i], 3)
+            d = _rotate_left(d + ((a & b) | (~a & c)) + x[i + 1], 7)
+            c = _rotate_left(c + ((d & a) | (~d & b)) + x[i + 2], 11)
+            b = _rotate_left(b + ((c & d) | (~c & a)) + x[i + 3], 19)
+
+        for i in range(4):
+            a = _rotate_left(a + ((b & c) | (b & d) | (c & d)) + x[i] + 0x5a827999, 3)
+            d = _rotate_left(d + ((a & b) | (a & c) | (b & c)) + x[i + 4] + 0x5a827999, 5)
+            c = _rotate_left(c + ((d & a) | (d & b) | (a & b)) + x[i + 8] + 0x5a827999, 9)
+            b = _rotate_left(b + ((c & d) | (c & a) | (d & a)) + x[i + 12] + 0x5a827999, 13)
+
+        for i in (0, 2, 1, 3):
+            a = _rotate_left(a + (b ^ c ^ d) + x[i] + 0x6ed9eba1, 3)
+            d = _rotate_left(d + (a ^ b ^ c) + x[i + 8] + 0x6ed9eba1, 9)
+            c = _rotate_left(c + (d ^ a ^ b) + x[i + 4] + 0x6ed9eba1, 11)
+            b = _rotate_left(b + (c ^ d ^ a) + x[i + 12] + 0x6ed9eba1, 15)
+
+        a = (a + saved[0]) & 0xffffffff
+        b = (b + saved[1]) & 0xffffffff
+        c = (c + saved[2]) & 0xffffffff
+        d = (d + saved[3]) & 0xffffffff
+
+    return struct.pack('<4I', a, b, c, d)
+
+
+#########################################################################################
+# Returns a function that returns the MD4 digest of some bytes
+#########################################################################################
+def _get_md4():
+    try:
+        hashlib.new('md4', b'')
+        return lambda data: hashlib.new('md4', data).digest()
+    except ValueError:
+        return _md4
+
+
+#########################################################################################
+# Hashes guesses and finds the ones that are in the target set
+#########################################################################################
+class GuessHasher:
+    def __init__(self, hash_type, passwords, encoding = 'utf-8'):
+
+        ##The type of hash the targets are
+        self.hash_type = hash_type
+
+        ##Used to check if a digest is a target
+        self.index = passwords.index
+
+        ##Encoding to decode guesses with before hashing them, (only used for NTLM)
+        self.encoding = encoding
+
+        if hash_type == 'ntlm':
+            self.md4 = _get_md4()
+        else:
+            self.constructor = getattr(hashlib, hash_type)
+
+    ##############################################################
+    # Returns the digests of a list of guesses as an iterator
+    #
+    # Guesses that can't be hashed, (NTLM guesses that can't be
+    # decoded), give None
+    ##############################################################
+    def digests(self, guesses):
+        if self.hash_type != 'ntlm':
+            return map(methodcaller('digest'), map(self.constructor, guesses))
+        return map(self._ntlm_digest, guesses)
+
+    def _ntlm_digest(self, guess):
+        try:
+            return self.md4(guess.decode(self.encoding).encode('utf-16-le'))
+        except UnicodeError:
+            return None
+
+    ##############################################################
+    # Returns the digest of a single guess
+    ##############################################################
+    def digest(self, guess):
+        return next(self.digests([guess]))
+
+    ##############################################################
+    # Wraps lookup, (TargetStore.index.get), so it can be called
+    # with a plaintext guess
+    ##############################################################
+    def lookup_function(self, lookup):
+        digest = self.digest
+        return lambda guess: lookup(digest(guess))
+
+    ##############################################################
+    # Returns (guess_num, guess) for each guess in the block
+    # whose hash is in the target set. Guesses are stripped of
+    # trailing whitespace
+    #
+    # Takes the same arguments as Prefilter.candidate_guesses.
+    # Guesses are always left as bytes
+    ##############################################################
+    def candidate_guesses(self, block, base_count, max_count = None):
+        guesses = block.split(b'\n')
+        if max_count is not None and len(guesses) > max_count:
+            guesses = guesses[:max_count]
+        return self.candidate_hits(guesses, base_count)
+
+    ##############################################################
+    # The same as candidate_guesses but takes a list of guesses
+    ##############################################################
+    def candidate_hits(self, guesses, base_count):
+        guesses = list(map(bytes.rstrip, guesses))
+        hits = map(self.index.__contains__, self.digests(guesses))
+        return list(compress(enumerate(guesses, base_count + 1), hits))
+
+
+#########################################################################################
+# Reads in a list of hashes as the target set
+#
+# Each line is a hex encoded hash. Lines that aren't a hash of the right type are skipped
+# and counted
+#########################################################################################
+def read_hash_targets(training_file, cs, hash_type):
+    digest_size = DIGEST_SIZES[hash_type]
+    cs.byte_keys = True
+
+    num_invalid = 0
+    try:
+        with open_target_file(training_file) as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    digest = bytes.fromhex(line.decode('ascii'))
+                except (ValueError, UnicodeDecodeError):
+                    digest = None
+                if digest is None or len(digest) != digest_size:
+                    num_invalid = num_invalid + 1
+                    continue
+
+                cs.num_passwords = cs.num_passwords + 1
+                cs.passwords.add(digest)
+
+    except COMPRESSION_ERRORS as error:
+        print (error, file=sys.stderr)
+        print ("Error opening file " + training_file, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if num_invalid != 0:
+        print("WARNING: Number of lines skipped that were not " + hash_type + " hashes: " + str(num_invalid), file=sys.stderr)
+
+    return RetType.STATUS_OK
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Splits one guess stream across several machines and merges the results back together
+#
+# Each node checks its own slice of the guess stream, (with --start_count set to where
+# the slice starts and --max_guesses to where it ends), and saves a hit log with
+# --hit_log. The hit log records the slot of every target password the node cracked and
+# the guess number within the slice it was first cracked at.
+#
+# Simply adding the curves from each node together would count a password cracked in
+# more than one slice more than once. The merge command instead loads the target set,
+# takes the earliest guess number for every password across all the slices and replays
+# the cracks in order. The results, cracked and uncracked files come out the same as if
+# all the guesses had been checked in one session.
+#
+# File layout, (all integers are little endian):
+#   8 bytes     Magic value, HIT_LOG_MAGIC
+#   4 bytes     Length of the JSON header
+#   N bytes     JSON header. Contains where the slice starts, how many guesses were
+#               checked, the CHECKPASSDEBUG strings seen, and enough about the target set
+#               to make sure the merge loads the same one
+#   slots           uint32[num_hits]    Slot of each password cracked in this slice
+#   guess_cracked   int64[num_hits]     Guess number within the slice it was cracked at
+#   guesses         bytes               Only for hashed targets. The guesses that cracked
+#                                       each hash, separated by newlines
+#
+# Slots are assigned in the order the target set is read, so the nodes and the merge all
+# need to load the same target files in the same order
+#########################################################################################
+
+import sys
+import json
+import struct
+import heapq
+from array import array
+
+##--Custom imports
+from checkpass.ret_types import RetType
+
+
+## Identifies a hit log file
+HIT_LOG_MAGIC = b'CPHITLG1'
+
+## Version of the hit log file layout
+HIT_LOG_VERSION = 1
+
+
+#########################################################################################
+# Wraps a SessionOutput or MultiSetOutput to record what the hit log needs while the
+# session runs
+#
+# The cracked passwords themselves are taken from the TargetStore at the end. Only the
+# CHECKPASSDEBUG strings, and for hashed targets the guesses that cracked them, aren't
+# saved anywhere else
+#########################################################################################
+class HitLogRecorder:
+    def __init__(self, report, encoding = 'utf-8', save_guesses = False):
+
+        ##The output being wrapped
+        self.report = report
+
+        ##Used to turn debug strings into text for the JSON header
+        self.encoding = encoding
+
+        ##(guess_num, guess) for each CHECKPASSDEBUG string
+        self.debug_lines = []
+
+        ##The guess that cracked each slot. Only kept if save_guesses is True
+        self.guesses = {} if save_guesses else None
+
+    def start(self, num_guesses, num_cracked):
+        self.report.start(num_guesses, num_cracked)
+
+    def cracked(self, guess_num, num_cracked, guess, count, slot = None):
+        if self.guesses is not None:
+            self.guesses[slot] = guess
+        self.report.cracked(guess_num, num_cracked, guess, count, slot)
+
+    def progress(self, num_guesses, num_cracked):
+        self.report.progress(num_guesses, num_cracked)
+
+    def debug(self, guess_num, num_cracked, guess):
+        text = guess
+        if isinstance(text, bytes):
+            text = text.decode(self.encoding, errors='surrogateescape')
+        self.debug_lines.append((guess_num, text))
+        self.report.debug(guess_num, num_cracked, guess)
+
+    def finish(self, num_guesses, num_cracked):
+        self.report.finish(num_guesses, num_cracked)
+
+
+#########################################################################################
+# Writes the hit log for a finished session
+#
+# start_count is the guess number the slice started at. recorder is the HitLogRecorder
+# the session's output was wrapped in. targets are the target files, saved so the merge
+# can load them by default
+#########################################################################################
+def write_hit_log(filename, cs, start_count, recorder, targets = None):
+    passwords = cs.passwords
+    slots = array('I', [slot for slot in range(len(passwords)) if passwords.cracked[slot]])
+    guess_cracked = array('q', [passwords.guess_cracked[slot] - start_count for slot in slots])
+
+    guesses = b''
+    if recorder.guesses is not None:
+        guesses = b'\n'.join(recorder.guesses[slot] for slot in slots)
+
+    header = {
+        'version': HIT_LOG_VERSION,
+        'start_count': start_count,
+        'num_guesses': cs.num_guesses - start_count,
+        'num_cracked': cs.num_cracked,
+        'num_unique': len(passwords),
+        'num_passwords': cs.num_passwords,
+        'byte_keys': cs.byte_keys,
+        'hash_type': cs.hash_type,
+        'encoding': recorder.encoding,
+        'targets': targets or [],
+        'sets': [target_set.name for target_set in passwords.sets],
+        'num_hits': len(slots),
+        'guesses_size': len(guesses),
+        'debug': [[guess_num - start_count, text] for guess_num, text in recorder.debug_lines],
+    }
+
+    if sys.byteorder != 'little':
+        slots.byteswap()
+        guess_cracked.byteswap()
+
+    encoded_header = json.dumps(header).encode('utf-8')
+    try:
+        with open(filename, 'wb') as file:
+            file.write(HIT_LOG_MAGIC)
+            file.write(struct.pack('<I', len(encoded_header)))
+            file.write(encoded_header)
+            file.write(slots.tobytes())
+            file.write(guess_cracked.tobytes())
+            file.write(guesses)
+
+    except IOError as error:
+        print (error, file=sys.stderr)
+        print ("Error writing hit log " + filename, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Reads in a hit log
+#
+# The header, slots, guess numbers and guesses are saved in hit_log as 'header', 'slots',
+# 'guess_cracked' and 'guesses', (None unless the targets were hashed)
+#########################################################################################
+def load_hit_log(filename, hit_log):
+    try:
+        with open(filename, 'rb') as file:
+            if file.read(len(HIT_LOG_MAGIC)) != HIT_LOG_MAGIC:
+                print("Error: " + filename + " is not a hit log", file=sys.stderr)
+                return RetType.BAD_INPUT
+            header_len = struct.unpack('<I', file.read(4))[0]
+            header = json.loads(file.read(header_len).decode('utf-8'))
+            if header['version'] != HIT_LOG_VERSION:
+                print("Error: Unsupported hit log version " + str(header['version']), file=sys.stderr)
+                return RetType.BAD_INPUT
+
+            num_hits = header['num_hits']
+            slots = array('I')
+            slots.frombytes(file.read(4 * num_hits))
+            guess_cracked = array('q')
+            guess_cracked.frombytes(file.read(8 * num_hits))
+            guesses = file.read(header['guesses_size'])
+
+    except (IOError, ValueError, KeyError, struct.error) as error:
+        print (error, file=sys.stderr)
+        print ("Error reading hit log " + filename, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if len(slots) != num_hits or len(guess_cracked) != num_hits or len(guesses) != header['guesses_size']:
+        print("Error: Hit log " + filename + " is truncated", file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    if sys.byteorder != 'little':
+        slots.byteswap()
+        guess_cracked.byteswap()
+
+    hit_log['header'] = header
+    hit_log['slots'] = slots
+    hit_log['guess_cracked'] = guess_cracked
+    hit_log['guesses'] = guesses.split(b'\n') if header['hash_type'] is not None and num_hits else None
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Checks the hit logs cover the guess stream and were made against the target set that
+# is loaded in cs
+#
+# The logs are sorted by where their slice starts
+#########################################################################################
+def check_hit_logs(cs, hit_logs):
+    hit_logs.sort(key = lambda hit_log: hit_log['header']['start_count'])
+
+    for hit_log in hit_logs:
+        header = hit_log['header']
+        if (header['num_unique'] != len(cs.passwords) or header['num_passwords'] != cs.num_passwords or
+                header['byte_keys'] != cs.byte_keys or header['hash_type'] != cs.hash_type or
+                header['sets'] != [target_set.name for target_set in cs.passwords.sets]):
+            print("Error: The target passwords don't match the ones the hit logs were made with", file=sys.stderr)
+            return RetType.BAD_INPUT
+        if len(hit_log['slots']) and max(hit_log['slots']) >= len(cs.passwords):
+            print("Error: The hit log has a slot past the end of the target set", file=sys.stderr)
+            return RetType.BAD_INPUT
+
+    ##--Slices that overlap or leave gaps won't give the same results as a single session.
+    ##--A slice that cracked everything stops early, so anything after it doesn't matter
+    for prev_log, next_log in zip(hit_logs, hit_logs[1:]):
+        prev_header = prev_log['header']
+        prev_end = prev_header['start_count'] + prev_header['num_guesses']
+        if prev_header['num_cracked'] >= prev_header['num_passwords']:
+            continue
+        if next_log['header']['start_count'] > prev_end:
+            print("WARNING: Guesses " + str(prev_end + 1) + " to " + str(next_log['header']['start_count']) + " are not in any hit log", file=sys.stderr)
+        elif next_log['header']['start_count'] < prev_end:
+            print("WARNING: The slices starting at guess " + str(prev_header['start_count']) + " and " + str(next_log['header']['start_count']) + " overlap", file=sys.stderr)
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Combines the hit logs into the cracked status of cs and replays the cracks to report
+#
+# Each password gets the earliest global guess number it was cracked at in any slice.
+# The hit logs must be checked with check_hit_logs() first
+#########################################################################################
+def merge_hit_logs(cs, hit_logs, report):
+    passwords = cs.passwords
+    cracked = passwords.cracked
+    guess_cracked = passwords.guess_cracked
+    counts = passwords.counts
+
+    ##--The guess that cracked each slot. For plaintext targets it is the password
+    hashed_guesses = {}
+
+    for hit_log in hit_logs:
+        start_count = hit_log['header']['start_count']
+        guesses = hit_log['guesses']
+        for num, (slot, guess_num) in enumerate(zip(hit_log['slots'], hit_log['guess_cracked'])):
+            guess_num = guess_num + start_count
+            if cracked[slot] and guess_cracked[slot] <= guess_num:
+                continue
+            cracked[slot] = 1
+            guess_cracked[slot] = guess_num
+            if guesses is not None:
+                hashed_guesses[slot] = guesses[num]
+
+    ##--The debug strings are merged in after any crack on the same guess, the same as
+    ##--they are printed when checking the guesses
+    debug_events = []
+    for hit_log in hit_logs:
+        start_count = hit_log['header']['start_count']
+        for guess_num, text in hit_log['header']['debug']:
+            guess = text.encode(cs.encoding, errors='surrogateescape') if cs.byte_keys else text
+            debug_events.append((guess_num + start_count, 1, guess))
+    debug_events.sort(key = lambda event: event[0])
+
+    slot_passwords = list(passwords)
+    crack_events = sorted((guess_cracked[slot], 0, slot) for slot in range(len(passwords)) if cracked[slot])
+
+    ##--The session starts where the first slice does and ends after the last one
+    first_header = hit_logs[0]['header']
+    cs.num_guesses = max(hit_log['header']['start_count'] + hit_log['header']['num_guesses'] for hit_log in hit_logs)
+    cs.num_cracked = 0
+    report.start(first_header['start_count'], 0)
+
+    for guess_num, is_debug, value in heapq.merge(crack_events, debug_events, key = lambda event: event[:2]):
+        if is_debug:
+            report.debug(guess_num, cs.num_cracked, value)
+            continue
+
+        slot = value
+        guess = hashed_guesses.get(slot, slot_passwords[slot])
+        cs.num_cracked = cs.num_cracked + counts[slot]
+        report.cracked(guess_num, cs.num_cracked, guess, counts[slot], slot)
+
+        #If all passwords have been cracked, the rest of the guesses don't count
+        if cs.num_cracked >= cs.num_passwords:
+            cs.num_guesses = guess_num
+            break
+
+    ##--Passwords cracked after the session would have stopped don't count
+    for slot in range(len(passwords)):
+        if cracked[slot] and guess_cracked[slot] > cs.num_guesses:
+            cracked[slot] = 0
+            guess_cracked[slot] = -1
+
+    report.progress(cs.num_guesses, cs.num_cracked)
+    report.finish(cs.num_guesses, cs.num_cracked)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Counts guesses that come close to a target password without matching it exactly
+#
+# To see how close a generator gets, every guess could be expanded into its case toggled
+# and leet substituted variants, but that makes the guess stream 10-100 times longer.
+#
+# Instead the target passwords are grouped by a normalized form, (eg. "P@ssw0rd1" and
+# "password" both normalize to "password"), and every guess is normalized the same way
+# and looked up in that second index. A target is a near miss once any guess normalizes
+# to the same form. That only costs normalizing the guess and one more dict lookup.
+#
+# The normalizations that can be used, (applied in this order):
+#   digits  - Trailing digits are removed
+#   lower   - Letters are lowercased
+#   leet    - Common leet substitutions are replaced with the letter they stand for.
+#             1, !, | and l are all treated as i since 1 can stand for either
+#
+# Passwords that normalize to an empty string, (eg. all digits with the digits
+# normalization), are left out since every guess of only digits would match them.
+#
+# An exact crack always normalizes to the same form as the target too, so the near miss
+# curve includes every exact crack as well as the near misses
+#########################################################################################
+
+import sys
+from array import array
+
+##--Custom imports
+from checkpass.ret_types import RetType
+
+
+## The normalizations that can be applied
+NEAR_MISS_TYPES = ['digits', 'lower', 'leet']
+
+## Default normalizations
+DEFAULT_NEAR_MISS = ['digits', 'lower', 'leet']
+
+## What each leet character is replaced with
+LEET_SUBSTITUTIONS = {
+    '4': 'a', '@': 'a',
+    '8': 'b',
+    '3': 'e',
+    '6': 'g', '9': 'g',
+    '1': 'i', '!': 'i', '|': 'i', 'l': 'i',
+    '0': 'o',
+    '5': 's', '$': 's',
+    '7': 't', '+': 't',
+    '2': 'z',
+}
+
+
+#########################################################################################
+# Returns a function that normalizes a password, (str or bytes if byte_keys is True)
+#########################################################################################
+def make_normalizer(normalizations, byte_keys = False):
+    strip_digits = 'digits' in normalizations
+    lower = 'lower' in normalizations
+    leet = 'leet' in normalizations
+
+    if byte_keys:
+        digits = b'0123456789'
+        leet_table = bytes.maketrans(''.join(LEET_SUBSTITUTIONS).encode('ascii'), ''.join(LEET_SUBSTITUTIONS.values()).encode('ascii'))
+        to_lower = bytes.lower
+    else:
+        digits = '0123456789'
+        leet_table = str.maketrans(LEET_SUBSTITUTIONS)
+        to_lower = str.lower
+
+    def normalize(password):
+        if strip_digits:
+            password = password.rstrip(digits)
+        if lower:
+            password = to_lower(password)
+        if leet:
+            password = password.translate(leet_table)
+        return password
+
+    return normalize
+
+
+#########################################################################################
+# The target passwords grouped by their normalized form
+#########################################################################################
+class NearMissIndex:
+    def __init__(self, passwords, normalizations = DEFAULT_NEAR_MISS, byte_keys = False):
+
+        ##Normalizes a password or guess
+        self.normalize = make_normalizer(normalizations, byte_keys)
+
+        ##Maps each normalized form to its group
+        self.index = dict()
+
+        ##Total count of the passwords in each group
+        self.counts = array('I')
+
+        ##Non-zero once a guess has normalized to the group's form
+        self.cracked = bytearray()
+
+        ##Total of the counts of the groups that have been cracked
+        self.num_cracked = 0
+
+        normalize = self.normalize
+        index = self.index
+        counts = self.counts
+        for password, count in zip(passwords, passwords.counts):
+            form = normalize(password)
+            if not form:
+                continue
+            group = index.get(form)
+            if group is None:
+                index[form] = len(counts)
+                counts.append(count)
+            else:
+                counts[group] = counts[group] + count
+        self.cracked = bytearray(len(counts))
+
+    def __len__(self):
+        return len(self.counts)
+
+
+#########################################################################################
+# Parses a comma separated list of normalizations
+#
+# The list is saved to normalizations
+#########################################################################################
+def parse_near_miss_types(value, normalizations):
+    for name in value.split(','):
+        name = name.strip().lower()
+        if name not in NEAR_MISS_TYPES:
+            print("Error: Unknown near miss normalization " + name + ". Choices are " + ', '.join(NEAR_MISS_TYPES), file=sys.stderr)
+            return RetType.COMMAND_LINE_ERROR
+        if name not in normalizations:
+            normalizations.append(name)
+    return RetType.STATUS_OK
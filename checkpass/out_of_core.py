@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Out of core mode for target sets that are too large to fit in memory
+#
+# Rather than loading the target set into a dict and looking up every guess in it, both
+# the target set and the guesses are sorted on disk and then joined:
+#   1. The target passwords are counted and written out as sorted runs of
+#      (password, count), which are merged into one sorted list of unique passwords
+#   2. The guesses are read from stdin and written out as sorted runs of
+#      (guess, guess number), keeping only the first time each guess was made
+#   3. The two sorted lists are merged. Every password that matches a guess was cracked
+#      by the first time that guess was made. Passwords that don't match are written
+#      straight to the uncracked file
+#   4. The cracks are sorted by guess number and replayed through a SessionOutput, so
+#      the cracking curve and cracked file are the same as when running normally
+#
+# Each sort only keeps memory_limit bytes of entries in memory before spilling a run to
+# disk. The only things that grow with the size of the input are the files on disk.
+#
+# Guesses and passwords are compared as raw bytes, the same as with --byte_keys. The
+# uncracked file is written in sorted order rather than the order of the target file
+#########################################################################################
+
+import sys
+import os
+import struct
+import heapq
+import shutil
+import tempfile
+import codecs
+from collections import Counter
+
+##--Custom imports
+from checkpass.file_io import is_ascii_compatible
+from checkpass.file_io import _count_data
+from checkpass.compressed import open_target_file, COMPRESSION_ERRORS
+from checkpass.guess_reader import read_guess_blocks
+from checkpass.guess_reader import DEFAULT_BLOCK_SIZE
+from checkpass.session_output import SessionOutput
+from checkpass.ret_types import RetType
+
+
+## Default memory limit for each sort in megabytes
+DEFAULT_OUT_OF_CORE_MEMORY = 1024
+
+## Rough number of bytes used by each entry in a dict, not including the key itself
+DICT_ENTRY_OVERHEAD = 100
+
+## Most run files that are merged at once. More than this are merged in several passes
+MAX_MERGE_RUNS = 64
+
+## Number of bytes of the target file to read at a time
+TARGET_CHUNK_SIZE = 16 * 1024 * 1024
+
+## Each record in a run file is the length of the key, a value and then the key
+_RECORD_HEADER = struct.Struct('<IQ')
+
+## Size of the buffer used for reading and writing run files
+_RUN_BUFFER_SIZE = 1024 * 1024
+
+## The guess number at the start of the key of each crack
+_GUESS_NUM = struct.Struct('>Q')
+
+## Number of cracks to collect before adding them to the sorter
+_JOIN_BATCH_SIZE = 100000
+
+
+#########################################################################################
+# Writes a run file of (key, value) records
+#########################################################################################
+def _write_run(filename, items):
+    pack = _RECORD_HEADER.pack
+    with open(filename, 'wb', buffering=_RUN_BUFFER_SIZE) as file:
+        write = file.write
+        for key, value in items:
+            write(pack(len(key), value))
+            write(key)
+
+
+#########################################################################################
+# Generator that reads back the (key, value) records from a run file
+#########################################################################################
+def _read_run(filename):
+    unpack = _RECORD_HEADER.unpack
+    size = _RECORD_HEADER.size
+    with open(filename, 'rb', buffering=_RUN_BUFFER_SIZE) as file:
+        read = file.read
+        while True:
+            header = read(size)
+            if len(header) < size:
+                return
+            length, value = unpack(header)
+            yield read(length), value
+
+
+#########################################################################################
+# Sorts (key, value) pairs that might not fit in memory
+#
+# Entries are kept in a dict until they use more than memory_limit bytes, then written
+# out to a sorted run file. Entries with the same key are combined, either by adding the
+# values, ('sum'), or keeping the first value, ('first')
+#########################################################################################
+class ExternalSorter:
+    def __init__(self, directory, memory_limit, combine = 'first'):
+
+        ##Where the run files are written
+        self.directory = directory
+
+        ##Number of bytes to use before spilling to disk
+        self.memory_limit = memory_limit
+
+        ##How to combine entries with the same key
+        self.combine = combine
+
+        ##Entries that haven't been spilled yet, and about how much memory they use
+        self.items = Counter() if combine == 'sum' else dict()
+        self.memory = 0
+
+        ##Run files that have been written so far
+        self.runs = []
+
+    ##############################################################
+    # Adds a dict of key: value
+    ##############################################################
+    def add_items(self, new_items):
+        items = self.items
+        if self.combine == 'sum':
+            size = len(items)
+            items.update(new_items)
+            new_keys = len(items) - size
+            ##--The exact size of the new keys isn't known, so go by the average
+            self.memory = self.memory + new_keys * DICT_ENTRY_OVERHEAD + sum(map(len, new_items)) * new_keys // max(len(new_items), 1)
+        else:
+            new_keys = new_items.keys() - items.keys()
+            items.update(zip(new_keys, map(new_items.__getitem__, new_keys)))
+            self.memory = self.memory + len(new_keys) * DICT_ENTRY_OVERHEAD + sum(map(len, new_keys))
+
+        if self.memory >= self.memory_limit:
+            self._spill()
+
+    ##############################################################
+    # Writes the entries in memory out to a sorted run file
+    ##############################################################
+    def _spill(self):
+        if not self.items:
+            return
+        filename = os.path.join(self.directory, 'run_' + str(id(self)) + '_' + str(len(self.runs)))
+        _write_run(filename, sorted(self.items.items()))
+        self.runs.append(filename)
+        self.items = Counter() if self.combine == 'sum' else dict()
+        self.memory = 0
+
+    ##############################################################
+    # Generator that returns all the entries sorted by key, with
+    # entries with the same key combined
+    ##############################################################
+    def sorted_items(self):
+        if not self.runs:
+            yield from sorted(self.items.items())
+            return
+
+        self._spill()
+
+        ##--Merge the runs down until there are few enough to merge at once
+        while len(self.runs) > MAX_MERGE_RUNS:
+            filename = os.path.join(self.directory, 'run_' + str(id(self)) + '_merged_' + str(len(self.runs)))
+            _write_run(filename, self._merge(self.runs[:MAX_MERGE_RUNS]))
+            self.runs = self.runs[MAX_MERGE_RUNS:] + [filename]
+
+        yield from self._merge(self.runs)
+        self.runs = []
+
+    ##############################################################
+    # Merges run files together, combining entries with the same
+    # key, and deletes them once they have been read
+    ##############################################################
+    def _merge(self, runs):
+        prev_key = None
+        prev_value = None
+        for key, value in heapq.merge(*[_read_run(run) for run in runs]):
+            if key == prev_key:
+                if self.combine == 'sum':
+                    prev_value = prev_value + value
+                continue
+            if prev_key is not None:
+                yield prev_key, prev_value
+            prev_key = key
+            prev_value = value
+
+        if prev_key is not None:
+            yield prev_key, prev_value
+
+        for run in runs:
+            os.remove(run)
+
+
+#########################################################################################
+# Checks the guesses on stdin against a target set that doesn't fit in memory
+#
+# output_file and cracked_file are open files to write the cracking curve and cracked
+# passwords to, (cracked_file can be None). uncracked_file is a filename, or None
+# Returns a RetType
+#########################################################################################
+def run_out_of_core(training_file, output_file, cracked_file = None, uncracked_file = None, file_encoding = 'utf-8',
+        memory_limit = DEFAULT_OUT_OF_CORE_MEMORY, temp_dir = None, start_count = 0, start_cracked = 0, max_guesses = None,
+        block_size = DEFAULT_BLOCK_SIZE, curve = 'percent', curve_step = None):
+
+    ##--Lines are split without decoding them, so the byte order mark is removed separately
+    skip_bom = codecs.lookup(file_encoding).name == 'utf-8-sig'
+    if skip_bom:
+        file_encoding = 'utf-8'
+
+    if not is_ascii_compatible(file_encoding):
+        print("Error: Out of core mode is not supported for the file encoding " + str(file_encoding), file=sys.stderr)
+        return RetType.ENCODING_ERROR
+
+    memory_limit = memory_limit * 1024 * 1024
+    try:
+        directory = tempfile.mkdtemp(prefix='checkpass_sort_', dir=temp_dir)
+    except IOError as error:
+        print("Error creating the sort directory. Error message: " + str(error), file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    try:
+        ret_value, targets, num_passwords = _sort_targets(training_file, directory, memory_limit, file_encoding, skip_bom)
+        if ret_value != RetType.STATUS_OK:
+            return ret_value
+
+        print('Sorting the guesses', file=sys.stderr)
+        if max_guesses != None:
+            max_guesses = max_guesses - start_count
+        guesses, debug_events, num_guesses = _sort_guesses(directory, memory_limit, max_guesses, block_size)
+
+        print('Matching the guesses against the target set', file=sys.stderr)
+        ret_value, cracks = _join(targets, guesses, directory, memory_limit, uncracked_file)
+        if ret_value != RetType.STATUS_OK:
+            return ret_value
+
+        ##--Replay the cracks in the order they were made
+        num_passwords = num_passwords + start_cracked
+        num_cracked = start_cracked
+        report = SessionOutput(output_file, cracked_file, num_passwords, encoding = file_encoding, byte_keys = True,
+            curve = curve, curve_step = curve_step)
+        report.start(start_count, num_cracked)
+
+        crack_events = ((_GUESS_NUM.unpack_from(key)[0], 0, key[_GUESS_NUM.size:], count) for key, count in cracks.sorted_items())
+        for guess_num, is_debug, guess, count in heapq.merge(crack_events, debug_events):
+            guess_num = guess_num + start_count
+            if is_debug:
+                report.debug(guess_num, num_cracked, guess)
+                continue
+
+            num_cracked = num_cracked + count
+            report.cracked(guess_num, num_cracked, guess, count)
+
+            #If all passwords have been cracked, the rest of the guesses don't count
+            if num_cracked >= num_passwords:
+                num_guesses = guess_num - start_count
+                break
+
+        report.progress(start_count + num_guesses, num_cracked)
+        report.finish(start_count + num_guesses, num_cracked)
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Counts the passwords in the target file into an ExternalSorter
+#
+# If skip_bom is True a UTF-8 byte order mark is removed from the start of the file
+#
+# Returns a RetType, the sorter and the total number of passwords
+#########################################################################################
+def _sort_targets(training_file, directory, memory_limit, file_encoding, skip_bom):
+    print('Sorting the target file ' + training_file, file=sys.stderr)
+    targets = ExternalSorter(directory, memory_limit, combine = 'sum')
+    num_passwords = 0
+    num_encoding_errors = 0
+
+    try:
+        with open_target_file(training_file) as file:
+            while True:
+                ##--Read whole lines so a password isn't split between chunks
+                data = file.read(TARGET_CHUNK_SIZE)
+                if not data:
+                    break
+                data = data + file.readline()
+                if skip_bom:
+                    if data.startswith(codecs.BOM_UTF8):
+                        data = data[len(codecs.BOM_UTF8):]
+                    skip_bom = False
+
+                counts, chunk_passwords, chunk_errors = _count_data((data, file_encoding, True))
+                targets.add_items(counts)
+                num_passwords = num_passwords + chunk_passwords
+                num_encoding_errors = num_encoding_errors + chunk_errors
+
+    except COMPRESSION_ERRORS as error:
+        print (error, file=sys.stderr)
+        print ("Error opening file " + training_file, file=sys.stderr)
+        return RetType.FILE_IO_ERROR, None, 0
+
+    if num_encoding_errors != 0:
+        print("WARNING: Number of passwords skipped due to encoding errors: " + str(num_encoding_errors), file=sys.stderr)
+    print('Passwords to crack = ' + str(num_passwords), file=sys.stderr)
+
+    return RetType.STATUS_OK, targets, num_passwords
+
+
+#########################################################################################
+# Reads the guesses from stdin into an ExternalSorter, keeping the first guess number
+# each one was made at
+#
+# CHECKPASSDEBUG strings are kept in a list in guess order as (guess_num, 1, guess, 0) so
+# they can be merged with the cracks
+# Returns the sorter, the debug strings and the number of guesses read
+#########################################################################################
+def _sort_guesses(directory, memory_limit, max_guesses, block_size):
+    guesses = ExternalSorter(directory, memory_limit, combine = 'first')
+    debug_events = []
+    num_guesses = 0
+
+    for block in read_guess_blocks(sys.stdin.buffer, block_size):
+        block_guesses = block.split(b'\n')
+
+        ##--Only keep the guesses up to the maximum number allowed
+        done = False
+        if max_guesses != None and num_guesses + len(block_guesses) >= max_guesses:
+            block_guesses = block_guesses[:max(max_guesses - num_guesses, 0)]
+            done = True
+
+        block_guesses = list(map(bytes.rstrip, block_guesses))
+        if b"CHECKPASSDEBUG" in block:
+            for guess_num, guess in enumerate(block_guesses, num_guesses + 1):
+                if guess.startswith(b"CHECKPASSDEBUG"):
+                    debug_events.append((guess_num, 1, guess, 0))
+
+        ##--Built from the end of the block so the first time a guess was made is kept
+        end = num_guesses + len(block_guesses)
+        guesses.add_items(dict(zip(reversed(block_guesses), range(end, num_guesses, -1))))
+        num_guesses = end
+
+        if done:
+            break
+
+    return guesses, debug_events, num_guesses
+
+
+#########################################################################################
+# Merges the sorted targets and guesses together
+#
+# Passwords that weren't guessed are written to uncracked_file. Returns a RetType and an
+# ExternalSorter of the cracks. The key of each crack is the guess number, (big endian so
+# they sort in order), followed by the password, and the value is the password's count
+#########################################################################################
+def _join(targets, guesses, directory, memory_limit, uncracked_file):
+    cracks = ExternalSorter(directory, memory_limit, combine = 'first')
+    pending = {}
+    pack = _GUESS_NUM.pack
+
+    try:
+        uncracked = open(uncracked_file, 'wb', buffering=_RUN_BUFFER_SIZE) if uncracked_file is not None else None
+    except IOError as error:
+        print("Error opening the uncracked file. Error message: " + str(error), file=sys.stderr)
+        return RetType.FILE_IO_ERROR, None
+
+    try:
+        guess_items = guesses.sorted_items()
+        guess, guess_num = next(guess_items, (None, None))
+        for password, count in targets.sorted_items():
+            while guess is not None and guess < password:
+                guess, guess_num = next(guess_items, (None, None))
+
+            if guess == password:
+                pending[pack(guess_num) + password] = count
+                if len(pending) >= _JOIN_BATCH_SIZE:
+                    cracks.add_items(pending)
+                    pending = {}
+            elif uncracked is not None:
+                uncracked.write((password + b'\n') * count)
+
+    finally:
+        if uncracked is not None:
+            uncracked.close()
+
+    cracks.add_items(pending)
+    return RetType.STATUS_OK, cracks
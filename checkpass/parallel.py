@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Matches guesses against the target set using multiple processes
+#
+# A single process can only check so many guesses a second, which isn't enough to keep up
+# with a multi-GPU guess generator. In this mode the main process reads blocks of guesses
+# from stdin and hands each block, along with the guess number it starts at, to a pool of
+# worker processes. Each worker looks up every guess in its block and sends back the hits.
+#
+# The main process then applies the hits block by block, in the order the blocks were
+# read. Since the cracked status is only updated there, the cracking curve, the order of
+# the cracked file and the --max_guesses cutoff are exactly the same as when running in
+# a single process.
+#
+# Splitting by block rather than sending each guess to the worker that owns its slice of
+# the target set means the main process never has to look at individual guesses. The
+# workers are forked so they share the target set with the main process rather than each
+# loading their own copy. This works particularly well with a prebuilt target index since
+# it is memory mapped and never copied.
+#########################################################################################
+
+import sys
+import multiprocessing
+from collections import deque
+
+##--Custom imports
+from checkpass.ret_types import RetType
+from checkpass.guess_reader import read_guess_blocks
+from checkpass.guess_reader import decode_guess_block
+from checkpass.guess_reader import report_input_errors
+from checkpass.guess_reader import DEFAULT_BLOCK_SIZE
+
+
+## Number of blocks each worker can have queued up at a time
+BLOCKS_PER_WORKER = 4
+
+##--Set in each worker process by _init_worker
+_worker_state = None
+
+
+#########################################################################################
+# Sets up the target set in each worker process
+#########################################################################################
+def _init_worker(passwords, prefilter, hasher, encoding, byte_keys):
+    global _worker_state
+    lookup = passwords.index.get
+    if hasher is not None:
+        lookup = hasher.lookup_function(lookup)
+    _worker_state = {
+        'lookup': lookup,
+        'prefilter': prefilter,
+        'hasher': hasher,
+        'encoding': encoding,
+        'byte_keys': byte_keys,
+        ##Passwords this worker has already reported. A later hit on the same password
+        ##in this worker can never be the first one, so there is no need to send it back
+        'reported': bytearray(len(passwords)),
+    }
+
+
+#########################################################################################
+# Checks a block of guesses in a worker process
+#
+# Returns the number of decoding errors, and a list of events in guess order
+# Each event is (guess_num, slot, guess). slot is None for CHECKPASSDEBUG strings
+#########################################################################################
+def _match_block(base_count, block):
+    lookup = _worker_state['lookup']
+    reported = _worker_state['reported']
+
+    byte_keys = _worker_state['byte_keys']
+    encoding = _worker_state['encoding']
+    if byte_keys:
+        debug_marker = b"CHECKPASSDEBUG"
+    else:
+        debug_marker = "CHECKPASSDEBUG"
+
+    has_debug = b"CHECKPASSDEBUG" in block
+    num_errors = 0
+
+    ##--Only look at the guesses that made it through the prefilter
+    to_check = None
+    prefilter = _worker_state['prefilter']
+    hasher = _worker_state['hasher']
+    if hasher is not None and not has_debug:
+        to_check = hasher.candidate_guesses(block, base_count)
+    elif prefilter is not None and not has_debug:
+        to_check = prefilter.candidate_guesses(block, base_count, encoding = None if byte_keys else encoding)
+
+    ##--Otherwise look at every guess in the block
+    if to_check is None:
+        if byte_keys:
+            guesses = block.split(b'\n')
+        else:
+            guesses, num_errors = decode_guess_block(block, encoding)
+        to_check = enumerate(guesses, base_count + 1)
+
+    events = []
+    for guess_num, guess in to_check:
+        if guess is None:
+            continue
+        guess = guess.rstrip()
+        slot = lookup(guess)
+        if slot is not None and not reported[slot]:
+            reported[slot] = 1
+            events.append((guess_num, slot, guess))
+
+        if has_debug and guess.startswith(debug_marker):
+            events.append((guess_num, None, guess))
+
+    return num_errors, events
+
+
+#########################################################################################
+# Reads guesses from stdin and checks them against the target set using num_workers
+# worker processes
+#
+# Takes the same arguments as match_guesses in checkpass.py
+#########################################################################################
+def match_guesses_parallel(cs, report, num_workers, encoding = "UTF-8", max_guesses = None, verbose = False, block_size = DEFAULT_BLOCK_SIZE, guess_blocks = None):
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        print("Error: Using multiple workers requires the fork start method which is not available on this system", file=sys.stderr)
+        return RetType.GENERIC_ERROR
+
+    pool = context.Pool(num_workers, initializer=_init_worker, initargs=(cs.passwords, cs.prefilter, cs.hasher, encoding, cs.byte_keys))
+
+    ##--Blocks that have been sent to the workers, in the order they were read
+    ##--Each item is (base_count, num_guesses, block_length, result)
+    pending = deque()
+
+    ##--Guess number the next block read will start at
+    next_count = cs.num_guesses
+
+    state = {'num_input_errors': 0, 'done': False}
+
+    try:
+        blocks = guess_blocks
+        if blocks is None:
+            blocks = read_guess_blocks(sys.stdin.buffer, block_size)
+        if cs.stats is not None:
+            blocks = cs.stats.timed_blocks(blocks)
+        if cs.dedup is not None:
+            blocks = cs.dedup.filter_blocks(blocks)
+
+        for block in blocks:
+            num_guesses = block.count(b'\n') + 1
+
+            ##--Only check the guesses up to the maximum number allowed
+            last_block = False
+            if max_guesses != None and next_count + num_guesses >= max_guesses:
+                num_guesses = max(max_guesses - next_count, 0)
+                block = b'\n'.join(block.split(b'\n', num_guesses)[:num_guesses])
+                last_block = True
+
+            if num_guesses:
+                pending.append((next_count, num_guesses, len(block), pool.apply_async(_match_block, (next_count, block))))
+                next_count = next_count + num_guesses
+
+            ##--Don't read too far ahead of the workers
+            while len(pending) >= num_workers * BLOCKS_PER_WORKER and not state['done']:
+                _apply_block(cs, report, pending.popleft(), state, verbose)
+
+            if last_block or state['done']:
+                break
+
+        ##--Wait for the rest of the workers to finish
+        while pending and not state['done']:
+            _apply_block(cs, report, pending.popleft(), state, verbose)
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Applies the results of one block to the cracking session
+#########################################################################################
+def _apply_block(cs, report, pending_block, state, verbose):
+    base_count, num_guesses, block_length, result = pending_block
+    num_errors, events = result.get()
+
+    if num_errors:
+        report_input_errors(state['num_input_errors'], state['num_input_errors'] + num_errors, verbose)
+        state['num_input_errors'] = state['num_input_errors'] + num_errors
+
+    counts = cs.passwords.counts
+    cracked = cs.passwords.cracked
+    guess_cracked = cs.passwords.guess_cracked
+
+    for guess_num, slot, guess in events:
+
+        # If the password is a debug string to print out when rules change
+        if slot is None:
+            report.debug(guess_num, cs.num_cracked, guess)
+            continue
+
+        ##--Another worker may have cracked it with an earlier guess
+        if cracked[slot]:
+            continue
+
+        cracked[slot] = 1
+        guess_cracked[slot] = guess_num
+        cs.num_cracked = cs.num_cracked + counts[slot]
+        report.cracked(guess_num, cs.num_cracked, guess, counts[slot], slot)
+
+        #If all passwords have been cracked, exit
+        if cs.num_cracked >= cs.num_passwords:
+            cs.num_guesses = guess_num
+            report.progress(cs.num_guesses, cs.num_cracked)
+            state['done'] = True
+            return
+
+    cs.num_guesses = base_count + num_guesses
+    report.progress(cs.num_guesses, cs.num_cracked)
+
+    ##--Keep track of how far into the input we are for checkpoints
+    cs.input_guesses = cs.input_guesses + num_guesses
+    cs.input_offset = cs.input_offset + block_length + 1
+    if cs.checkpoint is not None:
+        cs.checkpoint.block_done(cs)
+    if cs.stats is not None:
+        cs.stats.block_done(cs, state['num_input_errors'])
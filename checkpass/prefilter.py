@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Bloom filter used to quickly throw out guesses that can't be in the target set
+#
+# In a typical session well over 99.9% of guesses don't match anything, but each one
+# still costs a trip through the Python matching loop. This filter works on a whole
+# block of raw guesses at once using numpy:
+#   1. Every guess in the block is hashed at once
+#   2. Each hash is checked against the Bloom filter
+#   3. Only the guesses that might be in the target set are returned
+# so the matching loop only has to look at a handful of guesses per block.
+#
+# The filter is only a speed up. Guesses that pass it are still checked against the
+# target set so false positives don't change the results. Guesses that end in whitespace
+# or a non-ASCII byte are always passed through, since rstrip() could turn them into a
+# different password than their raw bytes.
+#
+# Requires numpy to be installed
+# pip install numpy
+#########################################################################################
+
+import sys
+
+##--Keeping numpy optional so people can run checkpass without installing it
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+## Default number of bits in the filter per unique target password
+## 10 bits gives around a 1% false positive rate
+DEFAULT_BITS_PER_ITEM = 10
+
+
+#########################################################################################
+# Hashes the byte ranges [starts, ends) of buffer
+#
+# To avoid touching every byte, only the length and up to 24 bytes of each range are
+# hashed: the first 8, the 8 in the middle and the last 8. Longer guesses that only
+# differ elsewhere will hash the same, which just means a few more false positives
+#
+# Returns a numpy uint64 array with one hash per range. The hash only depends on the
+# bytes in the range, not where it is in the buffer
+#########################################################################################
+def hash_ranges(buffer, starts, ends):
+
+    ##--Pad the end so reading 8 bytes at the start of the last range is safe, then view
+    ##--the buffer as a uint64 starting at every byte offset
+    padded = bytes(buffer) + bytes(8)
+    words = numpy.ndarray(shape=(len(buffer) + 1,), dtype='<u8', buffer=padded, strides=(1,))
+
+    lengths = ends - starts
+    short = lengths < 8
+    if len(lengths) == 0:
+        return numpy.zeros(0, dtype=numpy.uint64)
+
+    ##--Mask off the bytes past the end of ranges shorter than 8 bytes
+    ##--(Shifting by 64 isn't defined, so empty ranges are handled separately)
+    shift = numpy.where(short, (8 - lengths) * 8, 0).astype(numpy.uint64)
+    first = numpy.where(lengths > 0, (words[starts] << shift) >> shift, 0)
+
+    ##--For short ranges the first word already covers everything
+    last = numpy.where(short, 0, words[numpy.maximum(ends - 8, 0)])
+    if lengths.max() > 16:
+        middle = numpy.where(lengths > 16, words[starts + numpy.maximum(lengths // 2 - 4, 0)], 0)
+    else:
+        middle = 0
+
+    with numpy.errstate(over='ignore'):
+        hashes = first * numpy.uint64(0x9E3779B97F4A7C15)
+        hashes = hashes ^ (last * numpy.uint64(0xC2B2AE3D27D4EB4F))
+        hashes = hashes ^ (middle * numpy.uint64(0x165667B19E3779F9))
+        hashes = hashes + lengths.astype(numpy.uint64) * numpy.uint64(0x27D4EB2F165667C5)
+
+        ##--Mix the bits, (splitmix64 finalizer)
+        hashes = hashes ^ (hashes >> numpy.uint64(30))
+        hashes = hashes * numpy.uint64(0xbf58476d1ce4e5b9)
+        hashes = hashes ^ (hashes >> numpy.uint64(27))
+        hashes = hashes * numpy.uint64(0x94d049bb133111eb)
+        hashes = hashes ^ (hashes >> numpy.uint64(31))
+
+    return hashes
+
+
+#########################################################################################
+# Finds the start and end of every guess in a block of guesses separated by b'\n'
+#########################################################################################
+def split_ranges(block):
+    data = numpy.frombuffer(block, dtype=numpy.uint8)
+    newlines = numpy.flatnonzero(data == 10)
+    starts = numpy.empty(len(newlines) + 1, dtype=numpy.int64)
+    starts[0] = 0
+    starts[1:] = newlines + 1
+    ends = numpy.empty(len(newlines) + 1, dtype=numpy.int64)
+    ends[:-1] = newlines
+    ends[-1] = len(data)
+    return data, starts, ends
+
+
+#########################################################################################
+# Bloom filter over the target passwords
+#
+# This is a blocked Bloom filter. All the bits for an item are in the same 64 bit word,
+# so checking an item only needs one memory lookup rather than one per hash function
+#########################################################################################
+class BloomFilter:
+    def __init__(self, num_items, bits_per_item = DEFAULT_BITS_PER_ITEM):
+
+        ##--Number of words is a power of two so the hash can be masked rather than divided
+        num_words = 1
+        while num_words * 64 < num_items * bits_per_item:
+            num_words = num_words * 2
+        self.mask = numpy.uint64(num_words - 1)
+
+        ##--Best number of bits to set per item is ln(2) * bits per item
+        self.num_hashes = min(max(int(round(0.693 * bits_per_item)), 1), 8)
+
+        self.words = numpy.zeros(num_words, dtype=numpy.uint64)
+
+    ##############################################################
+    # Returns the word to use and the bits to set in it for
+    # each hash
+    ##############################################################
+    def _positions(self, hashes):
+        word_index = hashes & self.mask
+
+        ##--The low bits pick the word, so remix the hash and use 6 bits at a
+        ##--time from the top to pick which bits to set in it
+        with numpy.errstate(over='ignore'):
+            bit_hash = hashes * numpy.uint64(0xff51afd7ed558ccd)
+        bit_mask = numpy.zeros(len(hashes), dtype=numpy.uint64)
+        for i in range(self.num_hashes):
+            bit_mask |= numpy.uint64(1) << ((bit_hash >> numpy.uint64(58 - 6 * i)) & numpy.uint64(63))
+        return word_index, bit_mask
+
+    ##############################################################
+    # Adds the items with the given hashes to the filter
+    ##############################################################
+    def add_hashes(self, hashes):
+        word_index, bit_mask = self._positions(hashes)
+        numpy.bitwise_or.at(self.words, word_index, bit_mask)
+
+    ##############################################################
+    # Returns a boolean array, True if the item might be in the filter
+    ##############################################################
+    def contains_hashes(self, hashes):
+        word_index, bit_mask = self._positions(hashes)
+        return (self.words[word_index] & bit_mask) == bit_mask
+
+    ##############################################################
+    # Adds a list of passwords, (as bytes), to the filter
+    ##############################################################
+    def add_passwords(self, passwords):
+        if not passwords:
+            return
+        block = b'\n'.join(passwords)
+        data, starts, ends = split_ranges(block)
+        self.add_hashes(hash_ranges(block, starts, ends))
+
+    ##############################################################
+    # Returns the indexes of the guesses in a block that might be
+    # in the target set, in order, along with where each one
+    # starts and ends in the block
+    #
+    # block is raw guesses separated by b'\n', the same as the
+    # blocks returned by read_guess_blocks
+    ##############################################################
+    def candidates(self, block):
+        data, starts, ends = split_ranges(block)
+        hash_ends = ends
+        not_empty = ends > starts
+        last = data[numpy.maximum(ends - 1, 0)] if len(data) else numpy.zeros(1, dtype=numpy.uint8)
+
+        ##--Ignore a trailing '\r' so files with Windows line endings still work
+        carriage_returns = (last == 13) & not_empty
+        if carriage_returns.any():
+            hash_ends = ends - carriage_returns
+            not_empty = hash_ends > starts
+            last = data[numpy.maximum(hash_ends - 1, 0)]
+
+        result = self.contains_hashes(hash_ranges(block, starts, hash_ends))
+
+        ##--Always check guesses that rstrip() might change
+        result |= ((last <= 32) | (last >= 128)) & not_empty
+
+        indexes = numpy.flatnonzero(result)
+        return indexes.tolist(), starts[indexes].tolist(), ends[indexes].tolist()
+
+    ##############################################################
+    # Returns a list of (guess_num, guess) for the guesses in a
+    # block that might be in the target set
+    #
+    # base_count is the guess number before the start of the block
+    # Only the first max_count guesses in the block are checked
+    # If encoding is specified the guesses are decoded. If any
+    # guess in the block can't be decoded, None is returned so
+    # the caller can check the block the normal way and keep
+    # track of the errors
+    ##############################################################
+    def candidate_guesses(self, block, base_count, max_count = None, encoding = None):
+        if encoding is not None:
+            try:
+                block.decode(encoding)
+            except UnicodeDecodeError:
+                return None
+
+        indexes, starts, ends = self.candidates(block)
+        if max_count is None:
+            max_count = len(block) + 1
+
+        if encoding is None:
+            return [(base_count + 1 + index, block[start:end]) for index, start, end in zip(indexes, starts, ends) if index < max_count]
+        return [(base_count + 1 + index, block[start:end].decode(encoding)) for index, start, end in zip(indexes, starts, ends) if index < max_count]
+
+
+#########################################################################################
+# Builds a Bloom filter from the target passwords in a cracking session
+#
+# encoding is used to encode the passwords if they are stored as strings
+# Returns None if the filter could not be built
+#########################################################################################
+def build_prefilter(cs, encoding = "UTF-8", bits_per_item = DEFAULT_BITS_PER_ITEM):
+    if not HAS_NUMPY:
+        print("Error: The prefilter requires numpy to be installed. pip install numpy", file=sys.stderr)
+        return None
+
+    bloom = BloomFilter(len(cs.passwords), bits_per_item)
+
+    ##--Add the passwords in batches to limit the memory used
+    batch = []
+    for password in cs.passwords:
+        if not cs.byte_keys:
+            password = password.encode(encoding, errors='surrogateescape')
+        batch.append(password)
+        if len(batch) >= 1000000:
+            bloom.add_passwords(batch)
+            batch = []
+    bloom.add_passwords(batch)
+
+    return bloom
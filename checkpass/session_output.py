@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Handles writing the results of a cracking session as it runs
+#
+# This is the cracking curve, (guess number and number cracked), written to the output
+# file plus the optional list of cracked passwords in the order they were cracked.
+# Keeping it in one place means the different ways of matching guesses all produce
+# exactly the same output
+#
+# Points on the cracking curve can be taken in one of several ways:
+#   percent     Every time another curve_step percent of the passwords are cracked
+#   log         At guess numbers spaced evenly on a log scale, curve_step per decade
+#   interval    Every curve_step guesses
+# The guess based ones give points over the whole session, including the long tail where
+# hardly anything is cracked. They are found by only comparing the guess number of each
+# crack, and the guess count at the end of each block, against the next point
+#########################################################################################
+
+import math
+
+
+## Ways of choosing the points on the cracking curve
+CURVE_TYPES = ['percent', 'log', 'interval']
+
+## Default curve_step for each type of curve
+DEFAULT_CURVE_STEPS = {'percent': 0.1, 'log': 20, 'interval': 1000000}
+
+
+#########################################################################################
+# Writes out the progress of a cracking session
+#########################################################################################
+class SessionOutput:
+    def __init__(self, output_file, cracked_file = None, num_passwords = 0, encoding = "UTF-8", byte_keys = False, curve = 'percent', curve_step = None):
+
+        ##Where the cracking curve is written to
+        self.output_file = output_file
+
+        ##Where the cracked passwords are written to. None if they are not being saved
+        self.cracked_file = cracked_file
+
+        ##Encoding of the passwords. Used to decode them if they are stored as bytes
+        self.encoding = encoding
+        self.byte_keys = byte_keys
+
+        ##How the points on the curve are chosen
+        self.curve = curve
+        if curve_step is None:
+            curve_step = DEFAULT_CURVE_STEPS[curve]
+        self.curve_step = curve_step
+
+        ## By default I only want to print out 1000 items + the last count to make graphing easier
+        step_size = 0
+        if curve == 'percent':
+            step_size = int(num_passwords * (curve_step / 100))
+        if step_size == 0:
+            step_size = 1
+        self.step_size = step_size
+        self.cur_step_limit = step_size
+
+        ##For guess based curves, the number of the next point and the guess count it is at
+        self.curve_index = 0
+        self.next_guess_point = None
+
+    ##############################################################
+    # Print out the inital stats of the cracking session
+    ##############################################################
+    def start(self, num_guesses, num_cracked):
+        print(num_guesses,"\t",num_cracked, file=self.output_file)
+        self.set_curve_index(0, num_guesses)
+
+    ##############################################################
+    # Sets the next point on a guess based curve to the first one
+    # from curve_index on that is past num_guesses
+    ##############################################################
+    def set_curve_index(self, curve_index, num_guesses):
+        if self.curve == 'percent':
+            return
+        self.curve_index = curve_index
+        self.next_guess_point = self._curve_point(curve_index)
+        self._advance_curve(num_guesses)
+
+    ##############################################################
+    # Returns the guess count of a point on a guess based curve
+    ##############################################################
+    def _curve_point(self, curve_index):
+        if self.curve == 'log':
+            return math.ceil(10 ** (curve_index / self.curve_step))
+        return int(curve_index * self.curve_step)
+
+    ##############################################################
+    # Moves the next point on the curve past num_guesses
+    ##############################################################
+    def _advance_curve(self, num_guesses):
+        ##--Jump close to the right point first so resuming a long session is quick
+        if num_guesses > 0:
+            if self.curve == 'log':
+                estimate = int(math.log10(num_guesses) * self.curve_step) - 1
+            else:
+                estimate = int(num_guesses // self.curve_step) - 1
+            if estimate > self.curve_index:
+                self.curve_index = estimate
+                self.next_guess_point = self._curve_point(estimate)
+
+        while self.next_guess_point <= num_guesses:
+            self.curve_index = self.curve_index + 1
+            self.next_guess_point = self._curve_point(self.curve_index)
+
+    ##############################################################
+    # Prints out the points on a guess based curve up to and
+    # including num_guesses
+    ##############################################################
+    def _print_guess_points(self, num_guesses, num_cracked):
+        while self.next_guess_point <= num_guesses:
+            print(self.next_guess_point, "\t", num_cracked, "\t", file=self.output_file)
+            self._advance_curve(self.next_guess_point)
+        self.output_file.flush()
+
+    ##############################################################
+    # Called at the end of every block of guesses with the total
+    # number of guesses so far
+    ##############################################################
+    def progress(self, num_guesses, num_cracked):
+        if self.next_guess_point is not None and self.next_guess_point <= num_guesses:
+            self._print_guess_points(num_guesses, num_cracked)
+
+    ##############################################################
+    # Records that a password was cracked
+    #
+    # num_cracked is the total cracked including this password
+    # count is the number of times this password occurs
+    # slot is where the password is in the TargetStore
+    ##############################################################
+    def cracked(self, guess_num, num_cracked, guess, count, slot = None):
+        ##--Points before this guess don't include this password
+        if self.next_guess_point is not None:
+            if self.next_guess_point < guess_num:
+                self._print_guess_points(guess_num - 1, num_cracked - count)
+
+        elif num_cracked >= self.cur_step_limit:
+            print(guess_num, "\t", num_cracked, "\t", file=self.output_file)
+            self.cur_step_limit = self.step_size + self.cur_step_limit
+
+            # Because I'm impatient to see the results:
+            self.output_file.flush()
+
+        if self.cracked_file:
+            if self.byte_keys:
+                ##--Guesses that crack a hash may not be valid in the encoding
+                guess = guess.decode(self.encoding, errors='replace')
+            ##--One write for all the copies of the password
+            self.cracked_file.write(f"{guess_num}\t{guess}\n" * count)
+            self.cracked_file.flush()
+
+    ##############################################################
+    # Prints out a CHECKPASSDEBUG string from the guesses
+    ##############################################################
+    def debug(self, guess_num, num_cracked, guess):
+        if self.next_guess_point is not None and self.next_guess_point < guess_num:
+            self._print_guess_points(guess_num - 1, num_cracked)
+        if self.byte_keys:
+            guess = guess.decode(self.encoding, errors='replace')
+        print(guess_num, "\t", num_cracked, "\t", guess, file=self.output_file)
+
+    ##############################################################
+    # Print out the final stats of the cracking session
+    ##############################################################
+    def finish(self, num_guesses, num_cracked):
+        print(num_guesses, "\t", num_cracked, file=self.output_file)
+
+
+#########################################################################################
+# Writes out the progress of a cracking session against several target sets at once
+#
+# Each target set gets its own SessionOutput, and the number cracked is tracked
+# separately for each set
+#########################################################################################
+class MultiSetOutput:
+    def __init__(self, target_sets, outputs):
+
+        ##The TargetSets from the TargetStore
+        self.target_sets = target_sets
+
+        ##The SessionOutput for each target set
+        self.outputs = outputs
+
+    def start(self, num_guesses, num_cracked):
+        for target_set, output in zip(self.target_sets, self.outputs):
+            output.start(num_guesses, target_set.num_cracked)
+
+    ##############################################################
+    # Records that a password was cracked in each set that
+    # contains it
+    ##############################################################
+    def cracked(self, guess_num, num_cracked, guess, count, slot = None):
+        for target_set, output in zip(self.target_sets, self.outputs):
+            set_count = target_set.count(slot)
+            if set_count:
+                target_set.num_cracked = target_set.num_cracked + set_count
+                output.cracked(guess_num, target_set.num_cracked, guess, set_count, slot)
+
+    def progress(self, num_guesses, num_cracked):
+        for target_set, output in zip(self.target_sets, self.outputs):
+            output.progress(num_guesses, target_set.num_cracked)
+
+    def debug(self, guess_num, num_cracked, guess):
+        for target_set, output in zip(self.target_sets, self.outputs):
+            output.debug(guess_num, target_set.num_cracked, guess)
+
+    def finish(self, num_guesses, num_cracked):
+        for target_set, output in zip(self.target_sets, self.outputs):
+            output.finish(num_guesses, target_set.num_cracked)
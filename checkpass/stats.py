@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Throughput statistics for a cracking session
+#
+# Used to tell whether checkpass or the guess generator feeding it is the bottleneck.
+# The time spent waiting on stdin is measured separately from the rest of the time, which
+# is spent matching guesses, (and in multi-process mode waiting on the workers).
+#
+# To keep the overhead low nothing is measured per guess. The clock is only read around
+# each block read from stdin and once per block to see if it is time to print the stats,
+# so with the default block size it costs well under 1% of the throughput.
+#
+# Stats are printed to stderr, or written as one JSON object per line to a stats file
+#########################################################################################
+
+import sys
+import os
+import json
+import time
+
+##--resource isn't available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+## Default number of seconds between printing stats
+DEFAULT_STATS_INTERVAL = 10
+
+
+#########################################################################################
+# Returns the current resident set size of the process in bytes
+#
+# Falls back to the peak resident set size if the current one isn't available
+# Returns None if neither is available
+#########################################################################################
+def get_rss():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, ValueError, IndexError, AttributeError):
+        pass
+
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        ##--Linux reports it in kilobytes, macOS in bytes
+        if sys.platform == 'darwin':
+            return max_rss
+        return max_rss * 1024
+
+    return None
+
+
+#########################################################################################
+# Keeps track of how fast a cracking session is running
+#########################################################################################
+class SessionStats:
+    def __init__(self, stats_file = None, interval = DEFAULT_STATS_INTERVAL):
+
+        ##Where to write the stats as JSON lines. If None they are printed to stderr
+        self.stats_file = stats_file
+
+        ##Number of seconds between printing stats
+        self.interval = interval
+
+        ##Total number of seconds spent waiting on the guess input
+        self.input_time = 0.0
+
+        ##Total number of guesses that could not be decoded
+        self.num_input_errors = 0
+
+        ##Values at the start of the session and at the last time the stats were printed
+        ##so the rates can be calculated
+        self.start_time = None
+        self.start_guesses = 0
+        self.start_cracked = 0
+        self.last_time = None
+        self.last_guesses = 0
+        self.last_cracked = 0
+        self.next_time = None
+
+    ##############################################################
+    # Starts timing the session
+    ##############################################################
+    def start(self, cs):
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.next_time = self.start_time + self.interval
+        self.start_guesses = cs.num_guesses
+        self.last_guesses = cs.num_guesses
+        self.start_cracked = cs.num_cracked
+        self.last_cracked = cs.num_cracked
+
+    ##############################################################
+    # Wraps the generator of guess blocks to time how long is
+    # spent waiting on each one
+    ##############################################################
+    def timed_blocks(self, blocks):
+        clock = time.perf_counter
+        blocks = iter(blocks)
+        while True:
+            start = clock()
+            try:
+                block = next(blocks)
+            except StopIteration:
+                self.input_time = self.input_time + clock() - start
+                return
+            self.input_time = self.input_time + clock() - start
+            yield block
+
+    ##############################################################
+    # Called after every block of guesses. Prints out the stats if
+    # enough time has passed since the last time
+    #
+    # num_input_errors is the total number of guesses that could
+    # not be decoded so far
+    ##############################################################
+    def block_done(self, cs, num_input_errors = 0):
+        self.num_input_errors = num_input_errors
+        if time.perf_counter() >= self.next_time:
+            self.report(cs)
+
+    ##############################################################
+    # Prints out the stats
+    ##############################################################
+    def report(self, cs, final = False):
+        num_input_errors = self.num_input_errors
+        now = time.perf_counter()
+        elapsed = now - self.start_time
+        interval = now - self.last_time
+
+        num_guesses = cs.num_guesses - self.start_guesses
+        num_cracked = cs.num_cracked - self.start_cracked
+
+        stats = {
+            'final': final,
+            'elapsed': round(elapsed, 3),
+            'guesses': cs.num_guesses,
+            'cracked': cs.num_cracked,
+            'guesses_per_sec': round(_rate(num_guesses, elapsed), 1),
+            'cracks_per_sec': round(_rate(num_cracked, elapsed), 3),
+            'interval_guesses_per_sec': round(_rate(cs.num_guesses - self.last_guesses, interval), 1),
+            'interval_cracks_per_sec': round(_rate(cs.num_cracked - self.last_cracked, interval), 3),
+            'input_wait_sec': round(self.input_time, 3),
+            'match_sec': round(max(elapsed - self.input_time, 0), 3),
+            'input_wait_fraction': round(_rate(self.input_time, elapsed), 4),
+            'decode_errors': num_input_errors,
+            'decode_error_rate': _rate(num_input_errors, num_guesses),
+            'rss_bytes': get_rss(),
+        }
+
+        if self.stats_file is not None:
+            print(json.dumps(stats), file=self.stats_file)
+            self.stats_file.flush()
+        else:
+            rss = stats['rss_bytes']
+            print("Stats: guesses " + str(stats['guesses']) +
+                " (" + str(stats['interval_guesses_per_sec']) + "/s now, " + str(stats['guesses_per_sec']) + "/s overall)" +
+                " cracked " + str(stats['cracked']) + " (" + str(stats['cracks_per_sec']) + "/s)" +
+                " waiting on input " + "{:.1%}".format(stats['input_wait_fraction']) +
+                " decode errors " + "{:.4%}".format(stats['decode_error_rate']) +
+                " rss " + ("unknown" if rss is None else "{:.1f} MB".format(rss / (1024 * 1024))),
+                file=sys.stderr)
+
+        self.last_time = now
+        self.last_guesses = cs.num_guesses
+        self.last_cracked = cs.num_cracked
+        self.next_time = now + self.interval
+
+
+#########################################################################################
+# Returns amount / total, or 0 if total is 0
+#########################################################################################
+def _rate(amount, total):
+    if total <= 0:
+        return 0.0
+    return amount / total
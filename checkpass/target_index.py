@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Prebuilt on-disk index of a target set
+#
+# Parsing a large target file, (and detecting its encoding), can take minutes. Since the
+# same target sets are used over and over again, they can instead be compiled once into
+# a binary index file with the build-index command. The index is then memory mapped so
+# starting a new session against it is close to instant.
+#
+# File layout, (all integers are little endian):
+#   8 bytes     Magic value, INDEX_MAGIC
+#   4 bytes     Length of the JSON header
+#   N bytes     JSON header, padded with spaces to an 8 byte boundary. Contains the
+#               encoding, checksum of the source file, counts, and the offset of
+#               each of the sections below
+#   counts      uint32[num_unique]     Number of times each password occurs
+#   offsets     uint64[num_unique + 1] Start of each password in the keys section
+#   table_hash  uint32[table_size]     crc32 of the password stored in that table entry
+#   table_slot  uint32[table_size]     slot + 1 of the password in that entry, 0 if empty
+#   keys        The raw encoded passwords, one after another
+#
+# The hash table is open addressing with linear probing, and is always at least twice
+# the size of the number of unique passwords. crc32 is used as the hash function since
+# it is fast and, unlike hash(), gives the same result in every process.
+#
+# Passwords are stored as raw bytes, so sessions run against an index always match
+# guesses as raw bytes, (the same as --byte_keys)
+#
+# Looking a guess up in the memory mapped table is done in Python, so it is slower than
+# the dict TargetStore uses. With in_memory the passwords are instead copied out of the
+# index into a dict when it is loaded. Measured with benchmarks/checkpass_benchmark.py
+# on 1 million targets, (700,000 unique), and 2 million guesses, (64 bit CPython 3.11):
+#                       load time   guesses/sec
+#   target file:        3.7s        1.70 million
+#   mmap index:         0.3s        1.08 million
+#   in_memory index:    0.9s        1.76 million
+#
+# The size, modification time and sha256 of the target file are saved in the header. If
+# the target file has changed since the index was built, it is refused when loaded
+#########################################################################################
+
+import sys
+import os
+import json
+import mmap
+import struct
+import hashlib
+import zlib
+from array import array
+
+##--Custom imports
+from checkpass.ret_types import RetType
+from checkpass.file_io import is_ascii_compatible
+from checkpass.compressed import open_target_file, COMPRESSION_ERRORS
+from checkpass.target_store import TargetStore
+
+
+## Identifies a target index file
+INDEX_MAGIC = b'CPINDEX1'
+
+## Version of the index file layout
+INDEX_VERSION = 1
+
+
+#########################################################################################
+# Returns True if the file is a target index file created by build-index
+#########################################################################################
+def is_target_index(filename):
+    try:
+        with open(filename, 'rb') as file:
+            return file.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+    except IOError:
+        return False
+
+
+#########################################################################################
+# Compiles a target file into an index file
+#
+# The passwords are read the same way as read_input_passwords does with byte_keys = True
+#########################################################################################
+def build_target_index(training_file, index_file, file_encoding = 'utf-8'):
+
+    if not is_ascii_compatible(file_encoding):
+        print("Error: Building an index is not supported for the file encoding " + str(file_encoding), file=sys.stderr)
+        return RetType.ENCODING_ERROR
+
+    store = TargetStore()
+    num_passwords = 0
+    num_encoding_errors = 0
+    checksum = hashlib.sha256()
+
+    ##--Read in the target file
+    try:
+        with open_target_file(training_file) as file:
+            for password in file:
+                checksum.update(password)
+                try:
+                    password.decode(file_encoding)
+                except UnicodeDecodeError:
+                    num_encoding_errors = num_encoding_errors + 1
+                    continue
+
+                num_passwords = num_passwords + 1
+                store.add(password.rstrip())
+
+    except COMPRESSION_ERRORS as error:
+        print (error, file=sys.stderr)
+        print ("Error opening file " + training_file, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if num_encoding_errors != 0:
+        print("WARNING: Number of passwords skipped due to encoding errors: " + str(num_encoding_errors), file=sys.stderr)
+
+    num_unique = len(store)
+
+    ##--Table size is a power of two at least twice the number of unique passwords
+    table_size = 16
+    while table_size < num_unique * 2:
+        table_size = table_size * 2
+    mask = table_size - 1
+
+    ##--Build the sections
+    offsets = array('Q', [0])
+    keys_size = 0
+    table_hash = array('I', bytes(4 * table_size))
+    table_slot = array('I', bytes(4 * table_size))
+    for slot, password in enumerate(store.index):
+        keys_size = keys_size + len(password)
+        offsets.append(keys_size)
+
+        hash_value = zlib.crc32(password)
+        pos = hash_value & mask
+        while table_slot[pos] != 0:
+            pos = (pos + 1) & mask
+        table_hash[pos] = hash_value
+        table_slot[pos] = slot + 1
+
+    counts = array('I', store.counts)
+
+    sections = [
+        ('counts', counts),
+        ('offsets', offsets),
+        ('table_hash', table_hash),
+        ('table_slot', table_slot),
+    ]
+
+    source_stat = os.stat(training_file)
+    header = {
+        'version': INDEX_VERSION,
+        'source': os.path.abspath(training_file),
+        'source_size': source_stat.st_size,
+        'source_mtime_ns': source_stat.st_mtime_ns,
+        'source_sha256': checksum.hexdigest(),
+        'encoding': file_encoding,
+        'num_passwords': num_passwords,
+        'num_unique': num_unique,
+        'num_encoding_errors': num_encoding_errors,
+        'table_size': table_size,
+    }
+
+    ##--Figure out where each section will go. The header size depends on the offsets
+    ##--so leave plenty of room for them when padding it out
+    header['sections'] = {name: [0, 0] for name, _ in sections + [('keys', None)]}
+    header_len = len(json.dumps(header)) + 256
+    header_len = header_len + (-(len(INDEX_MAGIC) + 4 + header_len) % 8)
+    position = len(INDEX_MAGIC) + 4 + header_len
+    for name, data in sections:
+        length = len(data) * data.itemsize
+        header['sections'][name] = [position, length]
+        position = position + length
+    header['sections']['keys'] = [position, keys_size]
+
+    encoded_header = json.dumps(header).encode('utf-8')
+    encoded_header = encoded_header + b' ' * (header_len - len(encoded_header))
+
+    ##--Now write everything out
+    try:
+        with open(index_file, 'wb') as file:
+            file.write(INDEX_MAGIC)
+            file.write(struct.pack('<I', header_len))
+            file.write(encoded_header)
+            for name, data in sections:
+                if sys.byteorder != 'little':
+                    data.byteswap()
+                data.tofile(file)
+            for password in store.index:
+                file.write(password)
+
+    except IOError as error:
+        print (error, file=sys.stderr)
+        print ("Error writing index file " + index_file, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    print("Index written to " + index_file, file=sys.stderr)
+    print("Passwords: " + str(num_passwords) + " Unique: " + str(num_unique), file=sys.stderr)
+    print("Source sha256: " + header['source_sha256'], file=sys.stderr)
+
+    return RetType.STATUS_OK
+
+
+#########################################################################################
+# Hash table lookups into a memory mapped index
+#
+# Acts like the dict in TargetStore.index, returning the slot for a password
+#########################################################################################
+class MmapIndex:
+    def __init__(self, mapped, header):
+        self.header = header
+        self.num_unique = header['num_unique']
+        self.mask = header['table_size'] - 1
+
+        sections = header['sections']
+        view = memoryview(mapped)
+        self.offsets = _section(view, sections, 'offsets', 'Q')
+        self.table_hash = _section(view, sections, 'table_hash', 'I')
+        self.table_slot = _section(view, sections, 'table_slot', 'I')
+        start, length = sections['keys']
+        self.keys = mapped
+        self.keys_start = start
+
+    def __len__(self):
+        return self.num_unique
+
+    def __contains__(self, password):
+        return self.get(password) is not None
+
+    ##############################################################
+    # Iterates over the passwords in slot order
+    ##############################################################
+    def __iter__(self):
+        for slot in range(self.num_unique):
+            yield self.key(slot)
+
+    ##############################################################
+    # Returns the password stored in a slot
+    ##############################################################
+    def key(self, slot):
+        start = self.keys_start
+        return self.keys[start + self.offsets[slot]:start + self.offsets[slot + 1]]
+
+    ##############################################################
+    # Returns the slot of a password, or None if it isn't a target
+    ##############################################################
+    def get(self, password, default = None):
+        hash_value = zlib.crc32(password)
+        mask = self.mask
+        table_hash = self.table_hash
+        table_slot = self.table_slot
+        pos = hash_value & mask
+        while True:
+            slot = table_slot[pos]
+            if slot == 0:
+                return default
+            if table_hash[pos] == hash_value and self.key(slot - 1) == password:
+                return slot - 1
+            pos = (pos + 1) & mask
+
+
+#########################################################################################
+# Returns a memoryview of one section of the index file
+#########################################################################################
+def _section(view, sections, name, typecode):
+    start, length = sections[name]
+    return view[start:start + length].cast(typecode)
+
+
+#########################################################################################
+# Target store backed by a memory mapped index
+#
+# Has the same layout as TargetStore, but the passwords and counts are read only. The
+# cracked status is kept in memory for the current session
+#
+# If in_memory is True the passwords are copied into a dict so guesses can be looked up
+# faster than with MmapIndex
+#########################################################################################
+class MmapTargetStore(TargetStore):
+    def __init__(self, mapped, header, in_memory = False):
+        self.mapped = mapped
+        self.index = MmapIndex(mapped, header)
+        if in_memory:
+            start, length = header['sections']['keys']
+            keys = mapped[start:start + length]
+            offsets = self.index.offsets.tolist()
+            self.index = dict(zip(map(keys.__getitem__, map(slice, offsets, offsets[1:])), range(header['num_unique'])))
+        self.counts = _section(memoryview(mapped), header['sections'], 'counts', 'I')
+        self.cracked = bytearray(header['num_unique'])
+        self.guess_cracked = array('q', [-1]) * header['num_unique']
+        self.sets = []
+
+    def add(self, password, count = 1):
+        raise TypeError("Passwords can not be added to a prebuilt target index")
+
+
+#########################################################################################
+# Checks if the target file an index was built from has changed since
+#
+# If the size or modification time are different, the file's checksum is compared,
+# so a file that was only touched or copied can still be used
+# Returns True if the file has changed
+#########################################################################################
+def source_changed(header):
+    source = header['source']
+    source_stat = os.stat(source)
+    if source_stat.st_size == header.get('source_size') and source_stat.st_mtime_ns == header.get('source_mtime_ns'):
+        return False
+
+    checksum = hashlib.sha256()
+    with open_target_file(source) as file:
+        while True:
+            data = file.read(1024 * 1024)
+            if not data:
+                break
+            checksum.update(data)
+    return checksum.hexdigest() != header['source_sha256']
+
+
+#########################################################################################
+# Loads a target index into the cracking session
+#
+# file_encoding is a list that the encoding stored in the index is appended to, (the
+# same as detect_file_encoding)
+#
+# If in_memory is True, the passwords are copied into a dict, (see MmapTargetStore)
+#########################################################################################
+def load_target_index(index_file, cs, file_encoding, in_memory = False):
+    try:
+        with open(index_file, 'rb') as file:
+            if file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                print("Error: " + index_file + " is not a target index file", file=sys.stderr)
+                return RetType.BAD_INPUT
+            header_len = struct.unpack('<I', file.read(4))[0]
+            header = json.loads(file.read(header_len).decode('utf-8'))
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    except (IOError, ValueError) as error:
+        print (error, file=sys.stderr)
+        print ("Error reading index file " + index_file, file=sys.stderr)
+        return RetType.FILE_IO_ERROR
+
+    if header['version'] != INDEX_VERSION:
+        print("Error: Unsupported target index version " + str(header['version']), file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    if sys.byteorder != 'little':
+        print("Error: Target index files can only be loaded on little endian systems", file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    ##--An index of an old copy of the target file would give the wrong results
+    try:
+        changed = source_changed(header)
+    except COMPRESSION_ERRORS as error:
+        print("WARNING: Could not read the target file the index was built from, " + header['source'] + ", to check it is up to date", file=sys.stderr)
+        print("         Error is " + str(error), file=sys.stderr)
+        changed = False
+    if changed:
+        print("Error: The target file " + header['source'] + " has changed since the index " + index_file + " was built", file=sys.stderr)
+        print("Rebuild the index with build-index", file=sys.stderr)
+        return RetType.BAD_INPUT
+
+    cs.passwords = MmapTargetStore(mapped, header, in_memory)
+    cs.num_passwords = header['num_passwords']
+    cs.byte_keys = True
+    file_encoding.append(header['encoding'])
+
+    print("Loaded target index built from " + header['source'], file=sys.stderr)
+    print("Source sha256: " + header['source_sha256'], file=sys.stderr)
+
+    return RetType.STATUS_OK
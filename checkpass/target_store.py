@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Compact storage for the target passwords
+#
+# Originally each unique target password was mapped to a three item list of
+#   [Number_of_Passwords, isCracked, Number_Of_Guesses_To_Crack]
+# On large target sets those lists take up more memory than the passwords themselves.
+#
+# Instead each password is mapped to an integer slot, and the values are kept in
+# parallel typed arrays indexed by that slot.
+#
+# Measured with tracemalloc on 1 million unique 8 character targets, (64 bit CPython
+# 3.11, not counting the password strings themselves which are the same in both cases):
+#   dict of lists:  ~119 bytes per target
+#   TargetStore:    ~72 bytes per target
+#
+# A store can also hold the union of several target sets so they can all be checked in
+# a single pass over the guesses. In that case each TargetSet records how many times
+# each password occurs in that particular set
+#########################################################################################
+
+from array import array
+
+
+#########################################################################################
+# Holds the target passwords and their cracked status
+#########################################################################################
+class TargetStore:
+    def __init__(self):
+
+        ##Maps the password, (str or bytes), to its slot in the arrays below
+        ##Slots are assigned in insertion order, so iterating over the dict returns
+        ##the passwords in slot order
+        self.index = dict()
+
+        ##Number of times each password occurs in the target set
+        self.counts = array('I')
+
+        ##Non-zero if the password has been cracked
+        self.cracked = bytearray()
+
+        ##The guess number that cracked the password. -1 if it has not been cracked
+        self.guess_cracked = array('q')
+
+        ##The individual target sets when more than one is loaded. Empty otherwise
+        self.sets = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, password):
+        return password in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    ##############################################################
+    # Adds one occurance of a password to the target set
+    # Returns the slot of the password
+    ##############################################################
+    def add(self, password, count = 1):
+        slot = self.index.get(password)
+        if slot is None:
+            slot = len(self.counts)
+            self.index[password] = slot
+            self.counts.append(count)
+            self.cracked.append(0)
+            self.guess_cracked.append(-1)
+        else:
+            self.counts[slot] = self.counts[slot] + count
+
+        ##--Also record it in the target set currently being read in
+        if self.sets:
+            self.sets[-1].add(slot, count)
+        return slot
+
+    ##############################################################
+    # Adds a dict of password: count to the target set
+    #
+    # Does the same thing as calling add() for each password in
+    # order, but the new passwords are added all at once
+    ##############################################################
+    def add_counts(self, counts):
+        index = self.index
+        target_set = self.sets[-1] if self.sets else None
+
+        new_passwords = []
+        for password, count in counts.items():
+            slot = index.get(password)
+            if slot is None:
+                new_passwords.append(password)
+            else:
+                self.counts[slot] = self.counts[slot] + count
+                if target_set is not None:
+                    target_set.add(slot, count)
+
+        first_slot = len(self.counts)
+        index.update(zip(new_passwords, range(first_slot, first_slot + len(new_passwords))))
+        self.counts.extend(array('I', map(counts.__getitem__, new_passwords)))
+        self.cracked.extend(bytes(len(new_passwords)))
+        self.guess_cracked.extend(array('q', [-1]) * len(new_passwords))
+
+        if target_set is not None:
+            for slot, password in enumerate(new_passwords, first_slot):
+                target_set.add(slot, counts[password])
+
+    ##############################################################
+    # Starts a new target set. All passwords added after this
+    # are also counted as part of the new set
+    # Returns the new TargetSet
+    ##############################################################
+    def begin_set(self, name):
+        target_set = TargetSet(name)
+        self.sets.append(target_set)
+        return target_set
+
+    ##############################################################
+    # Returns the slot of a password, or None if it isn't a target
+    ##############################################################
+    def get(self, password):
+        return self.index.get(password)
+
+    ##############################################################
+    # Marks a slot as cracked at guess_num
+    # Returns the number of passwords that were cracked
+    ##############################################################
+    def crack(self, slot, guess_num):
+        self.cracked[slot] = 1
+        self.guess_cracked[slot] = guess_num
+        return self.counts[slot]
+
+    ##############################################################
+    # Iterates over (password, count) for all uncracked passwords
+    #
+    # If target_set is specified, only the passwords in that set
+    # are returned along with their count in that set
+    ##############################################################
+    def uncracked(self, target_set = None):
+        cracked = self.cracked
+        if target_set is None:
+            counts = self.counts
+            for slot, password in enumerate(self.index):
+                if not cracked[slot]:
+                    yield password, counts[slot]
+        else:
+            for slot, password in enumerate(self.index):
+                if not cracked[slot]:
+                    count = target_set.count(slot)
+                    if count:
+                        yield password, count
+
+
+#########################################################################################
+# One target set out of several that share a TargetStore
+#########################################################################################
+class TargetSet:
+    def __init__(self, name):
+
+        ##Name used to label the results for this set
+        self.name = name
+
+        ##Number of times each password occurs in this set, indexed by slot
+        ##Slots past the end of the array do not occur in this set
+        self.counts = array('I')
+
+        ##Total number of passwords in this set, (includes duplicates)
+        self.num_passwords = 0
+
+        ##Total number of passwords in this set that have been cracked
+        self.num_cracked = 0
+
+    ##############################################################
+    # Adds count occurances of the password in slot to this set
+    ##############################################################
+    def add(self, slot, count = 1):
+        counts = self.counts
+        if slot >= len(counts):
+            counts.extend(bytes(slot + 1 - len(counts)))
+        counts[slot] = counts[slot] + count
+        self.num_passwords = self.num_passwords + count
+
+    ##############################################################
+    # Returns the number of times the password in slot occurs in
+    # this set
+    ##############################################################
+    def count(self, slot):
+        if slot < len(self.counts):
+            return self.counts[slot]
+        return 0
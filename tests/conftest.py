@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Shared fixtures for the checkpass tests
+#
+# The tests are small end to end runs of checkpass.py on a synthetic target set and
+# guess stream. Most of them check that a mode, (workers, prefilter, index files, etc),
+# gives exactly the same results files as the plain single process run, which in turn is
+# checked against reference_session(), a direct implementation of what checkpass counts.
+#
+# The target set is small enough that the default percent curve writes a point for every
+# password cracked, so the output files show every crack
+#
+# Run with:
+#   python3 -m pytest tests
+#########################################################################################
+
+import sys
+import os
+import random
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+
+## Top of the repo, so the tests can import the checkpass package and run checkpass.py
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CHECKPASS = os.path.join(BASE_DIR, 'checkpass.py')
+sys.path.insert(0, BASE_DIR)
+
+## Non-ASCII passwords mixed into the target set
+NON_ASCII_PASSWORDS = ['pässwort', 'naïve1', 'contraseña', 'пароль', 'zażółć']
+
+
+#########################################################################################
+# Returns a random password made of lowercase letters and digits
+#########################################################################################
+def random_password(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for i in range(rng.randint(4, 9)))
+
+
+#########################################################################################
+# Returns the lines of a target set, with popular passwords repeated the most
+#########################################################################################
+def make_targets(rng, num_unique = 400):
+    unique = list(dict.fromkeys([random_password(rng) for i in range(num_unique)] + NON_ASCII_PASSWORDS))
+    targets = []
+    for rank, password in enumerate(unique, 1):
+        targets.extend([password] * max(1, 40 // rank))
+    rng.shuffle(targets)
+    return targets
+
+
+#########################################################################################
+# Returns a guess stream that cracks most of the targets, with misses, repeated guesses,
+# trailing whitespace and a CHECKPASSDEBUG string
+#########################################################################################
+def make_guesses(rng, targets, num_guesses = 5000):
+    unique = list(dict.fromkeys(targets))
+    guesses = []
+    for i in range(num_guesses):
+        roll = rng.random()
+        if roll < 0.15:
+            guesses.append(rng.choice(unique))
+        elif roll < 0.25 and guesses:
+            guesses.append(rng.choice(guesses))
+        elif roll < 0.27:
+            guesses.append(rng.choice(unique) + ' ')
+        else:
+            guesses.append(random_password(rng) + 'x')
+    guesses.insert(num_guesses // 2, 'CHECKPASSDEBUG rule 2')
+    ##--Leave some targets uncracked so the session runs to the end of the guesses
+    return [guess for guess in guesses if guess not in unique[-20:]]
+
+
+#########################################################################################
+# Returns the output, cracked and uncracked files checkpass.py should write for a
+# session, as text
+#########################################################################################
+def reference_session(targets, guesses):
+    counts = {}
+    for password in targets:
+        counts[password] = counts.get(password, 0) + 1
+
+    output = ['0 \t 0']
+    cracked_lines = []
+    cracked = set()
+    num_cracked = 0
+    for guess_num, guess in enumerate(guesses, 1):
+        guess = guess.rstrip()
+        if guess in counts and guess not in cracked:
+            cracked.add(guess)
+            num_cracked = num_cracked + counts[guess]
+            output.append(str(guess_num) + ' \t ' + str(num_cracked) + ' \t')
+            cracked_lines.extend([str(guess_num) + '\t' + guess] * counts[guess])
+        if guess.startswith('CHECKPASSDEBUG'):
+            output.append(str(guess_num) + ' \t ' + str(num_cracked) + ' \t ' + guess)
+    output.append(str(len(guesses)) + ' \t ' + str(num_cracked))
+
+    uncracked = []
+    for password, count in counts.items():
+        if password not in cracked:
+            uncracked.extend([password] * count)
+
+    return {
+        'output': ''.join(line + '\n' for line in output),
+        'cracked': ''.join(line + '\n' for line in cracked_lines),
+        'uncracked': ''.join(line + '\n' for line in uncracked),
+    }
+
+
+#########################################################################################
+# Writes lines to a file as UTF-8
+#########################################################################################
+def write_lines(filename, lines):
+    with open(filename, 'w', encoding='utf-8') as file:
+        for line in lines:
+            file.write(line + '\n')
+
+
+#########################################################################################
+# Runs checkpass.py with the arguments, and the contents of stdin_file on stdin
+# Returns the CompletedProcess, with stderr as text
+#########################################################################################
+def run_checkpass(args, stdin_file = None, timeout = 60):
+    stdin = open(stdin_file, 'rb') if stdin_file is not None else subprocess.DEVNULL
+    try:
+        return subprocess.run([sys.executable, CHECKPASS] + [str(arg) for arg in args], stdin=stdin,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout, text=True)
+    finally:
+        if stdin_file is not None:
+            stdin.close()
+
+
+#########################################################################################
+# Reads a results file as text. Returns None if it wasn't written
+#########################################################################################
+def read_text(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename, encoding='utf-8') as file:
+        return file.read()
+
+
+#########################################################################################
+# The synthetic target set and guesses, shared by all the tests
+#########################################################################################
+@pytest.fixture(scope='session')
+def data(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('data')
+    rng = random.Random(1234)
+    targets = make_targets(rng)
+    guesses = make_guesses(rng, targets)
+
+    target_file = directory / 'targets.txt'
+    guess_file = directory / 'guesses.txt'
+    write_lines(target_file, targets)
+    write_lines(guess_file, guesses)
+
+    return SimpleNamespace(directory = directory, targets = targets, guesses = guesses,
+        target_file = target_file, guess_file = guess_file, reference = reference_session(targets, guesses))
+
+
+#########################################################################################
+# run_checkpass(), for tests that run something other than a plain session
+#########################################################################################
+@pytest.fixture
+def checkpass():
+    return run_checkpass
+
+
+#########################################################################################
+# reference_session(), for tests that check a different set of guesses
+#########################################################################################
+@pytest.fixture
+def reference():
+    return reference_session
+
+
+#########################################################################################
+# Runs a full checkpass.py session and returns its results files
+#
+# Called as session(*args, target = None, guesses = None). The target and guesses
+# default to the ones in data. Returns the CompletedProcess, with the text of the
+# 'output', 'cracked' and 'uncracked' files saved as a dict in its results attribute
+#########################################################################################
+@pytest.fixture
+def session(data, tmp_path):
+    runs = []
+
+    def run_session(*args, target = None, guesses = None):
+        directory = tmp_path / ('run' + str(len(runs)))
+        directory.mkdir()
+        runs.append(directory)
+        process = run_checkpass(['-t', target or data.target_file, '-e', 'utf-8', '-o', directory / 'output.txt',
+            '--cracked_file', directory / 'cracked.txt', '-u', directory / 'uncracked.txt'] + list(args),
+            stdin_file = guesses or data.guess_file)
+        process.results = {
+            'output': read_text(directory / 'output.txt'),
+            'cracked': read_text(directory / 'cracked.txt'),
+            'uncracked': read_text(directory / 'uncracked.txt'),
+        }
+        return process
+
+    return run_session
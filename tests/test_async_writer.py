@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for writing the results files from a background thread
+#########################################################################################
+
+import errno
+import threading
+
+import pytest
+
+from checkpass.async_writer import AsyncWriter
+
+
+#########################################################################################
+# Everything written ends up in the file in order, even when the chunks are tiny and the
+# queue is full most of the time
+#########################################################################################
+def test_writes_in_order(tmp_path):
+    filename = tmp_path / 'output.txt'
+    lines = [str(num) + '\tguess' + str(num) + '\n' for num in range(5000)]
+
+    writer = AsyncWriter(open(filename, 'w'), flush_interval = 0.01, buffer_size = 10, max_queued = 2)
+    for line in lines:
+        writer.write(line)
+    writer.sync()
+    assert filename.read_text() == ''.join(lines)
+    writer.close()
+    assert filename.read_text() == ''.join(lines)
+
+
+#########################################################################################
+# tell() includes text that is still waiting to be written
+#########################################################################################
+def test_tell(tmp_path):
+    writer = AsyncWriter(open(tmp_path / 'output.txt', 'w'), buffer_size = 1000)
+    writer.write('abc\n')
+    assert writer.tell() == 4
+    writer.close()
+
+
+#########################################################################################
+# Writing after every crack gives the same results files as the background thread
+#########################################################################################
+@pytest.mark.parametrize('flush_interval', [0, 0.001])
+def test_flush_interval(data, session, flush_interval):
+    assert session('--flush_interval', flush_interval).results == data.reference
+
+
+#########################################################################################
+# A file that fails every write, like one on a full disk
+#########################################################################################
+class FullDiskFile:
+    def __init__(self):
+        self.closed = False
+
+    def write(self, text):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+#########################################################################################
+# A failed write is raised from the next write(), sync() and close() instead of leaving
+# them waiting on the writer thread forever
+#########################################################################################
+def test_write_error():
+    file = FullDiskFile()
+    writer = AsyncWriter(file, flush_interval = 0.01, buffer_size = 10, max_queued = 2)
+    errors = []
+
+    def run():
+        try:
+            for num in range(1000):
+                writer.write('guess' + str(num) + '\n')
+        except OSError as error:
+            errors.append(error)
+        for method in [writer.sync, writer.close]:
+            try:
+                method()
+            except OSError as error:
+                errors.append(error)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert len(errors) == 3
+    assert all(error.errno == errno.ENOSPC for error in errors)
+    assert file.closed
+    assert not writer.thread.is_alive()
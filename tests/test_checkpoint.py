@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for saving checkpoints and continuing a session with --resume
+#########################################################################################
+
+import pytest
+
+from conftest import read_text
+from conftest import write_lines
+
+
+#########################################################################################
+# Runs the first part of a session, saving a checkpoint when it stops at --max_guesses
+# Returns the arguments for the results files
+#########################################################################################
+def start_session(data, tmp_path, checkpass, *options):
+    results_args = ['-o', tmp_path / 'output.txt', '--cracked_file', tmp_path / 'cracked.txt']
+    process = checkpass(['-t', data.target_file, '-e', 'utf-8', '--checkpoint', tmp_path / 'session.ck',
+        '-m', 2000, '--block_size', 512] + results_args + list(options), stdin_file = data.guess_file)
+    assert process.returncode == 0, process.stderr
+    return results_args
+
+
+#########################################################################################
+# Returns the results files of a session run in tmp_path
+#########################################################################################
+def read_results(tmp_path):
+    return {kind: read_text(tmp_path / (kind + '.txt')) for kind in ['output', 'cracked', 'uncracked']}
+
+
+#########################################################################################
+# A resumed session gives the same results as one that was never stopped, both when the
+# guesses that were already checked are skipped over and when the input starts where
+# the checkpoint left off
+#########################################################################################
+@pytest.mark.parametrize('input_resumed', [False, True])
+def test_resume_matches_single_session(data, tmp_path, checkpass, input_resumed):
+    start_session(data, tmp_path, checkpass, '-u', tmp_path / 'uncracked.txt')
+
+    options = []
+    guess_file = data.guess_file
+    if input_resumed:
+        options = ['--input_resumed']
+        guess_file = tmp_path / 'rest.txt'
+        write_lines(guess_file, data.guesses[2000:])
+
+    process = checkpass(['--checkpoint', tmp_path / 'session.ck', '--resume', '-m', 100000] + options, stdin_file = guess_file)
+    assert process.returncode == 0, process.stderr
+    assert read_results(tmp_path) == data.reference
+
+
+#########################################################################################
+# Options that only change what is written at the end can be given when resuming, even
+# if the session was started without them
+#########################################################################################
+def test_resume_with_new_uncracked_file(data, tmp_path, checkpass):
+    start_session(data, tmp_path, checkpass)
+
+    process = checkpass(['--checkpoint', tmp_path / 'session.ck', '--resume', '-m', 100000, '-u', tmp_path / 'uncracked.txt'],
+        stdin_file = data.guess_file)
+    assert process.returncode == 0, process.stderr
+    assert read_results(tmp_path) == data.reference
+
+
+#########################################################################################
+# Giving an option a different value than the checkpoint has is an error rather than
+# being silently replaced by the saved value
+#########################################################################################
+def test_resume_conflicting_option(data, tmp_path, checkpass):
+    start_session(data, tmp_path, checkpass)
+    before = read_results(tmp_path)
+
+    process = checkpass(['--checkpoint', tmp_path / 'session.ck', '--resume', '-m', 100000, '-o', tmp_path / 'other.txt'],
+        stdin_file = data.guess_file)
+    assert "--output is different from the value saved in the checkpoint" in process.stderr
+    assert not (tmp_path / 'other.txt').exists()
+    assert read_results(tmp_path) == before
+
+
+#########################################################################################
+# Giving an option the same value it was saved with is fine
+#########################################################################################
+def test_resume_repeated_option(data, tmp_path, checkpass):
+    results_args = start_session(data, tmp_path, checkpass, '-u', tmp_path / 'uncracked.txt')
+
+    process = checkpass(['-t', data.target_file, '--checkpoint', tmp_path / 'session.ck', '--resume', '-m', 100000] + results_args,
+        stdin_file = data.guess_file)
+    assert process.returncode == 0, process.stderr
+    assert read_results(tmp_path) == data.reference
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for the compare command
+#########################################################################################
+
+import pytest
+
+from conftest import read_text
+from conftest import write_lines
+
+
+#########################################################################################
+# Each stream gets the same results as checking it in its own session, even though the
+# streams are different lengths and share the target set
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys'], ['--block_size', 64]])
+def test_compare_matches_separate_runs(data, tmp_path, checkpass, reference, options):
+    streams = {
+        'full': data.guesses,
+        'reversed': data.guesses[::-1],
+        'short': data.guesses[:700],
+    }
+    guess_args = []
+    for name, guesses in streams.items():
+        write_lines(tmp_path / (name + '.txt'), guesses)
+        guess_args.append(name + '=' + str(tmp_path / (name + '.txt')))
+
+    process = checkpass(['compare', '-t', data.target_file, '-e', 'utf-8', '-g'] + guess_args + ['-o', tmp_path / 'output.txt',
+        '--cracked_file', tmp_path / 'cracked.txt', '-u', tmp_path / 'uncracked.txt'] + options)
+    assert process.returncode == 0, process.stderr
+
+    for name, guesses in streams.items():
+        expected = reference(data.targets, guesses)
+        for kind in ['output', 'cracked', 'uncracked']:
+            assert read_text(tmp_path / (kind + '_' + name + '.txt')) == expected[kind], kind + ' for ' + name
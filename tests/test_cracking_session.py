@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for using CrackingSession directly from Python
+#########################################################################################
+
+import io
+
+import pytest
+
+from checkpass.cracking_session import CrackingSession
+from checkpass.ret_types import RetType
+
+
+#########################################################################################
+# Returns a CrackingSession with the test target set loaded
+#########################################################################################
+def load_session(data, byte_keys = False):
+    cs = CrackingSession()
+    assert cs.load_targets([str(data.target_file)], encoding = 'utf-8', byte_keys = byte_keys) == RetType.STATUS_OK
+    return cs
+
+
+#########################################################################################
+# Checking the guesses in batches gives the same results as checkpass.py, whichever type
+# the guesses and target passwords are
+#########################################################################################
+@pytest.mark.parametrize('byte_keys', [False, True])
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_consume_matches_reference(data, byte_keys, as_bytes):
+    cs = load_session(data, byte_keys)
+    output = io.StringIO()
+    cracked = io.StringIO()
+    cs.start_output(output, cracked)
+
+    guesses = data.guesses
+    if as_bytes:
+        guesses = [guess.encode('utf-8') for guess in guesses]
+    stats = cs.consume(guesses, batch_size = 37)
+    cs.finish_output()
+
+    assert output.getvalue() == data.reference['output']
+    assert cracked.getvalue() == data.reference['cracked']
+    assert stats['num_guesses'] == len(data.guesses)
+    assert [guess_num for guess_num, guess, count in stats['cracks']] == sorted(set(
+        int(line.split('\t')[0]) for line in data.reference['cracked'].splitlines()))
+
+
+#########################################################################################
+# A batch can mix str and bytes guesses
+#########################################################################################
+@pytest.mark.parametrize('byte_keys', [False, True])
+def test_mixed_batch(data, byte_keys):
+    first, second = list(dict.fromkeys(data.targets))[:2]
+    cs = load_session(data, byte_keys)
+
+    stats = cs.check_batch([first.encode('utf-8'), 'not a target'])
+    assert [guess_num for guess_num, guess, count in stats['cracks']] == [1]
+    stats = cs.check_batch(['not a target', second.encode('utf-8')])
+    assert [guess_num for guess_num, guess, count in stats['cracks']] == [4]
+
+    with pytest.raises(TypeError):
+        cs.check_batch([1234])
+
+
+#########################################################################################
+# Options that only work on the guess blocks checkpass.py reads aren't silently ignored
+#########################################################################################
+@pytest.mark.parametrize('option', ['prefilter', 'dedup', 'near_miss'])
+def test_unsupported_options(data, option):
+    cs = load_session(data)
+    setattr(cs, option, object())
+    with pytest.raises(ValueError):
+        cs.check_batch(['guess'])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for choosing the points on the cracking curve with --curve and --curve_step
+#########################################################################################
+
+import math
+
+import pytest
+
+
+#########################################################################################
+# Returns the (guess_num, count) of every crack, and the (guess_num, line) of every
+# debug line from the reference session
+#########################################################################################
+def reference_events(data):
+    cracks = {}
+    for line in data.reference['cracked'].splitlines():
+        guess_num = int(line.split('\t')[0])
+        cracks[guess_num] = cracks.get(guess_num, 0) + 1
+    debug = [(int(line.split(' \t ')[0]), line) for line in data.reference['output'].splitlines() if 'CHECKPASSDEBUG' in line]
+    return sorted(cracks.items()), debug
+
+
+#########################################################################################
+# Returns the output for a curve with a point at each of the guess numbers
+#
+# A debug line comes before a point at the same guess number
+#########################################################################################
+def guess_curve(data, points):
+    cracks, debug = reference_events(data)
+    num_guesses = len(data.guesses)
+
+    events = [(point, 1, None) for point in points if point <= num_guesses]
+    events.extend((guess_num, 0, line) for guess_num, line in debug)
+    lines = ['0 \t 0']
+    for guess_num, is_point, line in sorted(events):
+        if is_point:
+            num_cracked = sum(count for crack_num, count in cracks if crack_num <= guess_num)
+            line = str(guess_num) + ' \t ' + str(num_cracked) + ' \t'
+        lines.append(line)
+    lines.append(str(num_guesses) + ' \t ' + str(sum(count for crack_num, count in cracks)))
+    return ''.join(line + '\n' for line in lines)
+
+
+#########################################################################################
+# Log curves have curve_step points per decade, without repeating a guess number
+#########################################################################################
+@pytest.mark.parametrize('curve_step', [5, 20])
+def test_log_curve(data, session, curve_step):
+    points = sorted(set(math.ceil(10 ** (index / curve_step)) for index in range(curve_step * 5)))
+    assert session('--curve', 'log', '--curve_step', curve_step).results['output'] == guess_curve(data, points)
+
+
+#########################################################################################
+# Interval curves have a point every curve_step guesses, no matter how the guesses are
+# split into blocks or workers
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--block_size', 64], ['--block_size', 512, '--workers', 2]])
+def test_interval_curve(data, session, options):
+    points = range(500, len(data.guesses) + 1, 500)
+    run = session('--curve', 'interval', '--curve_step', 500, *options)
+    assert run.results['output'] == guess_curve(data, points)
+    assert run.results['cracked'] == data.reference['cracked']
+
+
+#########################################################################################
+# Percent curves only have a point each time another curve_step percent of the
+# passwords are cracked
+#########################################################################################
+def test_percent_curve(data, session):
+    step_size = int(len(data.targets) * 0.1)
+    cracks, debug = reference_events(data)
+
+    lines = ['0 \t 0']
+    events = sorted([(guess_num, 0, count) for guess_num, count in cracks] + [(guess_num, 1, line) for guess_num, line in debug])
+    num_cracked = 0
+    step_limit = step_size
+    for guess_num, is_debug, value in events:
+        if is_debug:
+            lines.append(value)
+            continue
+        num_cracked = num_cracked + value
+        if num_cracked >= step_limit:
+            lines.append(str(guess_num) + ' \t ' + str(num_cracked) + ' \t')
+            step_limit = step_limit + step_size
+    lines.append(str(len(data.guesses)) + ' \t ' + str(num_cracked))
+
+    assert session('--curve_step', 10).results['output'] == ''.join(line + '\n' for line in lines)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for removing duplicate guesses with --dedup
+#########################################################################################
+
+import pytest
+
+
+#########################################################################################
+# Returns the guesses with repeats removed the way --dedup does, (compared after
+# trailing whitespace is stripped, and CHECKPASSDEBUG strings are always kept)
+#########################################################################################
+def unique_guesses(guesses):
+    seen = set()
+    unique = []
+    for guess in guesses:
+        guess = guess.rstrip()
+        if guess.startswith('CHECKPASSDEBUG'):
+            unique.append(guess)
+        elif guess not in seen:
+            seen.add(guess)
+            unique.append(guess)
+    return unique
+
+
+#########################################################################################
+# Only the first copy of each guess counts towards the guess numbers
+#
+# A memory limit of 0 makes the exact mode spill to disk after every block
+#########################################################################################
+@pytest.mark.parametrize('options', [
+    ['--dedup', 'exact'],
+    ['--dedup', 'exact', '--dedup_memory', 0],
+    ['--dedup', 'approximate', '--dedup_items', 10000, '--dedup_fp_rate', 1e-9],
+])
+def test_dedup(data, session, reference, options):
+    if 'approximate' in options:
+        pytest.importorskip('numpy')
+    expected = reference(data.targets, unique_guesses(data.guesses))
+    assert session('--block_size', 512, *options).results == expected
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for detecting the encoding of the target set
+#########################################################################################
+
+import sys
+import codecs
+import subprocess
+
+import pytest
+
+from conftest import BASE_DIR
+from checkpass.file_io import detect_file_encoding, _read_encoding_samples
+from checkpass.file_io import ENCODING_SAMPLE_COUNT, ENCODING_SAMPLE_SIZE
+
+
+## Size of a file that is just too big to be read in full when detecting its encoding
+SAMPLED_SIZE = ENCODING_SAMPLE_COUNT * ENCODING_SAMPLE_SIZE + 1
+
+
+#########################################################################################
+# Writes ASCII passwords to a file until it is at least size bytes, followed by the
+# extra lines
+#########################################################################################
+def write_target_file(filename, size, extra = b'', start = b''):
+    with open(filename, 'wb') as file:
+        file.write(start)
+        written = len(start)
+        num = 0
+        while written < size:
+            line = b'password' + str(num).encode('ascii') + b'\n'
+            file.write(line)
+            written = written + len(line)
+            num = num + 1
+        file.write(extra)
+
+
+#########################################################################################
+# Returns the encoding detected for a file, or None if it couldn't be detected
+#########################################################################################
+def detect(filename):
+    file_encoding = []
+    detect_file_encoding(str(filename), file_encoding)
+    return file_encoding[0] if file_encoding else None
+
+
+#########################################################################################
+# Files up to the size of all the samples are read in full, and larger ones are sampled
+# across the whole file, with every sample made up of whole lines
+#########################################################################################
+def test_samples(tmp_path):
+    filename = tmp_path / 'targets.txt'
+    write_target_file(filename, SAMPLED_SIZE - 1000)
+    with open(filename, 'rb') as file:
+        contents = file.read()
+        file.seek(0)
+        assert _read_encoding_samples(file, len(contents)) == [contents]
+
+    write_target_file(filename, SAMPLED_SIZE * 4)
+    with open(filename, 'rb') as file:
+        contents = file.read()
+        file.seek(0)
+        samples = _read_encoding_samples(file, len(contents))
+    assert len(samples) == ENCODING_SAMPLE_COUNT
+    assert contents.startswith(samples[0])
+    assert contents.endswith(samples[-1])
+    for sample in samples:
+        assert sample.endswith(b'\n')
+        assert sample.startswith(b'password')
+        assert b'\n' + sample in contents or contents.startswith(sample)
+
+
+#########################################################################################
+# A file that is valid UTF-8 is detected from the samples alone, without importing
+# chardet. Run in a separate process since other tests may have imported it
+#########################################################################################
+@pytest.mark.parametrize('size', [1000, SAMPLED_SIZE * 2])
+def test_utf8(tmp_path, size):
+    filename = tmp_path / 'targets.txt'
+    write_target_file(filename, size, 'pässwort\nпароль\n'.encode('utf-8'))
+    code = ('import sys\n'
+        'sys.path.insert(0, sys.argv[1])\n'
+        'from checkpass.file_io import detect_file_encoding\n'
+        'file_encoding = []\n'
+        'detect_file_encoding(sys.argv[2], file_encoding)\n'
+        'print(file_encoding[0], "chardet" in sys.modules)\n')
+    process = subprocess.run([sys.executable, '-c', code, BASE_DIR, str(filename)], stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True, timeout=60)
+    assert process.stdout.split() == ['utf-8', 'False'], process.stderr
+
+
+#########################################################################################
+# A UTF-8 byte order mark is detected as utf-8-sig so it isn't read in as part of the
+# first password
+#########################################################################################
+@pytest.mark.parametrize('size', [1000, SAMPLED_SIZE * 2])
+def test_utf8_bom(tmp_path, size):
+    filename = tmp_path / 'targets.txt'
+    write_target_file(filename, size, 'pässwort\n'.encode('utf-8'), start = codecs.BOM_UTF8)
+    assert detect(filename) == 'utf-8-sig'
+
+
+#########################################################################################
+# Non-UTF-8 bytes that are only at the end of the file, (in the last sample of a large
+# file), are still found, and never detected as ASCII. Small files are read in full so
+# that holds even when there are more than 10,000 ASCII lines before them
+#########################################################################################
+@pytest.mark.parametrize('size', [500000, SAMPLED_SIZE * 2])
+def test_late_latin1(tmp_path, size):
+    pytest.importorskip('chardet')
+    filename = tmp_path / 'targets.txt'
+    extra = ''.join('café' + str(num) + '\n' for num in range(20)).encode('latin-1')
+    write_target_file(filename, size, extra)
+
+    encoding = detect(filename)
+    assert encoding is not None
+    assert encoding.lower() not in ['ascii', 'utf-8', 'utf-8-sig']
+    assert 'café'.encode('latin-1').decode(encoding) == 'café'
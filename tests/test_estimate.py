@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for estimating guess numbers with the estimate command
+#########################################################################################
+
+import io
+import random
+
+from conftest import read_text
+from conftest import write_lines
+from checkpass.estimate import GuessNumberEstimator
+from checkpass.estimate import _write_percent_curve
+
+
+## Size of the Zipf distribution used as the generator
+NUM_ITEMS = 20000
+
+
+#########################################################################################
+# Returns the probability of each item in a Zipf distribution, most likely first
+#########################################################################################
+def zipf_probabilities():
+    weights = [1 / rank for rank in range(1, NUM_ITEMS + 1)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+#########################################################################################
+# The interval on the percent curve is for the number of passwords cracked, not for the
+# one password that crossed the step. One password with a wide interval means the first
+# crack can come as early as its low end, and as late as the high end of the other one
+#########################################################################################
+def test_percent_curve_interval():
+    estimates = [(10, 1, 100, 0), (20, 15, 25, 1)]
+    output = io.StringIO()
+    _write_percent_curve(estimates, [1, 1], 2, 50, output)
+    assert output.getvalue() == '10 \t 1 \t 1 \t 25\n20 \t 2 \t 15 \t 100\n'
+
+
+#########################################################################################
+# When every sample has the same probability the estimate is exact
+#########################################################################################
+def test_uniform_is_exact():
+    estimator = GuessNumberEstimator([0.001] * 500)
+    assert estimator.estimate(0.0005) == (1001, 1001, 1001)
+    assert estimator.estimate(0.001)[0] == 1
+    assert estimator.estimate(0) is None
+
+
+#########################################################################################
+# The true guess number is inside the confidence interval, and the estimates are close
+#########################################################################################
+def test_zipf_accuracy():
+    probabilities = zipf_probabilities()
+    rng = random.Random(99)
+    samples = [probabilities[index] for index in rng.choices(range(NUM_ITEMS), weights = probabilities, k = 20000)]
+    estimator = GuessNumberEstimator(samples, confidence = 0.999)
+
+    for rank in [10, 100, 1000, 5000, 15000]:
+        guess_num, low, high = estimator.estimate(probabilities[rank - 1])
+        assert low <= rank <= high, rank
+        assert abs(guess_num - rank) / rank < 0.2, rank
+
+
+#########################################################################################
+# The estimate command writes the curve, cracked and uncracked files the same way a
+# session does, with the confidence interval added to each point
+#########################################################################################
+def test_estimate_command(tmp_path, checkpass):
+    write_lines(tmp_path / 'targets.txt', ['a', 'a', 'b', 'c', 'never'])
+    write_lines(tmp_path / 'samples.txt', ['guess\t0.01'] * 100)
+    write_lines(tmp_path / 'probabilities.txt', ['a\t0.5', 'b\t0.001', 'c\t0.002', 'not a target\t0.1'])
+
+    process = checkpass(['estimate', '-t', tmp_path / 'targets.txt', '-e', 'utf-8', '--samples', tmp_path / 'samples.txt',
+        '-p', tmp_path / 'probabilities.txt', '-o', tmp_path / 'output.txt', '--cracked_file', tmp_path / 'cracked.txt',
+        '-u', tmp_path / 'uncracked.txt'])
+    assert process.returncode == 0, process.stderr
+
+    assert read_text(tmp_path / 'cracked.txt') == '1\ta\n1\ta\n101\tb\n101\tc\n'
+    assert read_text(tmp_path / 'uncracked.txt') == 'never\n'
+    assert read_text(tmp_path / 'output.txt') == (
+        '0 \t 0\n'
+        '1 \t 2 \t 1 \t 1\n'
+        '101 \t 3 \t 101 \t 101\n'
+        '101 \t 4 \t 101 \t 101\n'
+        '101 \t 4\n')
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for saving the per password results with --export
+#########################################################################################
+
+import json
+
+import pytest
+
+
+#########################################################################################
+# The arrays have one entry per unique target password, in the order they were first
+# seen in the target set, and agree with the cracked file
+#########################################################################################
+def test_export(data, session, tmp_path):
+    numpy = pytest.importorskip('numpy')
+    directory = tmp_path / 'export'
+    session('--export', directory)
+
+    unique = list(dict.fromkeys(data.targets))
+    first_cracked = {}
+    for line in data.reference['cracked'].splitlines():
+        guess_num, password = line.split('\t')
+        first_cracked.setdefault(password, int(guess_num))
+
+    counts = numpy.load(directory / 'counts.npy')
+    cracked = numpy.load(directory / 'cracked.npy')
+    guess_cracked = numpy.load(directory / 'guess_cracked.npy')
+    assert counts.tolist() == [data.targets.count(password) for password in unique]
+    assert cracked.tolist() == [int(password in first_cracked) for password in unique]
+    assert guess_cracked.tolist() == [first_cracked.get(password, -1) for password in unique]
+
+    with open(directory / 'summary.json') as file:
+        summary = json.load(file)
+    assert summary['num_unique'] == len(unique)
+    assert summary['num_passwords'] == len(data.targets)
+    assert summary['num_cracked'] == len(data.reference['cracked'].splitlines())
+    assert summary['num_guesses'] == len(data.guesses)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for receiving guesses from several producers with --listen and --fifo
+#########################################################################################
+
+import io
+import sys
+import os
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from itertools import zip_longest
+
+import pytest
+
+from conftest import CHECKPASS
+from conftest import read_text
+from checkpass.guess_server import GuessServer
+from checkpass.guess_server import FRAME_HEADER
+from checkpass.guess_server import send_guesses
+from checkpass.guess_reader import read_guess_blocks
+
+
+## Longest any of these tests should take. The bugs being tested for make the server hang
+TIMEOUT = 20
+
+
+#########################################################################################
+# Path for the server's socket. Kept short since Unix socket paths are limited to about
+# 100 characters
+#########################################################################################
+@pytest.fixture
+def socket_path():
+    directory = tempfile.mkdtemp(prefix='cp_')
+    yield os.path.join(directory, 's.sock')
+    shutil.rmtree(directory)
+
+
+#########################################################################################
+# Waits for the server to create its socket
+#########################################################################################
+def wait_for_socket(socket_path):
+    deadline = time.monotonic() + TIMEOUT
+    while not os.path.exists(socket_path):
+        assert time.monotonic() < deadline, 'The server never started listening'
+        time.sleep(0.01)
+
+
+#########################################################################################
+# Collects all the blocks from a GuessServer while the producers send their guesses
+#
+# producers is a list of functions that are each run in their own thread once the server
+# is listening. Returns the list of blocks
+#########################################################################################
+def collect_blocks(server, socket_path, producers):
+    blocks = []
+    reader = threading.Thread(target=lambda: blocks.extend(server.blocks()), daemon=True)
+    reader.start()
+    wait_for_socket(socket_path)
+
+    threads = [threading.Thread(target=producer, daemon=True) for producer in producers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    reader.join(TIMEOUT)
+    if reader.is_alive():
+        server.close()
+        pytest.fail('The server did not finish after every producer was done')
+    return blocks
+
+
+#########################################################################################
+# Returns a producer that sends lines with send_guesses()
+#########################################################################################
+def sender(lines, socket_path, producer_id, block_size = 256):
+    guesses = b''.join(line.encode('utf-8') + b'\n' for line in lines)
+    return lambda: send_guesses(io.BytesIO(guesses), socket_path, producer_id, block_size)
+
+
+#########################################################################################
+# Returns the blocks send_guesses() splits the lines into
+#########################################################################################
+def expected_blocks(lines, block_size = 256):
+    guesses = b''.join(line.encode('utf-8') + b'\n' for line in lines)
+    return list(read_guess_blocks(io.BytesIO(guesses), block_size))
+
+
+#########################################################################################
+# Round robin takes one frame from each producer in turn, so the order doesn't depend on
+# how fast each producer is
+#########################################################################################
+def test_round_robin_order(data, socket_path):
+    streams = [data.guesses[:2000], data.guesses[2000:2300], data.guesses[2300:]]
+    server = GuessServer(socket_path = socket_path, num_producers = len(streams))
+    blocks = collect_blocks(server, socket_path, [sender(lines, socket_path, producer_id) for producer_id, lines in enumerate(streams)])
+
+    expected = [block for blocks in zip_longest(*map(expected_blocks, streams)) for block in blocks if block is not None]
+    assert blocks == expected
+    assert server.error is None
+
+
+#########################################################################################
+# Arrival order hands on every frame exactly once
+#########################################################################################
+def test_arrival_order(data, socket_path):
+    streams = [data.guesses[:2000], data.guesses[2000:]]
+    server = GuessServer(socket_path = socket_path, num_producers = len(streams), order = 'arrival')
+    blocks = collect_blocks(server, socket_path, [sender(lines, socket_path, producer_id) for producer_id, lines in enumerate(streams)])
+
+    assert sorted(blocks) == sorted(expected_blocks(streams[0]) + expected_blocks(streams[1]))
+
+
+#########################################################################################
+# A producer with no guesses still says which producer it is, so the session ends
+#########################################################################################
+@pytest.mark.parametrize('order', ['round_robin', 'arrival'])
+def test_empty_producer(data, socket_path, order):
+    server = GuessServer(socket_path = socket_path, num_producers = 2, order = order)
+    blocks = collect_blocks(server, socket_path, [sender(data.guesses, socket_path, 0), sender([], socket_path, 1)])
+
+    assert blocks == expected_blocks(data.guesses)
+    assert server.error is None
+
+
+#########################################################################################
+# Returns a producer that connects and sends raw bytes
+#########################################################################################
+def raw_producer(socket_path, payload):
+    def produce():
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+        connection.sendall(payload)
+        connection.close()
+    return produce
+
+
+#########################################################################################
+# A producer that is rejected, sends a bad frame, or closes before saying which producer
+# it is stops the server with an error rather than leaving it waiting forever
+#########################################################################################
+@pytest.mark.parametrize('payload, message', [
+    (b'', 'closed its connection before sending a frame'),
+    (FRAME_HEADER.pack(4, 7, 0) + b'abc\n', 'connected with id 7'),
+    (FRAME_HEADER.pack(4, 1, 3) + b'abc\n', 'sent frame 3 when frame 0 was expected'),
+    (FRAME_HEADER.pack(10, 1, 0) + b'abc', 'closed in the middle of a frame'),
+])
+def test_bad_producer(data, socket_path, payload, message):
+    server = GuessServer(socket_path = socket_path, num_producers = 2)
+    collect_blocks(server, socket_path, [raw_producer(socket_path, payload)])
+    assert message in server.error
+
+
+#########################################################################################
+# The same producer id connecting twice is an error
+#########################################################################################
+def test_duplicate_producer(data, socket_path):
+    server = GuessServer(socket_path = socket_path, num_producers = 2)
+    collect_blocks(server, socket_path, [sender(data.guesses, socket_path, 0), sender(data.guesses, socket_path, 0)])
+    assert 'connected more than once' in server.error
+
+
+#########################################################################################
+# A session fed by producers over a socket and a named pipe gives the same results as
+# reading the same guesses from stdin in the round robin order
+#########################################################################################
+def test_session_over_socket_and_fifo(data, session, socket_path, tmp_path, checkpass, reference):
+    fifo = os.path.join(os.path.dirname(socket_path), 'fifo')
+    os.mkfifo(fifo)
+    streams = [data.guesses[:3000], data.guesses[3000:]]
+
+    process = subprocess.Popen([sys.executable, CHECKPASS, '-t', str(data.target_file), '-e', 'utf-8',
+        '--listen', socket_path, '--fifo', fifo, '--producers', '2', '-o', str(tmp_path / 'output.txt'),
+        '--cracked_file', str(tmp_path / 'cracked.txt'), '-u', str(tmp_path / 'uncracked.txt')],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        wait_for_socket(socket_path)
+        sender(streams[0], fifo, 0)()
+        sender(streams[1], socket_path, 1)()
+        stderr = process.communicate(timeout = TIMEOUT)[1]
+    finally:
+        process.kill()
+    assert process.returncode == 0, stderr
+
+    order = [block for blocks in zip_longest(*map(expected_blocks, streams)) for block in blocks if block is not None]
+    guesses = [guess.decode('utf-8') for block in order for guess in block.split(b'\n')]
+    expected = reference(data.targets, guesses)
+    for kind in ['output', 'cracked', 'uncracked']:
+        assert read_text(tmp_path / (kind + '.txt')) == expected[kind], kind
+
+
+#########################################################################################
+# A session whose producer misbehaves says its results are incomplete
+#########################################################################################
+def test_session_bad_producer(data, socket_path, tmp_path):
+    process = subprocess.Popen([sys.executable, CHECKPASS, '-t', str(data.target_file), '-e', 'utf-8',
+        '--listen', socket_path, '--producers', '2', '-o', str(tmp_path / 'output.txt'), '-u', str(tmp_path / 'uncracked.txt')],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        wait_for_socket(socket_path)
+        sender(data.guesses, socket_path, 0)()
+        raw_producer(socket_path, b'')()
+        stderr = process.communicate(timeout = TIMEOUT)[1]
+    finally:
+        process.kill()
+    assert 'the results are incomplete' in stderr
+    assert not (tmp_path / 'uncracked.txt').exists()
+
+
+#########################################################################################
+# A session that stops at --max_guesses while the producers are still sending exits
+# rather than waiting on producers that can't hand on their frames
+#########################################################################################
+@pytest.mark.parametrize('order', ['round_robin', 'arrival'])
+def test_session_max_guesses(data, socket_path, tmp_path, order):
+    process = subprocess.Popen([sys.executable, CHECKPASS, '-t', str(data.target_file), '-e', 'utf-8', '--listen', socket_path,
+        '--producers', '2', '--server_order', order, '-m', '100', '-o', str(tmp_path / 'output.txt')],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    producers = []
+    try:
+        wait_for_socket(socket_path)
+        for producer_id in range(2):
+            with open(data.guess_file, 'rb') as guess_file:
+                producers.append(subprocess.Popen([sys.executable, CHECKPASS, 'send', '--to', socket_path, '--id', str(producer_id),
+                    '--block_size', '64'], stdin=guess_file, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        stderr = process.communicate(timeout = TIMEOUT)[1]
+    finally:
+        process.kill()
+        for producer in producers:
+            producer.kill()
+            producer.wait()
+    assert process.returncode == 0, stderr
+    assert read_text(tmp_path / 'output.txt').splitlines()[-1].startswith('100 \t ')
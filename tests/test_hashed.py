@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for checking guesses against hashed target sets with --hash_type
+#########################################################################################
+
+import hashlib
+
+import pytest
+
+from conftest import write_lines
+from checkpass.hashed import _md4
+
+
+#########################################################################################
+# Returns the hex hash of a password
+#########################################################################################
+def hash_password(password, hash_type):
+    if hash_type == 'ntlm':
+        return _md4(password.encode('utf-16-le')).hex()
+    return hashlib.new(hash_type, password.encode('utf-8')).hexdigest()
+
+
+#########################################################################################
+# The pure Python MD4 used when hashlib doesn't have it gives the standard results
+#########################################################################################
+def test_md4():
+    assert _md4(b'').hex() == '31d6cfe0d16ae931b73c59d7e0c089c0'
+    assert _md4(b'abc').hex() == 'a448017aaf21d8525fc10ae87aa6729d'
+    assert _md4('password'.encode('utf-16-le')).hex() == '8846f7eaee8fb117ad06bdd830b7586c'
+
+
+#########################################################################################
+# A hashed copy of the target set cracks the same passwords at the same guesses. The
+# cracked file has the guesses and the uncracked file has the hashes
+#########################################################################################
+@pytest.mark.parametrize('hash_type', ['md5', 'sha1', 'ntlm'])
+@pytest.mark.parametrize('options', [[], ['--block_size', 512, '--workers', 2]])
+def test_hashed_matches_plaintext(data, session, tmp_path, hash_type, options):
+    target = tmp_path / 'hashes.txt'
+    write_lines(target, [hash_password(password, hash_type) for password in data.targets])
+
+    run = session('--hash_type', hash_type, *options, target = target)
+    assert run.results['output'] == data.reference['output']
+    assert run.results['cracked'] == data.reference['cracked']
+    assert run.results['uncracked'].splitlines() == [hash_password(password, hash_type) for password in data.reference['uncracked'].splitlines()]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for splitting a guess stream into slices with --hit_log and merging the results
+#########################################################################################
+
+import pytest
+
+from conftest import read_text
+from conftest import write_lines
+
+
+#########################################################################################
+# Checks each slice of the guesses in its own session and saves its hit log
+# Returns the hit log filenames
+#########################################################################################
+def run_slices(data, tmp_path, checkpass, starts, options = ()):
+    hit_logs = []
+    ends = starts[1:] + [len(data.guesses)]
+    for start, end in zip(starts, ends):
+        guess_file = tmp_path / ('slice_' + str(start) + '.txt')
+        write_lines(guess_file, data.guesses[start:end])
+        hit_log = tmp_path / ('slice_' + str(start) + '.log')
+        process = checkpass(['-t', data.target_file, '-e', 'utf-8', '-s', start, '-o', tmp_path / 'slice_output.txt',
+            '--hit_log', hit_log] + list(options), stdin_file = guess_file)
+        assert process.returncode == 0, process.stderr
+        hit_logs.append(hit_log)
+    return hit_logs
+
+
+#########################################################################################
+# Merging the hit logs gives the same results as checking all the guesses in one session,
+# whatever order the logs are given in
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys'], ['--workers', 2, '--block_size', 512]])
+def test_merge_matches_single_session(data, tmp_path, checkpass, options):
+    hit_logs = run_slices(data, tmp_path, checkpass, [0, 1200, 3001], options)
+
+    process = checkpass(['merge', '-l'] + hit_logs[::-1] + ['-t', data.target_file, '-o', tmp_path / 'output.txt',
+        '--cracked_file', tmp_path / 'cracked.txt', '-u', tmp_path / 'uncracked.txt'])
+    assert process.returncode == 0, process.stderr
+    for kind in ['output', 'cracked', 'uncracked']:
+        assert read_text(tmp_path / (kind + '.txt')) == data.reference[kind], kind
+
+
+#########################################################################################
+# A gap between the slices is reported
+#########################################################################################
+def test_merge_gap_warning(data, tmp_path, checkpass):
+    hit_logs = run_slices(data, tmp_path, checkpass, [0, 1200, 3001])
+
+    process = checkpass(['merge', '-l', hit_logs[0], hit_logs[2], '-t', data.target_file, '-o', tmp_path / 'output.txt'])
+    assert process.returncode == 0, process.stderr
+    assert 'Guesses 1201 to 3001 are not in any hit log' in process.stderr
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for the different ways the target set can be read in
+#########################################################################################
+
+import io
+import gzip
+import codecs
+
+import pytest
+
+from conftest import read_text
+from checkpass import file_io
+from checkpass.cracking_session import CrackingSession
+
+
+#########################################################################################
+# Reading the target set in parallel chunks gives the same results as reading it in one
+# process. The file is small so the chunks are only a few lines each
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys']])
+def test_load_workers(data, session, options):
+    assert session('--load_workers', 3, *options).results == data.reference
+
+
+#########################################################################################
+# Writes a compressed copy of the target set
+# Returns its filename
+#########################################################################################
+def compress_targets(data, tmp_path, compression):
+    if compression == 'gz':
+        import gzip as module
+    elif compression == 'bz2':
+        import bz2 as module
+    else:
+        import lzma as module
+    filename = tmp_path / ('targets.txt.' + compression)
+    with open(data.target_file, 'rb') as file:
+        with module.open(filename, 'wb') as output:
+            output.write(file.read())
+    return filename
+
+
+#########################################################################################
+# Compressed target sets give the same results as the uncompressed file. Without -e the
+# start of the file is decompressed to detect the encoding and then replayed to the loader
+#########################################################################################
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'xz'])
+@pytest.mark.parametrize('options', [[], ['--load_workers', 3]])
+def test_compressed(data, tmp_path, checkpass, compression, options):
+    target = compress_targets(data, tmp_path, compression)
+    process = checkpass(['-t', target, '-o', tmp_path / 'output.txt', '--cracked_file', tmp_path / 'cracked.txt',
+        '-u', tmp_path / 'uncracked.txt'] + options, stdin_file = data.guess_file)
+    assert process.returncode == 0, process.stderr
+    for kind in ['output', 'cracked', 'uncracked']:
+        assert read_text(tmp_path / (kind + '.txt')) == data.reference[kind], kind
+
+
+#########################################################################################
+# Reads a target file with read_input_passwords()
+# Returns the passwords with their counts, the number of passwords, and what was printed
+# to stderr about encoding errors
+#########################################################################################
+def load(filename, capsys, encoding, num_workers):
+    cs = CrackingSession()
+    file_io.read_input_passwords(str(filename), cs, file_encoding = encoding, num_workers = num_workers)
+    stderr = capsys.readouterr().err
+    return list(zip(cs.passwords, cs.passwords.counts)), cs.num_passwords, stderr
+
+
+#########################################################################################
+# A target file with a UTF-8 byte order mark is read in parallel, and gives the same
+# passwords, counts and encoding errors as reading it in one process. The mark is only
+# removed from the start of the file
+#########################################################################################
+@pytest.mark.parametrize('compressed', [False, True])
+def test_load_workers_utf8_bom(data, tmp_path, capsys, monkeypatch, compressed):
+    contents = '\n'.join(data.targets + ['\ufeffbom', 'x\ry']).encode('utf-8') + b'\nbad\xff\n'
+    filename = tmp_path / 'targets.txt'
+    if compressed:
+        filename = tmp_path / 'targets.txt.gz'
+        with gzip.open(filename, 'wb') as file:
+            file.write(codecs.BOM_UTF8 + contents)
+    else:
+        filename.write_bytes(codecs.BOM_UTF8 + contents)
+
+    expected = load(filename, capsys, 'utf-8-sig', 1)
+    assert expected[0][0][0] == data.targets[0]
+    assert 'Number of encoding errors encountered: 1' in expected[2]
+
+    def read_serial(*args):
+        raise AssertionError('The target file was read in one process')
+
+    monkeypatch.setattr(file_io, '_read_string_passwords', read_serial)
+    assert load(filename, capsys, 'utf-8-sig', 3) == expected
+
+
+#########################################################################################
+# Small reads of a replayed stream return the head and then the rest of the stream
+#########################################################################################
+def test_replay_stream():
+    from checkpass.compressed import _ReplayStream
+
+    stream = _ReplayStream(b'0123456789', io.BytesIO(b'abcdef'))
+    buffer = bytearray(3)
+    data = b''
+    while True:
+        size = stream.readinto(buffer)
+        if not size:
+            break
+        data = data + bytes(buffer[:size])
+    assert data == b'0123456789abcdef'
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for matching the guesses from stdin against a plaintext target set
+#########################################################################################
+
+import pytest
+
+
+#########################################################################################
+# The plain session counts the same cracks as reference_session()
+#########################################################################################
+def test_matches_reference(data, session):
+    run = session()
+    assert run.results == data.reference
+
+
+#########################################################################################
+# The guesses are read in blocks. Block boundaries shouldn't change the results, even
+# when a block is smaller than a single guess
+#########################################################################################
+@pytest.mark.parametrize('block_size', [1, 7, 4096])
+def test_block_size(data, session, block_size):
+    assert session('--block_size', block_size).results == data.reference
+
+
+#########################################################################################
+# --max_guesses stops in the middle of a block
+#########################################################################################
+def test_max_guesses(data, session, reference):
+    expected = reference(data.targets, data.guesses[:1234])
+    assert session('-m', 1234, '--block_size', 4096).results == expected
+
+
+#########################################################################################
+# Matching on the raw bytes gives the same results as decoding the guesses first
+#########################################################################################
+def test_byte_keys(data, session):
+    assert session('--byte_keys').results == data.reference
+
+
+#########################################################################################
+# Matching in several worker processes gives the same results as a single process.
+# Small blocks make sure the guesses are spread across all the workers
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys'], ['-m', 1234]])
+def test_workers(data, session, options):
+    single = session('--block_size', 512, *options)
+    parallel = session('--block_size', 512, '--workers', 3, *options)
+    assert parallel.results == single.results
+
+
+#########################################################################################
+# The prefilter only skips guesses that can't crack anything, so the results are the
+# same. A handful of bits per target makes sure some guesses get past it by mistake
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys'], ['--prefilter_bits', 2]])
+def test_prefilter(data, session, options):
+    pytest.importorskip('numpy')
+    assert session('--prefilter', '--block_size', 512, *options).results == data.reference
+
+
+#########################################################################################
+# With --byte_keys target lines are only split on '\n', so a '\r' in the middle of a line
+# is part of the password. Without it the line is split into two passwords
+#########################################################################################
+@pytest.mark.parametrize('options, output', [
+    ([], '0 \t 0\n1 \t 1 \t\n2 \t 1\n'),
+    (['--byte_keys'], '0 \t 0\n2 \t 1 \t\n2 \t 1\n'),
+])
+def test_byte_keys_carriage_return(tmp_path, session, options, output):
+    target = tmp_path / 'targets.txt'
+    guesses = tmp_path / 'guesses.txt'
+    target.write_bytes(b'abc\nx\ry\n')
+    guesses.write_bytes(b'x\nx\ry\n')
+    results = session(*options, target = target, guesses = guesses).results
+    assert results['output'] == output
+    assert results['uncracked'] == ('abc\ny\n' if not options else 'abc\n')
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for checking several target sets in one pass
+#########################################################################################
+
+from conftest import read_text
+from conftest import write_lines
+
+
+#########################################################################################
+# Each target set gets the same results as checking it on its own, even when the sets
+# share passwords
+#
+# The uncracked passwords are written in the order they were first seen in any of the
+# sets, so only the order of the uncracked file can be different
+#########################################################################################
+def test_sets_match_separate_runs(data, tmp_path, checkpass, reference):
+    sets = {
+        'first': data.targets[:300],
+        'second': data.targets[200:],
+    }
+    for name, targets in sets.items():
+        write_lines(tmp_path / (name + '.txt'), targets)
+
+    process = checkpass(['-t', tmp_path / 'first.txt', tmp_path / 'second.txt', '-e', 'utf-8',
+        '-o', tmp_path / 'output.txt', '--cracked_file', tmp_path / 'cracked.txt', '-u', tmp_path / 'uncracked.txt'],
+        stdin_file = data.guess_file)
+    assert process.returncode == 0, process.stderr
+
+    for name, targets in sets.items():
+        expected = reference(targets, data.guesses)
+        for kind in ['output', 'cracked']:
+            assert read_text(tmp_path / (kind + '_' + name + '.txt')) == expected[kind], kind + ' for ' + name
+        uncracked = read_text(tmp_path / ('uncracked_' + name + '.txt'))
+        assert sorted(uncracked.splitlines()) == sorted(expected['uncracked'].splitlines())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for counting near misses with --near_miss
+#########################################################################################
+
+import pytest
+
+from conftest import read_text
+from checkpass.near_miss import make_normalizer
+from checkpass.near_miss import NearMissIndex
+from checkpass.target_store import TargetStore
+
+
+#########################################################################################
+# Each normalization only does its own step, and str and bytes are normalized the same
+#########################################################################################
+@pytest.mark.parametrize('normalizations, password, expected', [
+    (['digits', 'lower', 'leet'], 'P@ssw0rd123', 'password'),
+    (['digits'], 'P@ssw0rd123', 'P@ssw0rd'),
+    (['lower'], 'P@ssw0rd123', 'p@ssw0rd123'),
+    (['leet'], 'h3ll0', 'heiio'),
+    (['lower', 'leet'], 'L33T', 'ieet'),
+    (['digits', 'lower', 'leet'], '12345', ''),
+])
+def test_normalizer(normalizations, password, expected):
+    assert make_normalizer(normalizations)(password) == expected
+    assert make_normalizer(normalizations, byte_keys = True)(password.encode('ascii')) == expected.encode('ascii')
+
+
+#########################################################################################
+# Targets are grouped by their normalized form, and ones that normalize to nothing are
+# left out
+#########################################################################################
+def test_index():
+    store = TargetStore()
+    for password in ['password', 'P@ssw0rd1', 'Password', 'hello', '12345']:
+        store.add(password)
+    store.add('hello', 2)
+
+    near_miss = NearMissIndex(store)
+    assert len(near_miss) == 2
+    assert near_miss.counts[near_miss.index['password']] == 3
+    assert near_miss.counts[near_miss.index[near_miss.normalize('hello')]] == 3
+    assert '' not in near_miss.index
+
+
+#########################################################################################
+# Returns the near miss curve for the guesses
+#########################################################################################
+def near_miss_curve(targets, guesses):
+    normalize = make_normalizer(['digits', 'lower', 'leet'])
+    counts = {}
+    for password in targets:
+        form = normalize(password)
+        if form:
+            counts[form] = counts.get(form, 0) + 1
+
+    lines = ['0 \t 0']
+    cracked = set()
+    num_cracked = 0
+    for guess_num, guess in enumerate(guesses, 1):
+        guess = guess.rstrip()
+        form = normalize(guess)
+        if form in counts and form not in cracked:
+            cracked.add(form)
+            num_cracked = num_cracked + counts[form]
+            lines.append(str(guess_num) + ' \t ' + str(num_cracked) + ' \t')
+        if guess.startswith('CHECKPASSDEBUG'):
+            lines.append(str(guess_num) + ' \t ' + str(num_cracked) + ' \t ' + guess)
+    lines.append(str(len(guesses)) + ' \t ' + str(num_cracked))
+    return ''.join(line + '\n' for line in lines)
+
+
+#########################################################################################
+# The exact results don't change, and the near miss curve counts every target whose
+# normalized form was guessed. Changing the case and adding digits to the guesses
+# doesn't change the near miss curve. Only ASCII guesses have their case changed, since
+# --byte_keys only lowercases ASCII letters
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys']])
+def test_near_miss_session(data, session, tmp_path, options):
+    run = session('--near_miss', '--near_miss_output', tmp_path / 'near_miss.txt', *options)
+    assert run.results == data.reference
+    expected = near_miss_curve(data.targets, data.guesses)
+    assert read_text(tmp_path / 'near_miss.txt') == expected
+
+    guess_file = tmp_path / 'changed_guesses.txt'
+    with open(guess_file, 'w', encoding='utf-8') as file:
+        for guess in data.guesses:
+            if not guess.startswith('CHECKPASSDEBUG'):
+                guess = guess.rstrip()
+                if guess.isascii():
+                    guess = guess.upper()
+                guess = guess + '2024'
+            file.write(guess + '\n')
+    session('--near_miss', '--near_miss_output', tmp_path / 'changed.txt', *options, guesses = guess_file)
+    assert read_text(tmp_path / 'changed.txt') == expected
+
+
+#########################################################################################
+# Hit logs only record exact cracks, so they can't be used with --near_miss
+#########################################################################################
+def test_hit_log_rejected(data, tmp_path, checkpass):
+    process = checkpass(['-t', data.target_file, '-o', tmp_path / 'output.txt', '--hit_log', tmp_path / 'slice.log',
+        '--near_miss'], stdin_file = data.guess_file)
+    assert "--hit_log can't be used with --near_miss" in process.stderr
+    assert not (tmp_path / 'slice.log').exists()
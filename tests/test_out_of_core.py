@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for checking a target set that doesn't fit in memory with --out_of_core
+#########################################################################################
+
+import random
+
+import pytest
+
+from checkpass.out_of_core import ExternalSorter
+from checkpass.out_of_core import MAX_MERGE_RUNS
+
+
+#########################################################################################
+# Entries with the same key are combined, even when they were spilled to different runs
+# and there are too many runs to merge at once
+#########################################################################################
+@pytest.mark.parametrize('combine', ['sum', 'first'])
+def test_external_sorter(tmp_path, combine):
+    rng = random.Random(5)
+    sorter = ExternalSorter(str(tmp_path), 1, combine = combine)
+    expected = {}
+    for num in range(MAX_MERGE_RUNS * 3):
+        key = str(rng.randint(0, 100)).encode('ascii')
+        sorter.add_items({key: num})
+        if combine == 'sum':
+            expected[key] = expected.get(key, 0) + num
+        else:
+            expected.setdefault(key, num)
+
+    assert len(sorter.runs) > MAX_MERGE_RUNS
+    assert list(sorter.sorted_items()) == sorted(expected.items())
+    assert list(tmp_path.iterdir()) == []
+
+
+#########################################################################################
+# The results are the same as checking the target set in memory, except the uncracked
+# passwords are in sorted order. Spilling to disk is covered by test_external_sorter
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--block_size', 64]])
+def test_out_of_core_matches_reference(data, session, tmp_path, options):
+    run = session('--out_of_core', '--out_of_core_dir', tmp_path, *options)
+    assert run.results['output'] == data.reference['output']
+    assert run.results['cracked'] == data.reference['cracked']
+
+    uncracked = data.reference['uncracked'].splitlines()
+    uncracked.sort(key = lambda password: password.encode('utf-8'))
+    assert run.results['uncracked'].splitlines() == uncracked
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for the throughput stats and profiling options
+#########################################################################################
+
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from checkpass.stats import SessionStats
+
+
+#########################################################################################
+# Returns the number of guesses and number cracked on the last line of an output file
+#########################################################################################
+def final_counts(output):
+    num_guesses, num_cracked = output.splitlines()[-1].split('\t')
+    return int(num_guesses), int(num_cracked)
+
+
+#########################################################################################
+# Each line of the stats file is a JSON object. The counts only go up, and the final one
+# matches the end of the session. Printing the stats doesn't change the results
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--workers', 3]])
+def test_stats_file(data, session, tmp_path, options):
+    stats_file = tmp_path / 'stats.jsonl'
+    run = session('--stats_file', stats_file, '--stats_interval', 0, '--block_size', 4096, *options)
+    assert run.results == data.reference
+
+    with open(stats_file) as file:
+        stats = [json.loads(line) for line in file]
+    assert len(stats) > 2
+    assert [line['final'] for line in stats] == [False] * (len(stats) - 1) + [True]
+    for prev, line in zip(stats, stats[1:]):
+        assert prev['guesses'] <= line['guesses']
+        assert prev['cracked'] <= line['cracked']
+
+    num_guesses, num_cracked = final_counts(data.reference['output'])
+    assert stats[-1]['guesses'] == num_guesses
+    assert stats[-1]['cracked'] == num_cracked
+    assert stats[-1]['decode_errors'] == 0
+    assert 0 <= stats[-1]['input_wait_fraction'] <= 1
+
+
+#########################################################################################
+# Without a stats file the stats are printed to stderr
+#########################################################################################
+def test_stats_stderr(data, session):
+    run = session('--stats')
+    assert run.results == data.reference
+    num_guesses, num_cracked = final_counts(data.reference['output'])
+    assert 'Stats: guesses ' + str(num_guesses) in run.stderr
+    assert 'cracked ' + str(num_cracked) in run.stderr
+
+
+#########################################################################################
+# The profile goes to stderr, and the cracking curve on stdout is the same as without it
+#########################################################################################
+def test_profile(data, checkpass):
+    process = checkpass(['-t', data.target_file, '-e', 'utf-8', '--profile'], stdin_file = data.guess_file)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout == data.reference['output']
+    assert 'function calls' in process.stderr
+    assert 'tottime' in process.stderr
+
+
+#########################################################################################
+# The rates are worked out from the counts at the start of the session, and are 0
+# rather than an error when nothing has been checked yet
+#########################################################################################
+def test_report():
+    cs = SimpleNamespace(num_guesses = 100, num_cracked = 10)
+    output = io.StringIO()
+    stats = SessionStats(output, interval = 1000)
+    stats.start(cs)
+    stats.report(cs)
+
+    cs.num_guesses = 300
+    cs.num_cracked = 15
+    stats.block_done(cs, num_input_errors = 4)
+    assert output.getvalue().count('\n') == 1
+    stats.report(cs, final = True)
+
+    first, last = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert first['decode_error_rate'] == 0
+    assert (last['guesses'], last['cracked'], last['decode_errors']) == (300, 15, 4)
+    assert last['decode_error_rate'] == 4 / 200
+    assert last['final']
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for building a target index with build-index and checking guesses against it
+#########################################################################################
+
+import os
+import shutil
+
+import pytest
+
+from conftest import write_lines
+
+
+#########################################################################################
+# Builds an index of the target set
+#########################################################################################
+@pytest.fixture
+def index_file(data, tmp_path, checkpass):
+    index_file = tmp_path / 'targets.idx'
+    target_file = tmp_path / 'targets.txt'
+    shutil.copy(data.target_file, target_file)
+    process = checkpass(['build-index', '-t', target_file, '-o', index_file, '-e', 'utf-8'])
+    assert process.returncode == 0, process.stderr
+    return index_file
+
+
+#########################################################################################
+# Checking against the index gives the same results as the target set it was built from
+#########################################################################################
+@pytest.mark.parametrize('options', [[], ['--byte_keys'], ['--index_in_memory'], ['--index_in_memory', '--workers', 3]])
+def test_index_matches_text(data, session, index_file, options):
+    assert session(*options, target = index_file).results == data.reference
+
+
+#########################################################################################
+# An index of a target file that has since been edited is refused. One that was only
+# touched is still used since its checksum hasn't changed
+#########################################################################################
+def test_index_out_of_date(data, session, index_file, tmp_path):
+    target_file = tmp_path / 'targets.txt'
+    os.utime(target_file, (0, 0))
+    assert session(target = index_file).results == data.reference
+
+    write_lines(target_file, data.targets[:-1] + ['edited'])
+    os.utime(target_file, (0, 0))
+    process = session(target = index_file)
+    assert 'has changed since the index' in process.stderr
+    assert process.results['output'] is None
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+#########################################################################################
+# Tests for TargetStore and TargetSet
+#########################################################################################
+
+from checkpass.target_store import TargetStore
+
+
+#########################################################################################
+# Slots are assigned in the order passwords are first added
+#########################################################################################
+def test_add():
+    store = TargetStore()
+    assert store.add('a') == 0
+    assert store.add('b') == 1
+    assert store.add('a', 2) == 0
+
+    assert len(store) == 2
+    assert list(store) == ['a', 'b']
+    assert list(store.counts) == [3, 1]
+    assert list(store.guess_cracked) == [-1, -1]
+    assert store.get('b') == 1
+    assert store.get('c') is None
+    assert 'a' in store
+
+
+#########################################################################################
+# add_counts() gives the same store as calling add() for each password in order
+#########################################################################################
+def test_add_counts():
+    by_add = TargetStore()
+    by_counts = TargetStore()
+    for store in (by_add, by_counts):
+        store.add('a')
+        store.begin_set('second')
+
+    for password, count in {'b': 2, 'a': 3, 'c': 1}.items():
+        by_add.add(password, count)
+    by_counts.add_counts({'b': 2, 'a': 3, 'c': 1})
+
+    assert by_add.index == by_counts.index
+    assert by_add.counts == by_counts.counts
+    assert by_add.cracked == by_counts.cracked
+    assert by_add.guess_cracked == by_counts.guess_cracked
+    assert by_add.sets[0].counts == by_counts.sets[0].counts
+    assert by_add.sets[0].num_passwords == by_counts.sets[0].num_passwords == 6
+
+
+#########################################################################################
+# Only the uncracked passwords are returned, with their count in the target set asked for
+#########################################################################################
+def test_crack_and_uncracked():
+    store = TargetStore()
+    first = store.begin_set('first')
+    store.add('a', 2)
+    store.add('b')
+    second = store.begin_set('second')
+    store.add('b', 4)
+    store.add('c')
+
+    assert store.crack(store.get('b'), 10) == 5
+    assert store.guess_cracked[store.get('b')] == 10
+
+    assert list(store.uncracked()) == [('a', 2), ('c', 1)]
+    assert list(store.uncracked(first)) == [('a', 2)]
+    assert list(store.uncracked(second)) == [('c', 1)]
+    assert first.count(store.get('c')) == 0